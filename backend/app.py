@@ -2,13 +2,17 @@
 Flask API server for Sierra AI chatbot
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
+import json
 import os
 
-from rag.retrieval import Retriever
-from rag.openai_client import OpenAIClient
+from rag.coalescing import SingleFlight, StreamFlight, coalesce_key
+from rag.log import get_logger
+from rag.metrics import RATE_LIMITED, REGISTRY
+from rag.pipeline import create_pipeline
+from rag.ratelimit import KeyedRateLimiter, client_key, retry_after
 
 # Load environment variables
 load_dotenv()
@@ -17,27 +21,40 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
+logger = get_logger("app")
+
+# Batch limits: the client may ask for less parallelism, never more
+BATCH_MAX_QUESTIONS = int(os.getenv('BATCH_MAX_QUESTIONS', 500))
+BATCH_MAX_PARALLEL = int(os.getenv('BATCH_MAX_PARALLEL', 8))
+
+# Per-client token bucket (off by default): sustained requests per second and burst size
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'false').lower() == 'true'
+RATE_LIMIT_RPS = float(os.getenv('RATE_LIMIT_RPS', 1.0))
+RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', 10))
+# Behind TRUSTED_PROXY_HOPS reverse proxies, the client is that many X-Forwarded-For
+# entries from the right (the leftmost ones are whatever the client sent)
+TRUST_FORWARDED_FOR = os.getenv('TRUST_FORWARDED_FOR', 'false').lower() == 'true'
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', 1))
+# Identical sessionless questions in flight at once share one pipeline run
+COALESCE_REQUESTS = os.getenv('COALESCE_REQUESTS', 'true').lower() == 'true'
+
 # Initialize RAG components
-retriever = None
-openai_client = None
+pipeline = None
 is_ready = False
 
+rate_limiter = KeyedRateLimiter(RATE_LIMIT_RPS, RATE_LIMIT_BURST) if RATE_LIMIT_ENABLED else None
+answer_flights = SingleFlight("answer")
+stream_flights = StreamFlight("stream")
+
 
 def initialize_rag():
     """Initialize RAG system"""
-    global retriever, openai_client, is_ready
+    global pipeline, is_ready
 
     print("\n🚀 Initializing Sierra AI Chatbot API...\n")
 
     try:
-        # Initialize retriever
-        retriever = Retriever()
-        retriever.initialize()
-        print("✓ Initialized ChromaDB")
-
-        # Initialize OpenAI client
-        openai_client = OpenAIClient()
-        print(f"✓ OpenAI client initialized (model: {openai_client.model})")
+        pipeline = create_pipeline()
 
         is_ready = True
         print("\n✅ System ready!\n")
@@ -47,6 +64,34 @@ def initialize_rag():
         is_ready = False
 
 
+def sse_event(event: str, data) -> str:
+    """Format a single Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def rate_limited(endpoint: str, cost: float = 1.0):
+    """A 429 response if this client is over its rate limit, else None"""
+    if rate_limiter is None:
+        return None
+
+    key = client_key(request.remote_addr, request.headers.get('X-Forwarded-For'),
+                     TRUST_FORWARDED_FOR, TRUSTED_PROXY_HOPS)
+    # Batches pay per question; one larger than the burst leaves the bucket in debt
+    wait = rate_limiter.try_acquire(key, cost)
+    if wait <= 0:
+        return None
+
+    RATE_LIMITED.inc(endpoint=endpoint)
+    return jsonify({
+        'error': 'Rate limit exceeded. Please slow down.'
+    }), 429, {'Retry-After': retry_after(wait)}
+
+
+def coalesced(data: dict) -> bool:
+    """Whether a request may share a pipeline run (sessions make answers per-user)"""
+    return COALESCE_REQUESTS and not data.get('session_id')
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -74,44 +119,212 @@ def chat():
                 'error': 'Message is required'
             }), 400
 
-        print(f"\n📩 Query: {user_message}")
+        limited = rate_limited('chat')
+        if limited:
+            return limited
+
+        if data.get('stream'):
+            return stream_chat(user_message, data)
 
-        # Retrieve relevant documents
         top_k = data.get('top_k', 5)
-        relevant_docs = retriever.retrieve(user_message, top_k=top_k)
+        include_timings = bool(data.get('timings'))
 
-        print(f"📚 Retrieved {len(relevant_docs)} relevant chunks")
+        def answer():
+            # `timings: true` adds a per-stage breakdown (ms); `session_id` makes it multi-turn
+            return pipeline.answer(
+                user_message,
+                top_k=top_k,
+                include_timings=include_timings,
+                session_id=data.get('session_id')
+            )
 
-        if not relevant_docs:
-            return jsonify({
-                'answer': "I don't have any relevant information in my knowledge base to answer this question. My knowledge is limited to Sierra AI's website content.",
-                'sources': []
+        if coalesced(data):
+            return jsonify(answer_flights.do((coalesce_key(user_message, top_k), include_timings), answer))
+        return jsonify(answer())
+
+    except Exception as e:
+        logger.error(f"❌ Error in /api/chat: {e}\n")
+        return jsonify({
+            'error': 'Failed to generate response',
+            'details': str(e)
+        }), 500
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming chat endpoint (Server-Sent Events)"""
+    if not is_ready:
+        return jsonify({
+            'error': 'System is still initializing. Please try again in a moment.'
+        }), 503
+
+    data = request.get_json() or {}
+    user_message = data.get('message', '').strip()
+
+    if not user_message:
+        return jsonify({
+            'error': 'Message is required'
+        }), 400
+
+    limited = rate_limited('chat_stream')
+    if limited:
+        return limited
+
+    return stream_chat(user_message, data)
+
+
+def stream_chat(user_message: str, data: dict) -> Response:
+    """Stream sources, answer tokens and usage as Server-Sent Events
+
+    Event order: `sources` as soon as retrieval finishes, one `token` event
+    per text delta, then a trailing `usage` event and `done` (carrying the
+    session id and timing breakdown, when used). Failures after the stream
+    has started are reported as an `error` event. Concurrent identical
+    sessionless requests subscribe to one broadcast stream.
+    """
+    top_k = data.get('top_k', 5)
+    include_timings = bool(data.get('timings'))
+    session_id = data.get('session_id')
+
+    def produce():
+        return pipeline.stream(user_message, top_k=top_k, include_timings=include_timings, session_id=session_id)
+
+    def generate():
+        if coalesced(data):
+            events = stream_flights.stream((coalesce_key(user_message, top_k), include_timings), produce)
+        else:
+            events = produce()
+
+        try:
+            for event, payload in events:
+                yield sse_event(event, payload)
+
+        except Exception as e:
+            logger.error(f"❌ Error in /api/chat/stream: {e}\n")
+            yield sse_event('error', {
+                'error': 'Failed to generate response',
+                'details': str(e)
             })
 
-        # Format context
-        context = retriever.format_context(relevant_docs)
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
 
-        # Generate response with OpenAI
-        print("🤖 Generating response with OpenAI...")
-        result = openai_client.generate_response(user_message, context)
 
-        # Extract unique sources
-        sources = retriever.get_unique_sources(relevant_docs)
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """Answer many questions; results stream back as JSONL as they complete"""
+    if not is_ready:
+        return jsonify({
+            'error': 'System is still initializing. Please try again in a moment.'
+        }), 503
 
-        print(f"✓ Response generated ({result['usage']['output_tokens']} tokens)\n")
+    data = request.get_json() or {}
+    questions = [str(q).strip() for q in data.get('questions') or []]
 
+    if not questions or not all(questions):
         return jsonify({
-            'answer': result['answer'],
-            'sources': sources,
-            'usage': result['usage']
-        })
+            'error': 'A non-empty list of questions is required'
+        }), 400
 
-    except Exception as e:
-        print(f"❌ Error in /api/chat: {e}\n")
+    if len(questions) > BATCH_MAX_QUESTIONS:
         return jsonify({
-            'error': 'Failed to generate response',
-            'details': str(e)
-        }), 500
+            'error': f'At most {BATCH_MAX_QUESTIONS} questions per batch'
+        }), 400
+
+    limited = rate_limited('chat_batch', cost=len(questions))
+    if limited:
+        return limited
+
+    top_k = data.get('top_k', 5)
+    max_parallel = min(int(data.get('max_parallel', BATCH_MAX_PARALLEL)), BATCH_MAX_PARALLEL)
+
+    def generate():
+        try:
+            for result in pipeline.answer_batch(questions, top_k=top_k, max_parallel=max_parallel):
+                yield json.dumps(result) + "\n"
+
+        except Exception as e:
+            logger.error(f"❌ Error in /api/chat/batch: {e}\n")
+            yield json.dumps({'error': 'Failed to answer batch', 'details': str(e)}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/api/sessions', methods=['POST'])
+def create_session():
+    """Start a conversation; pass the returned session_id to /api/chat"""
+    if pipeline is None or pipeline.session_store is None:
+        return jsonify({'error': 'Sessions are disabled'}), 404
+
+    return jsonify({'session_id': pipeline.session_store.get_or_create().session_id}), 201
+
+
+@app.route('/api/sessions', methods=['GET'])
+def session_stats():
+    """Session store size, compactions and evictions"""
+    if pipeline is None or pipeline.session_store is None:
+        return jsonify({'enabled': False})
+
+    return jsonify({'enabled': True, **pipeline.session_store.stats()})
+
+
+@app.route('/api/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    """Forget a conversation"""
+    if pipeline is None or pipeline.session_store is None:
+        return jsonify({'error': 'Sessions are disabled'}), 404
+
+    if not pipeline.session_store.delete(session_id):
+        return jsonify({'error': 'Unknown session'}), 404
+    return jsonify({'deleted': session_id})
+
+
+@app.route('/api/cache', methods=['GET'])
+def cache_stats():
+    """Semantic cache hit/miss counters"""
+    if pipeline is None or pipeline.answer_cache is None:
+        return jsonify({'enabled': False})
+
+    return jsonify({'enabled': True, **pipeline.answer_cache.stats()})
+
+
+@app.route('/api/embedding-cache', methods=['GET'])
+def embedding_cache_stats():
+    """Persistent query embedding cache counters"""
+    if pipeline is None or pipeline.retriever.embedding_cache is None:
+        return jsonify({'enabled': False})
+
+    return jsonify({'enabled': True, **pipeline.retriever.embedding_cache.stats()})
+
+
+@app.route('/api/batching', methods=['GET'])
+def batching_stats():
+    """Query-embedding micro-batching metrics"""
+    if pipeline is None or pipeline.retriever.batcher is None:
+        return jsonify({'enabled': False})
+
+    return jsonify({'enabled': True, **pipeline.retriever.batcher.stats()})
+
+
+@app.route('/api/providers', methods=['GET'])
+def provider_stats():
+    """Per-provider latency/error window when LLM_PROVIDER=router"""
+    if pipeline is None or not hasattr(pipeline.llm_client, 'snapshot'):
+        return jsonify({'enabled': False})
+
+    return jsonify({'enabled': True, **pipeline.llm_client.snapshot()})
+
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Stage latencies, token counts and cache hit rates (Prometheus text format)"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/', methods=['GET'])
@@ -122,7 +335,15 @@ def root():
         'status': 'ready' if is_ready else 'initializing',
         'endpoints': {
             'health': '/api/health',
-            'chat': '/api/chat (POST)'
+            'chat': '/api/chat (POST)',
+            'chat_stream': '/api/chat/stream (POST, text/event-stream)',
+            'chat_batch': '/api/chat/batch (POST, application/x-ndjson)',
+            'sessions': '/api/sessions (POST to create, GET for stats, DELETE /api/sessions/<id>)',
+            'cache': '/api/cache',
+            'embedding_cache': '/api/embedding-cache',
+            'batching': '/api/batching',
+            'providers': '/api/providers',
+            'metrics': '/api/metrics'
         }
     })
 
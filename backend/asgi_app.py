@@ -0,0 +1,469 @@
+"""
+ASGI API server for Sierra AI chatbot
+Same /api/health and /api/chat contracts as app.py, served asynchronously:
+    uvicorn asgi_app:app --port 5000
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import httpx
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from rag.admission import AdmissionController, Overloaded
+from rag.coalescing import AsyncSingleFlight, AsyncStreamFlight, coalesce_key
+from rag.log import get_logger
+from rag.metrics import RATE_LIMITED, REGISTRY
+from rag.pipeline import create_pipeline
+from rag.ratelimit import KeyedRateLimiter, client_key, retry_after
+
+# Load environment variables
+load_dotenv()
+
+# Serving limits
+RETRIEVAL_WORKERS = int(os.getenv('RETRIEVAL_WORKERS', 4))
+MAX_IN_FLIGHT = int(os.getenv('MAX_IN_FLIGHT', 64))
+MAX_QUEUE = int(os.getenv('MAX_QUEUE', 256))
+QUEUE_TIMEOUT = float(os.getenv('QUEUE_TIMEOUT', 10))
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', 100))
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 60))
+BATCH_MAX_QUESTIONS = int(os.getenv('BATCH_MAX_QUESTIONS', 500))
+BATCH_MAX_PARALLEL = int(os.getenv('BATCH_MAX_PARALLEL', 8))
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'false').lower() == 'true'
+RATE_LIMIT_RPS = float(os.getenv('RATE_LIMIT_RPS', 1.0))
+RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', 10))
+TRUST_FORWARDED_FOR = os.getenv('TRUST_FORWARDED_FOR', 'false').lower() == 'true'
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', 1))
+COALESCE_REQUESTS = os.getenv('COALESCE_REQUESTS', 'true').lower() == 'true'
+
+logger = get_logger("asgi_app")
+
+# Initialize RAG components
+pipeline = None
+executor = None
+admission = None
+is_ready = False
+
+rate_limiter = KeyedRateLimiter(RATE_LIMIT_RPS, RATE_LIMIT_BURST) if RATE_LIMIT_ENABLED else None
+answer_flights = AsyncSingleFlight("answer")
+stream_flights = AsyncStreamFlight("stream")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Initialize RAG system and the shared LLM connection pool"""
+    global pipeline, executor, admission, is_ready
+
+    print("\n🚀 Initializing Sierra AI Chatbot API (ASGI)...\n")
+
+    # One pool for every outbound LLM call
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS
+        ),
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=5.0)
+    )
+    # Embedding and vector search are CPU-bound; keep them off the event loop
+    executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+    admission = AdmissionController(MAX_IN_FLIGHT, MAX_QUEUE, QUEUE_TIMEOUT)
+
+    try:
+        pipeline = create_pipeline(async_http_client=http_client)
+        is_ready = True
+        print(f"\n✅ System ready! (max in flight: {MAX_IN_FLIGHT}, queue: {MAX_QUEUE})\n")
+    except Exception as e:
+        print(f"\n❌ Initialization failed: {e}\n")
+        is_ready = False
+
+    yield
+
+    await http_client.aclose()
+    executor.shutdown(wait=False)
+
+
+def sse_event(event: str, data) -> str:
+    """Format a single Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def overloaded_response(e: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        {'error': e.reason},
+        status_code=503,
+        headers={'Retry-After': str(e.retry_after)}
+    )
+
+
+def rate_limited(request: Request, endpoint: str, cost: float = 1.0):
+    """A 429 response if this client is over its rate limit, else None"""
+    if rate_limiter is None:
+        return None
+
+    key = client_key(request.client.host if request.client else None,
+                     request.headers.get('X-Forwarded-For'), TRUST_FORWARDED_FOR, TRUSTED_PROXY_HOPS)
+    # Batches pay per question; one larger than the burst leaves the bucket in debt
+    wait = rate_limiter.try_acquire(key, cost)
+    if wait <= 0:
+        return None
+
+    RATE_LIMITED.inc(endpoint=endpoint)
+    return JSONResponse(
+        {'error': 'Rate limit exceeded. Please slow down.'},
+        status_code=429,
+        headers={'Retry-After': retry_after(wait)}
+    )
+
+
+def coalesced(data: dict) -> bool:
+    """Whether a request may share a pipeline run (sessions make answers per-user)"""
+    return COALESCE_REQUESTS and not data.get('session_id')
+
+
+async def read_chat_request(request: Request):
+    """Parse and validate a chat body; returns (message, body, error response)"""
+    try:
+        data = await request.json()
+    except Exception:
+        return None, None, JSONResponse({'error': 'Invalid JSON body'}, status_code=400)
+
+    user_message = (data.get('message') or '').strip()
+    if not user_message:
+        return None, None, JSONResponse({'error': 'Message is required'}, status_code=400)
+
+    return user_message, data, None
+
+
+async def health_check(request: Request):
+    """Health check endpoint"""
+    return JSONResponse({
+        'status': 'ready' if is_ready else 'initializing',
+        'message': 'Sierra AI Chatbot API' if is_ready else 'System is initializing...'
+    })
+
+
+async def chat(request: Request):
+    """Main chat endpoint"""
+    if not is_ready:
+        return JSONResponse({
+            'error': 'System is still initializing. Please try again in a moment.'
+        }, status_code=503)
+
+    user_message, data, error = await read_chat_request(request)
+    if error:
+        return error
+
+    limited = rate_limited(request, 'chat')
+    if limited:
+        return limited
+
+    if data.get('stream'):
+        return await stream_chat(user_message, data)
+
+    top_k = data.get('top_k', 5)
+    include_timings = bool(data.get('timings'))
+
+    async def answer():
+        # Only the request that runs the pipeline takes an admission slot
+        await admission.acquire()
+        try:
+            # `timings: true` adds a per-stage breakdown (ms); `session_id` makes it multi-turn
+            return await pipeline.aanswer(
+                user_message,
+                top_k,
+                executor,
+                include_timings=include_timings,
+                session_id=data.get('session_id')
+            )
+        finally:
+            admission.release()
+
+    try:
+        if coalesced(data):
+            return JSONResponse(await answer_flights.do((coalesce_key(user_message, top_k), include_timings), answer))
+        return JSONResponse(await answer())
+
+    except Overloaded as e:
+        return overloaded_response(e)
+
+    except Exception as e:
+        logger.error(f"❌ Error in /api/chat: {e}\n")
+        return JSONResponse({
+            'error': 'Failed to generate response',
+            'details': str(e)
+        }, status_code=500)
+
+
+async def chat_stream(request: Request):
+    """Streaming chat endpoint (Server-Sent Events)"""
+    if not is_ready:
+        return JSONResponse({
+            'error': 'System is still initializing. Please try again in a moment.'
+        }, status_code=503)
+
+    user_message, data, error = await read_chat_request(request)
+    if error:
+        return error
+
+    limited = rate_limited(request, 'chat_stream')
+    if limited:
+        return limited
+
+    return await stream_chat(user_message, data)
+
+
+async def stream_chat(user_message: str, data: dict):
+    """Admit, then stream sources, tokens and usage as Server-Sent Events
+
+    Concurrent identical sessionless requests subscribe to one broadcast
+    stream. Only the request that starts it takes an admission slot, which
+    its producer holds until the stream ends or every subscriber has left.
+    """
+    top_k = data.get('top_k', 5)
+    include_timings = bool(data.get('timings'))
+    session_id = data.get('session_id')
+    key = (coalesce_key(user_message, top_k), include_timings)
+    sharing = coalesced(data)
+
+    def produce():
+        return pipeline.astream(user_message, top_k, executor, include_timings, session_id)
+
+    if sharing and key in stream_flights:
+        return sse_response(stream_flights.stream(key, produce))
+
+    try:
+        await admission.acquire()
+    except Overloaded as e:
+        return overloaded_response(e)
+
+    released = False
+
+    def release_once():
+        nonlocal released
+        if not released:
+            released = True
+            admission.release()
+
+    if sharing:
+        if key in stream_flights:
+            # The same stream started while this request was queued
+            release_once()
+        return sse_response(stream_flights.stream(key, produce, on_done=release_once))
+
+    # The slot is held until the last byte is sent (or the client leaves)
+    return sse_response(produce(), release=release_once)
+
+
+def sse_response(events, release=None) -> StreamingResponse:
+    """Server-Sent Events from an async iterator of (event, data) pairs"""
+
+    async def generate():
+        try:
+            async for event, payload in events:
+                yield sse_event(event, payload)
+
+        except Exception as e:
+            logger.error(f"❌ Error in /api/chat/stream: {e}\n")
+            yield sse_event('error', {
+                'error': 'Failed to generate response',
+                'details': str(e)
+            })
+
+        finally:
+            await events.aclose()
+            if release is not None:
+                release()
+
+    return StreamingResponse(
+        generate(),
+        media_type='text/event-stream',
+        # Also runs if the client disconnects before the generator starts
+        background=BackgroundTask(release) if release is not None else None,
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+async def chat_batch(request: Request):
+    """Answer many questions; results stream back as JSONL as they complete
+
+    The whole batch holds one admission slot; its own LLM fan-out is
+    bounded by max_parallel.
+    """
+    if not is_ready:
+        return JSONResponse({
+            'error': 'System is still initializing. Please try again in a moment.'
+        }, status_code=503)
+
+    try:
+        data = await request.json()
+    except Exception:
+        return JSONResponse({'error': 'Invalid JSON body'}, status_code=400)
+
+    questions = [str(q).strip() for q in data.get('questions') or []]
+    if not questions or not all(questions):
+        return JSONResponse({'error': 'A non-empty list of questions is required'}, status_code=400)
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return JSONResponse({'error': f'At most {BATCH_MAX_QUESTIONS} questions per batch'}, status_code=400)
+
+    limited = rate_limited(request, 'chat_batch', cost=len(questions))
+    if limited:
+        return limited
+
+    top_k = data.get('top_k', 5)
+    max_parallel = min(int(data.get('max_parallel', BATCH_MAX_PARALLEL)), BATCH_MAX_PARALLEL)
+
+    try:
+        await admission.acquire()
+    except Overloaded as e:
+        return overloaded_response(e)
+
+    released = False
+
+    def release_once():
+        nonlocal released
+        if not released:
+            released = True
+            admission.release()
+
+    async def generate():
+        try:
+            async for result in pipeline.aanswer_batch(questions, top_k, executor, max_parallel):
+                yield json.dumps(result) + "\n"
+
+        except Exception as e:
+            logger.error(f"❌ Error in /api/chat/batch: {e}\n")
+            yield json.dumps({'error': 'Failed to answer batch', 'details': str(e)}) + "\n"
+
+        finally:
+            release_once()
+
+    return StreamingResponse(
+        generate(),
+        media_type='application/x-ndjson',
+        background=BackgroundTask(release_once)
+    )
+
+
+async def create_session(request: Request):
+    """Start a conversation; pass the returned session_id to /api/chat"""
+    if pipeline is None or pipeline.session_store is None:
+        return JSONResponse({'error': 'Sessions are disabled'}, status_code=404)
+
+    return JSONResponse({'session_id': pipeline.session_store.get_or_create().session_id}, status_code=201)
+
+
+async def session_stats(request: Request):
+    """Session store size, compactions and evictions"""
+    if pipeline is None or pipeline.session_store is None:
+        return JSONResponse({'enabled': False})
+
+    return JSONResponse({'enabled': True, **pipeline.session_store.stats()})
+
+
+async def delete_session(request: Request):
+    """Forget a conversation"""
+    if pipeline is None or pipeline.session_store is None:
+        return JSONResponse({'error': 'Sessions are disabled'}, status_code=404)
+
+    session_id = request.path_params['session_id']
+    if not pipeline.session_store.delete(session_id):
+        return JSONResponse({'error': 'Unknown session'}, status_code=404)
+    return JSONResponse({'deleted': session_id})
+
+
+async def cache_stats(request: Request):
+    """Semantic cache hit/miss counters"""
+    if pipeline is None or pipeline.answer_cache is None:
+        return JSONResponse({'enabled': False})
+
+    return JSONResponse({'enabled': True, **pipeline.answer_cache.stats()})
+
+
+async def embedding_cache_stats(request: Request):
+    """Persistent query embedding cache counters"""
+    if pipeline is None or pipeline.retriever.embedding_cache is None:
+        return JSONResponse({'enabled': False})
+
+    return JSONResponse({'enabled': True, **pipeline.retriever.embedding_cache.stats()})
+
+
+async def admission_stats(request: Request):
+    """In-flight and queued request counts"""
+    return JSONResponse(admission.stats() if admission else {})
+
+
+async def provider_stats(request: Request):
+    """Per-provider latency/error window when LLM_PROVIDER=router"""
+    if pipeline is None or not hasattr(pipeline.llm_client, 'snapshot'):
+        return JSONResponse({'enabled': False})
+
+    return JSONResponse({'enabled': True, **pipeline.llm_client.snapshot()})
+
+
+async def metrics(request: Request):
+    """Stage latencies, token counts and cache hit rates (Prometheus text format)"""
+    return PlainTextResponse(REGISTRY.render(), media_type='text/plain; version=0.0.4')
+
+
+async def root(request: Request):
+    """Root endpoint"""
+    return JSONResponse({
+        'message': 'Sierra AI Chatbot API',
+        'status': 'ready' if is_ready else 'initializing',
+        'endpoints': {
+            'health': '/api/health',
+            'chat': '/api/chat (POST)',
+            'chat_stream': '/api/chat/stream (POST, text/event-stream)',
+            'chat_batch': '/api/chat/batch (POST, application/x-ndjson)',
+            'sessions': '/api/sessions (POST to create, GET for stats, DELETE /api/sessions/{id})',
+            'cache': '/api/cache',
+            'embedding_cache': '/api/embedding-cache',
+            'admission': '/api/admission',
+            'providers': '/api/providers',
+            'metrics': '/api/metrics'
+        }
+    })
+
+
+app = Starlette(
+    routes=[
+        Route('/api/health', health_check, methods=['GET']),
+        Route('/api/chat', chat, methods=['POST']),
+        Route('/api/chat/stream', chat_stream, methods=['POST']),
+        Route('/api/chat/batch', chat_batch, methods=['POST']),
+        Route('/api/sessions', create_session, methods=['POST']),
+        Route('/api/sessions', session_stats, methods=['GET']),
+        Route('/api/sessions/{session_id}', delete_session, methods=['DELETE']),
+        Route('/api/cache', cache_stats, methods=['GET']),
+        Route('/api/embedding-cache', embedding_cache_stats, methods=['GET']),
+        Route('/api/admission', admission_stats, methods=['GET']),
+        Route('/api/providers', provider_stats, methods=['GET']),
+        Route('/api/metrics', metrics, methods=['GET']),
+        Route('/', root, methods=['GET']),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+    ],
+    lifespan=lifespan
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.getenv('PORT', 5000))
+    print(f"🌟 Starting ASGI server on http://localhost:{port}\n")
+
+    uvicorn.run(app, host='0.0.0.0', port=port)
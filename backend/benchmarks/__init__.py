@@ -0,0 +1 @@
+"""Benchmarks for the RAG pipeline; run from backend/ with python -m benchmarks.<name>"""
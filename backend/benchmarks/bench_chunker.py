@@ -0,0 +1,187 @@
+"""
+Chunker micro-benchmark
+Times the previous NLTK sentence-splitting chunker against the streaming
+token-offset chunker (rag/chunking.py) over the scraped corpus, per
+document, and reports throughput and chunk shape for both.
+
+    python -m benchmarks.bench_chunker run --repeat 20
+    python -m benchmarks.bench_chunker run --tokenizer model --embedding-backend onnx
+    python -m benchmarks.bench_chunker compare baseline.json current.json
+"""
+
+import argparse
+import json
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.common import compare_results, environment, peak_rss_mb, summarize, write_results
+from rag.chunking import CHUNK_OVERLAP_TOKENS, StreamingChunker, clean_text
+
+
+# Settings of the chunker being replaced
+LEGACY_CHUNK_SIZE = 800
+LEGACY_CHUNK_OVERLAP = 200
+
+COMPARE_KEYS = ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_mb_s')
+
+
+def legacy_chunk_text(text: str) -> List[str]:
+    """The previous DocumentIngestion.chunk_text: NLTK sentences packed by characters"""
+    from nltk.tokenize import sent_tokenize
+
+    if not text or not text.strip():
+        return []
+
+    text = clean_text(text)
+    sentences = sent_tokenize(text)
+
+    chunks: List[str] = []
+    current_chunk_sentences: List[str] = []
+    current_len = 0
+
+    for sent in sentences:
+        sent = sent.strip()
+        if not sent:
+            continue
+
+        sent_len = len(sent) + 2
+
+        if current_len + sent_len > LEGACY_CHUNK_SIZE:
+            if current_chunk_sentences:
+                chunk_text = " ".join(current_chunk_sentences).strip()
+                chunks.append(chunk_text)
+
+                words = chunk_text.split()
+                approx_words_overlap = max(1, int(LEGACY_CHUNK_OVERLAP / 5))
+                overlap_words = words[-approx_words_overlap:]
+
+                current_chunk_sentences = [" ".join(overlap_words), sent]
+                current_len = len(" ".join(current_chunk_sentences))
+            else:
+                current_chunk_sentences = [sent]
+                current_len = sent_len
+        else:
+            current_chunk_sentences.append(sent)
+            current_len += sent_len
+
+    if current_chunk_sentences:
+        chunks.append(" ".join(current_chunk_sentences).strip())
+
+    return [c for c in chunks if len(c) > 50]
+
+
+def load_documents(path: str) -> List[str]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [doc['content'] for doc in json.load(f)]
+
+
+def measure(chunk_fn: Callable[[str], List[str]], documents: List[str], repeat: int, count_tokens) -> Dict:
+    """Per-document latency over `repeat` passes, plus the shape of one pass's chunks"""
+    samples = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for doc in documents:
+            doc_start = time.perf_counter()
+            chunk_fn(doc)
+            samples.append(time.perf_counter() - doc_start)
+    elapsed = time.perf_counter() - start
+
+    chunks = [chunk for doc in documents for chunk in chunk_fn(doc)]
+    tokens = [count_tokens(chunk) for chunk in chunks]
+    megabytes = sum(len(doc.encode('utf-8')) for doc in documents) * repeat / 1e6
+
+    return {
+        'per_document': summarize(samples),
+        'throughput_mb_s': round(megabytes / elapsed, 3),
+        'chunks': len(chunks),
+        'mean_chunk_tokens': round(sum(tokens) / max(len(tokens), 1), 1),
+        'max_chunk_tokens': max(tokens, default=0)
+    }
+
+
+def run(args) -> Dict:
+    documents = load_documents(args.source)
+    print(f"📄 {len(documents)} documents, {sum(len(d) for d in documents) / 1e3:.0f}k characters, {args.repeat} passes\n")
+
+    if args.tokenizer == 'model':
+        from rag.embeddings import load_embedding_model
+
+        model = load_embedding_model(args.embedding_backend)
+        chunker = StreamingChunker.for_model(model, overlap_tokens=args.overlap)
+    else:
+        chunker = StreamingChunker(overlap_tokens=args.overlap)
+
+    # Count chunk sizes with the chunker's own token measure, for both chunkers
+    def count_tokens(chunk: str) -> int:
+        return len(list(chunker.offsets(chunk)))
+
+    results = {}
+
+    try:
+        import nltk  # noqa: F401
+    except ImportError:
+        print("⚠️  nltk is not installed, skipping the legacy chunker")
+    else:
+        results['legacy'] = measure(legacy_chunk_text, documents, args.repeat, count_tokens)
+
+    def streaming_chunk_text(text: str) -> List[str]:
+        return list(chunker.chunks(clean_text(text)))
+
+    results['streaming'] = measure(streaming_chunk_text, documents, args.repeat, count_tokens)
+
+    for name, result in results.items():
+        print(f"{name:<10} p50 {result['per_document']['p50_ms']:>8.3f} ms  "
+              f"p99 {result['per_document']['p99_ms']:>8.3f} ms  "
+              f"{result['throughput_mb_s']:>7.2f} MB/s  "
+              f"{result['chunks']:>5} chunks  "
+              f"mean {result['mean_chunk_tokens']} / max {result['max_chunk_tokens']} tokens")
+
+    if 'legacy' in results:
+        speedup = results['streaming']['throughput_mb_s'] / max(results['legacy']['throughput_mb_s'], 1e-9)
+        print(f"\n⚡ Streaming chunker: {speedup:.1f}x legacy throughput")
+
+    return {
+        'environment': environment(),
+        'config': {
+            'source': args.source,
+            'documents': len(documents),
+            'repeat': args.repeat,
+            'legacy': {'chunk_size': LEGACY_CHUNK_SIZE, 'chunk_overlap': LEGACY_CHUNK_OVERLAP},
+            'streaming': chunker.config()
+        },
+        'results': results,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunker micro-benchmark")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="run the benchmark and write JSON results")
+    run_parser.add_argument('--source', default="./data/scraped_content.json", help="scraped content file")
+    run_parser.add_argument('--repeat', type=int, default=10, help="passes over the corpus")
+    run_parser.add_argument('--tokenizer', choices=['regex', 'model'], default='regex',
+                            help="token offsets from TOKEN_PATTERN or the embedding model's tokenizer")
+    run_parser.add_argument('--embedding-backend', choices=['torch', 'onnx'], default='torch')
+    run_parser.add_argument('--overlap', type=int, default=CHUNK_OVERLAP_TOKENS, help="overlap in tokens")
+    run_parser.add_argument('--output', help="results file (default: benchmarks/results/chunker-<commit>.json)")
+
+    compare_parser = subparsers.add_parser('compare', help="diff two result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        compare_results(args.baseline, args.current, keys=COMPARE_KEYS)
+        return
+
+    results = run(args)
+    path = write_results('chunker', results, args.output)
+    print(f"\n📈 Peak RSS: {results['peak_rss_mb']} MB")
+    print(f"✅ Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
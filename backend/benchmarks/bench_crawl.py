@@ -0,0 +1,113 @@
+"""
+Re-crawl benchmark
+Crawls the local fixture site (benchmarks/fixture_server.py) cold, again
+with the validator cache warm, and once more after editing a few pages,
+reporting requests, bytes downloaded, 304s and wall time for each pass.
+
+    python -m benchmarks.bench_crawl run --pages 200 --edits 5
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+from typing import Dict
+
+from benchmarks.common import compare_results, environment, peak_rss_mb, write_results
+from benchmarks.fixture_server import FixtureSite
+from rag.scraper import SierraScraper
+
+
+COMPARE_KEYS = ('seconds', 'requests', 'bytes')
+
+
+def crawl_pass(site: FixtureSite, args, cache_path: str) -> Dict:
+    site.reset_counters()
+    scraper = SierraScraper(
+        base_url=site.base_url,
+        max_pages=args.pages,
+        workers=args.workers,
+        requests_per_second=args.rps,
+        burst=args.workers,
+        cache_path=cache_path,
+        use_sitemap=not args.no_sitemap
+    )
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        scraper.crawl()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'seconds': round(elapsed, 3),
+        'requests': site.requests,
+        'not_modified': site.not_modified,
+        'bytes': site.bytes_sent,
+        'documents': len(scraper.scraped_content),
+        'unchanged_documents': sum(bool(doc.get('unchanged')) for doc in scraper.scraped_content)
+    }
+
+
+def run(args) -> Dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, FixtureSite(pages=args.pages, validators=not args.no_validators) as site:
+        cache_path = os.path.join(tmp, "http_cache.json")
+
+        results['cold'] = crawl_pass(site, args, cache_path)
+        results['warm'] = crawl_pass(site, args, cache_path)
+
+        for n in range(args.edits):
+            site.edit(f"/page/{n * max(1, args.pages // max(args.edits, 1))}")
+        results['edited'] = crawl_pass(site, args, cache_path)
+
+    for name, result in results.items():
+        print(f"{name:<7} {result['seconds']:>7.2f}s  {result['requests']:>5} requests  "
+              f"{result['not_modified']:>5} x 304  {result['bytes'] / 1e3:>9.1f} kB  "
+              f"{result['unchanged_documents']}/{result['documents']} documents unchanged")
+
+    return {
+        'environment': environment(),
+        'config': {
+            'pages': args.pages,
+            'edits': args.edits,
+            'workers': args.workers,
+            'validators': not args.no_validators,
+            'sitemap': not args.no_sitemap
+        },
+        'results': results,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conditional re-crawl benchmark")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="run the benchmark and write JSON results")
+    run_parser.add_argument('--pages', type=int, default=100)
+    run_parser.add_argument('--edits', type=int, default=5, help="pages changed before the last pass")
+    run_parser.add_argument('--workers', type=int, default=4)
+    run_parser.add_argument('--rps', type=float, default=1000.0, help="scraper politeness limit")
+    run_parser.add_argument('--no-validators', action='store_true', help="fixture serves no ETag/Last-Modified")
+    run_parser.add_argument('--no-sitemap', action='store_true')
+    run_parser.add_argument('--output', help="results file (default: benchmarks/results/crawl-<commit>.json)")
+
+    compare_parser = subparsers.add_parser('compare', help="diff two result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        compare_results(args.baseline, args.current, keys=COMPARE_KEYS)
+        return
+
+    results = run(args)
+    path = write_results('crawl', results, args.output)
+    print(f"\n📈 Peak RSS: {results['peak_rss_mb']} MB")
+    print(f"✅ Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+HTML extraction benchmark
+Runs both extraction paths (rag/extraction.py: BeautifulSoup and plain
+lxml) over a saved corpus of HTML pages, in-process and in a process
+pool, reporting pages/sec and how often the two paths agree.
+
+A corpus comes from a real crawl (`python -m rag.scraper --save-html DIR`)
+or from the fixture site (`save-fixtures`):
+
+    python -m benchmarks.bench_extraction save-fixtures --output /tmp/html --pages 200 --paragraphs 100
+    python -m benchmarks.bench_extraction run --html-dir /tmp/html --processes 4
+    python -m benchmarks.bench_extraction compare baseline.json current.json
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+from benchmarks.common import compare_results, environment, peak_rss_mb, summarize, write_results
+from benchmarks.fixture_server import FixtureSite
+from rag.extraction import EXTRACTORS, extract_page
+from rag.scraper import HTML_INDEX_FILE
+
+
+COMPARE_KEYS = ('p50_ms', 'p95_ms', 'p99_ms', 'pages_per_second')
+
+
+def load_corpus(html_dir: str) -> List[Tuple[str, bytes]]:
+    """(url, raw html) pairs; URLs come from the scraper's index when present"""
+    urls = {}
+    index_path = os.path.join(html_dir, HTML_INDEX_FILE)
+    if os.path.exists(index_path):
+        with open(index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                urls[entry['file']] = entry['url']
+
+    corpus = []
+    for filename in sorted(os.listdir(html_dir)):
+        if filename.endswith('.html'):
+            with open(os.path.join(html_dir, filename), 'rb') as f:
+                corpus.append((urls.get(filename, f"https://example.com/{filename}"), f.read()))
+    return corpus
+
+
+def save_fixtures(args):
+    os.makedirs(args.output, exist_ok=True)
+    site = FixtureSite(pages=args.pages, paragraphs=args.paragraphs)
+    try:
+        with open(os.path.join(args.output, HTML_INDEX_FILE), 'w', encoding='utf-8') as index:
+            for n, path in enumerate(site.pages):
+                filename = f"page-{n:05d}.html"
+                with open(os.path.join(args.output, filename), 'wb') as f:
+                    f.write(site.render(path))
+                index.write(json.dumps({'url': f"https://example.com{path}", 'file': filename}) + "\n")
+    finally:
+        # Only rendered, never served
+        site.httpd.server_close()
+    print(f"✅ Wrote {args.pages} pages to {args.output}")
+
+
+def extract_all(corpus: List[Tuple[str, bytes]], extractor: str) -> List[Dict]:
+    return [extract_page(url, html, extractor) for url, html in corpus]
+
+
+def measure_inline(corpus: List[Tuple[str, bytes]], extractor: str, repeat: int) -> Dict:
+    samples = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for url, html in corpus:
+            page_start = time.perf_counter()
+            extract_page(url, html, extractor)
+            samples.append(time.perf_counter() - page_start)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'per_page': summarize(samples),
+        'pages_per_second': round(len(samples) / elapsed, 1)
+    }
+
+
+def measure_pool(corpus: List[Tuple[str, bytes]], extractor: str, repeat: int, processes: int) -> Dict:
+    """Throughput with pages shipped to a process pool, as the crawler does"""
+    urls = [url for url, _ in corpus] * repeat
+    pages = [html for _, html in corpus] * repeat
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        # Warm the workers up (imports) outside the timed section
+        list(pool.map(extract_page, urls[:processes], pages[:processes], [extractor] * processes))
+
+        start = time.perf_counter()
+        list(pool.map(extract_page, urls, pages, [extractor] * len(urls), chunksize=8))
+        elapsed = time.perf_counter() - start
+
+    return {'pages_per_second': round(len(urls) / elapsed, 1), 'processes': processes}
+
+
+def run(args) -> Dict:
+    corpus = load_corpus(args.html_dir)
+    if not corpus:
+        raise SystemExit(f"No .html files in {args.html_dir}")
+
+    megabytes = sum(len(html) for _, html in corpus) / 1e6
+    print(f"📄 {len(corpus)} pages ({megabytes:.1f} MB), {args.repeat} passes, {args.processes} processes\n")
+
+    results = {}
+    for extractor in EXTRACTORS:
+        results[extractor] = {'inline': measure_inline(corpus, extractor, args.repeat)}
+        if args.processes > 1:
+            results[extractor]['pool'] = measure_pool(corpus, extractor, args.repeat, args.processes)
+
+    soup_pages = extract_all(corpus, "soup")
+    lxml_pages = extract_all(corpus, "lxml")
+    identical = sum(a == b for a, b in zip(soup_pages, lxml_pages))
+    results['parity'] = {'identical_pages': identical, 'pages': len(corpus)}
+
+    for extractor in EXTRACTORS:
+        inline = results[extractor]['inline']
+        line = (f"{extractor:<5} inline {inline['pages_per_second']:>8.1f} pages/s "
+                f"(p50 {inline['per_page']['p50_ms']:.2f} ms, p99 {inline['per_page']['p99_ms']:.2f} ms)")
+        if 'pool' in results[extractor]:
+            line += f"   pool x{args.processes} {results[extractor]['pool']['pages_per_second']:>8.1f} pages/s"
+        print(line)
+
+    speedup = results['lxml']['inline']['pages_per_second'] / results['soup']['inline']['pages_per_second']
+    print(f"\n⚡ lxml path: {speedup:.1f}x soup; identical output on {identical}/{len(corpus)} pages")
+
+    return {
+        'environment': environment(),
+        'config': {
+            'html_dir': args.html_dir,
+            'pages': len(corpus),
+            'megabytes': round(megabytes, 2),
+            'repeat': args.repeat,
+            'processes': args.processes
+        },
+        'results': results,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML extraction benchmark")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="run the benchmark and write JSON results")
+    run_parser.add_argument('--html-dir', required=True, help="directory of saved .html pages")
+    run_parser.add_argument('--repeat', type=int, default=3, help="passes over the corpus")
+    run_parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help="process pool size (1 to skip)")
+    run_parser.add_argument('--output', help="results file (default: benchmarks/results/extraction-<commit>.json)")
+
+    fixtures_parser = subparsers.add_parser('save-fixtures', help="write fixture-site pages as an HTML corpus")
+    fixtures_parser.add_argument('--output', required=True)
+    fixtures_parser.add_argument('--pages', type=int, default=200)
+    fixtures_parser.add_argument('--paragraphs', type=int, default=60, help="page size")
+
+    compare_parser = subparsers.add_parser('compare', help="diff two result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        compare_results(args.baseline, args.current, keys=COMPARE_KEYS)
+        return
+
+    if args.command == 'save-fixtures':
+        save_fixtures(args)
+        return
+
+    results = run(args)
+    path = write_results('extraction', results, args.output)
+    print(f"\n📈 Peak RSS: {results['peak_rss_mb']} MB")
+    print(f"✅ Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
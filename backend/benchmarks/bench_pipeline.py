@@ -0,0 +1,213 @@
+"""
+End-to-end RAG latency benchmark
+Replays a fixed query set through Retriever.retrieve -> format_context ->
+LLM client, with the LLM served by a local stub (rag/stub_llm.py), and
+reports per-stage p50/p95/p99, throughput per concurrency level and peak RSS.
+
+    python -m benchmarks.bench_pipeline run --concurrency 1,4,16
+    python -m benchmarks.bench_pipeline compare baseline.json current.json
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from benchmarks.common import compare_results, environment, peak_rss_mb, summarize, write_results
+from rag.retrieval import Retriever
+from rag.stub_llm import StubLLMServer
+
+
+QUERIES = [
+    "What is Sierra?",
+    "Who founded Sierra?",
+    "What does Sierra's AI agent platform do?",
+    "How does Sierra help customer service teams?",
+    "What are Sierra's company values?",
+    "Is Sierra hiring engineers?",
+    "What is the Agent SDK?",
+    "How does Sierra measure agent quality?",
+    "Which companies use Sierra?",
+    "Where are Sierra's offices?",
+    "How does Sierra handle data privacy and security?",
+    "What is outcome-based pricing?",
+    "How do Sierra agents integrate with existing systems?",
+    "What is tau-bench?",
+    "Can Sierra agents take actions like processing returns?",
+    "How does Sierra keep agents on brand?",
+    "What languages do Sierra agents support?",
+    "What is Sierra's approach to AI safety?",
+    "How long does it take to launch an agent with Sierra?",
+    "What roles are open at Sierra?"
+]
+
+STAGES = ('retrieve', 'format', 'generate', 'first_token', 'total')
+
+
+def load_queries(path: str = None) -> List[str]:
+    if not path:
+        return list(QUERIES)
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def create_stub_client(provider: str, server: StubLLMServer):
+    """LLM client pointed at the stub; SDK retries off so errors are visible"""
+    if provider == 'claude':
+        from rag.claude_client import ClaudeClient
+        return ClaudeClient(api_key="stub", base_url=server.anthropic_base_url, max_retries=0)
+
+    from rag.openai_client import OpenAIClient
+    return OpenAIClient(api_key="stub", base_url=server.base_url, max_retries=0)
+
+
+def run_query(retriever: Retriever, llm_client, query: str, top_k: int, stream: bool) -> Dict:
+    """One request; returns seconds spent in each stage"""
+    timings = {}
+    start = time.perf_counter()
+
+    docs = retriever.retrieve(query, top_k=top_k)
+    after_retrieve = time.perf_counter()
+    timings['retrieve'] = after_retrieve - start
+
+    context = retriever.format_context(docs)
+    after_format = time.perf_counter()
+    timings['format'] = after_format - after_retrieve
+
+    if stream:
+        for event in llm_client.stream_response(query, context):
+            if event['type'] == 'token' and 'first_token' not in timings:
+                timings['first_token'] = time.perf_counter() - after_format
+    else:
+        llm_client.generate_response(query, context)
+
+    end = time.perf_counter()
+    timings['generate'] = end - after_format
+    timings['total'] = end - start
+    return timings
+
+
+def run_level(retriever: Retriever, llm_client, queries: List[str], concurrency: int,
+              requests: int, top_k: int, stream: bool) -> Dict:
+    """Replay `requests` queries (cycling the set) with `concurrency` workers"""
+    workload = [queries[i % len(queries)] for i in range(requests)]
+    samples = {stage: [] for stage in STAGES}
+    errors = 0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_query, retriever, llm_client, q, top_k, stream) for q in workload]
+        for future in futures:
+            try:
+                timings = future.result()
+            except Exception as e:
+                errors += 1
+                print(f"  ⚠️  Request failed: {e}")
+                continue
+            for stage, seconds in timings.items():
+                samples[stage].append(seconds)
+    elapsed = time.perf_counter() - start
+
+    completed = requests - errors
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(completed / elapsed, 3) if elapsed > 0 else 0.0,
+        'stages': {stage: summarize(values) for stage, values in samples.items() if values}
+    }
+
+
+def run(args) -> Dict:
+    queries = load_queries(args.queries)
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    retriever = Retriever(
+        chroma_path=args.chroma_path,
+        backend=args.backend,
+        index_path=args.index_path,
+        mode=args.mode,
+        embedding_backend=args.embedding_backend
+    )
+    retriever.initialize()
+
+    config = {
+        'queries': len(queries),
+        'requests_per_level': args.requests,
+        'concurrency': levels,
+        'top_k': args.top_k,
+        'stream': args.stream,
+        'provider': args.provider,
+        'backend': args.backend,
+        'mode': args.mode,
+        'embedding_backend': args.embedding_backend,
+        'stub_latency_s': args.stub_latency,
+        'stub_tokens_per_second': args.stub_tps
+    }
+    results = {}
+
+    with StubLLMServer(latency=args.stub_latency, tokens_per_second=args.stub_tps) as server:
+        llm_client = create_stub_client(args.provider, server)
+
+        # Warm up model, index and connection pool outside the measurements
+        for query in queries[:args.warmup]:
+            run_query(retriever, llm_client, query, args.top_k, args.stream)
+
+        for level in levels:
+            print(f"\n⏱️  Concurrency {level}: {args.requests} requests")
+            result = run_level(retriever, llm_client, queries, level, args.requests, args.top_k, args.stream)
+            results[f"concurrency_{level}"] = result
+
+            print(f"  Throughput: {result['throughput_rps']:.2f} req/s ({result['errors']} errors)")
+            for stage, summary in result['stages'].items():
+                print(f"  {stage:<12} p50 {summary['p50_ms']:>9.2f} ms   p95 {summary['p95_ms']:>9.2f} ms   p99 {summary['p99_ms']:>9.2f} ms")
+
+    return {
+        'benchmark': 'pipeline',
+        'environment': environment(),
+        'config': config,
+        'results': results,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end RAG pipeline benchmark")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="run the benchmark and write JSON results")
+    run_parser.add_argument('--queries', help="file with one query per line (default: built-in set)")
+    run_parser.add_argument('--concurrency', default="1,4,16", help="comma-separated concurrency levels")
+    run_parser.add_argument('--requests', type=int, default=100, help="requests per concurrency level")
+    run_parser.add_argument('--warmup', type=int, default=5)
+    run_parser.add_argument('--top-k', type=int, default=5)
+    run_parser.add_argument('--stream', action='store_true', help="stream responses and record time to first token")
+    run_parser.add_argument('--provider', choices=['openai', 'claude'], default='openai')
+    run_parser.add_argument('--stub-latency', type=float, default=0.2, help="stub seconds before the first byte")
+    run_parser.add_argument('--stub-tps', type=float, default=50.0, help="stub output tokens per second")
+    run_parser.add_argument('--chroma-path', default="./chroma_db")
+    run_parser.add_argument('--backend', choices=['chroma', 'numpy'], default='chroma')
+    run_parser.add_argument('--index-path', default="./vector_index")
+    run_parser.add_argument('--mode', choices=['dense', 'hybrid'], default='dense')
+    run_parser.add_argument('--embedding-backend', choices=['torch', 'onnx'], default='torch')
+    run_parser.add_argument('--output', help="results file (default: benchmarks/results/pipeline-<commit>.json)")
+
+    compare_parser = subparsers.add_parser('compare', help="diff two result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        compare_results(args.baseline, args.current)
+        return
+
+    results = run(args)
+    path = write_results('pipeline', results, args.output)
+    print(f"\n📈 Peak RSS: {results['peak_rss_mb']} MB")
+    print(f"✅ Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
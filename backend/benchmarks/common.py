@@ -0,0 +1,97 @@
+"""
+Shared helpers for benchmark scripts
+Latency summaries, peak RSS and JSON result files that can be diffed
+between commits.
+"""
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def summarize(samples: List[float]) -> Dict:
+    """p50/p95/p99/mean/max of a list of seconds, reported in milliseconds"""
+    if not samples:
+        return {'count': 0}
+
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+    return {
+        'count': len(ordered),
+        'p50_ms': round(percentile(0.50), 3),
+        'p95_ms': round(percentile(0.95), 3),
+        'p99_ms': round(percentile(0.99), 3),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3)
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def environment() -> Dict:
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def write_results(name: str, results: Dict, output: str = None) -> str:
+    """Write results as sorted, indented JSON (stable for diffing)"""
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}-{results['environment']['commit']}.json")
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+    return output
+
+
+def compare_results(baseline_path: str, current_path: str, keys=('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps')):
+    """Print the relative change of every latency/throughput figure"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(current_path, 'r', encoding='utf-8') as f:
+        current = json.load(f)
+
+    print(f"Baseline {baseline['environment']['commit']} -> current {current['environment']['commit']}\n")
+
+    def walk(old, new, path):
+        if isinstance(old, dict) and isinstance(new, dict):
+            for key in sorted(set(old) & set(new)):
+                walk(old[key], new[key], path + [key])
+        elif path and path[-1] in keys and isinstance(old, (int, float)) and isinstance(new, (int, float)):
+            change = ((new - old) / old * 100) if old else 0.0
+            print(f"  {'.'.join(path):<55} {old:>10.2f} -> {new:>10.2f}  ({change:+.1f}%)")
+
+    walk(baseline.get('results', {}), current.get('results', {}), [])
@@ -0,0 +1,218 @@
+"""
+Local HTTP fixture site
+A generated, interlinked site with a sitemap.xml, ETag and Last-Modified
+validators and conditional GET support, for exercising SierraScraper
+without touching sierra.ai. Pages can be edited between crawls to check
+that only changed pages are re-downloaded.
+
+    python -m benchmarks.fixture_server --pages 200 --port 8765
+"""
+
+import argparse
+import hashlib
+import random
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+
+WORDS = (
+    "agent customer experience platform conversational support outcome "
+    "brand safety integration workflow returns order account billing "
+    "language quality evaluation deploy engineering values trust "
+    "enterprise retail travel healthcare subscription policy"
+).split()
+
+LINKS_PER_PAGE = 5
+PARAGRAPHS_PER_PAGE = 6
+# Fixed epoch for Last-Modified, so restarts serve identical validators
+BASE_MTIME = 1700000000
+
+
+class FixtureSite:
+    """Threaded fixture server; pages live at /page/<n>, the root links to page 0"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        pages: int = 50,
+        validators: bool = True,
+        seed: int = 0,
+        paragraphs: int = PARAGRAPHS_PER_PAGE
+    ):
+        # validators=False serves no ETag/Last-Modified (and never 304s),
+        # like a server the scraper can only check by content hash
+        self.validators = validators
+        self.pages: Dict[str, Dict] = {}
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+        rng = random.Random(seed)
+        for n in range(pages):
+            self.pages[f"/page/{n}"] = {
+                'title': f"Fixture page {n}",
+                'body': " ".join(
+                    "<p>" + " ".join(rng.choice(WORDS) for _ in range(60)).capitalize() + ".</p>"
+                    for _ in range(paragraphs)
+                ),
+                'links': [f"/page/{rng.randrange(pages)}" for _ in range(LINKS_PER_PAGE)] + [f"/page/{(n + 1) % pages}"],
+                'mtime': BASE_MTIME + n
+            }
+
+        site = self
+
+        class Handler(FixtureHandler):
+            site_config = site
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.httpd.server_address[0]}:{self.port}"
+
+    def edit(self, path: str, text: str = "Updated content."):
+        """Change a page, bumping its validators and sitemap lastmod"""
+        with self._lock:
+            page = self.pages[path]
+            page['body'] += f" <p>{text}</p>"
+            page['mtime'] = int(time.time())
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = self.not_modified = self.bytes_sent = 0
+
+    def render(self, path: str) -> bytes:
+        page = self.pages[path]
+        links = "".join(f'<li><a href="{link}">{link}</a></li>' for link in page['links'])
+        return (
+            f"<html><head><title>{page['title']}</title></head><body>"
+            f"<nav><a href=\"/\">Home</a></nav>"
+            f"<main><h1>{page['title']}</h1>{page['body']}<ul>{links}</ul></main>"
+            f"<footer>Fixture site</footer></body></html>"
+        ).encode("utf-8")
+
+    def sitemap(self) -> bytes:
+        entries = "".join(
+            f"<url><loc>{self.base_url}{path}</loc>"
+            f"<lastmod>{time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(page['mtime']))}</lastmod></url>"
+            for path, page in self.pages.items()
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>'
+        ).encode("utf-8")
+
+    def start(self) -> "FixtureSite":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fixture-site", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    site_config: FixtureSite = None
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes = b"", content_type: str = "text/html; charset=utf-8", headers: Dict = None):
+        site = self.site_config
+        with site._lock:
+            site.requests += 1
+            site.not_modified += status == 304
+            site.bytes_sent += len(body)
+
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_modified(self, etag: str, mtime: int) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag in [tag.strip() for tag in if_none_match.split(",")]
+
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def do_GET(self):
+        site = self.site_config
+        path = self.path.split("?")[0].split("#")[0]
+
+        if path == "/sitemap.xml":
+            self._send(200, site.sitemap(), content_type="application/xml")
+            return
+
+        if path == "/":
+            path = "/page/0"
+
+        with site._lock:
+            page = site.pages.get(path)
+            body = site.render(path) if page else None
+            mtime = page['mtime'] if page else 0
+
+        if body is None:
+            self._send(404, b"Not found", content_type="text/plain")
+            return
+
+        if not site.validators:
+            self._send(200, body)
+            return
+
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        headers = {"ETag": etag, "Last-Modified": formatdate(mtime, usegmt=True)}
+        if self._not_modified(etag, mtime):
+            self._send(304, headers=headers)
+        else:
+            self._send(200, body, headers=headers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local fixture site for scraper tests")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--paragraphs', type=int, default=PARAGRAPHS_PER_PAGE, help="page size")
+    parser.add_argument('--no-validators', action='store_true', help="serve no ETag/Last-Modified headers")
+    args = parser.parse_args()
+
+    site = FixtureSite(port=args.port, pages=args.pages, validators=not args.no_validators, paragraphs=args.paragraphs)
+    print(f"Fixture site listening on {site.base_url} ({args.pages} pages, sitemap at /sitemap.xml)")
+    try:
+        site.httpd.serve_forever()
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Admission control for the async server
+Bounds in-flight chats and sheds load quickly once the wait queue is full
+"""
+
+import asyncio
+from typing import Dict
+
+
+MAX_IN_FLIGHT = 64
+MAX_QUEUE = 256
+QUEUE_TIMEOUT = 10.0
+RETRY_AFTER_SECONDS = 2
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; carries a Retry-After hint"""
+
+    def __init__(self, reason: str, retry_after: int = RETRY_AFTER_SECONDS):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """At most `max_in_flight` requests run; up to `max_queue` more may wait
+
+    Requests beyond the queue are rejected immediately, and queued requests
+    that wait longer than `queue_timeout` are rejected too, so clients get a
+    fast 503 + Retry-After instead of a slow timeout.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        max_queue: int = MAX_QUEUE,
+        queue_timeout: float = QUEUE_TIMEOUT,
+        retry_after: int = RETRY_AFTER_SECONDS
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        """Wait for a slot or raise Overloaded; pair with release()"""
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded("Server is at capacity", self.retry_after)
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded("Timed out waiting for capacity", self.retry_after)
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        self.admitted += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict:
+        return {
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'max_in_flight': self.max_in_flight,
+            'max_queue': self.max_queue
+        }
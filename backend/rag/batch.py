@@ -0,0 +1,73 @@
+"""
+Batch question answering CLI
+Answers a file of questions in-process (FAQ pre-computation, evaluation
+sets) and writes one JSON line per answer as each completes:
+
+    python -m rag.batch questions.txt --output answers.jsonl --max-parallel 8
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import List
+
+from dotenv import load_dotenv
+
+
+def load_questions(path: str) -> List[str]:
+    """One question per line (.txt), or a JSON array / JSONL of strings or {"question": ...}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    if path.endswith('.json'):
+        items = json.loads(text)
+    elif path.endswith('.jsonl'):
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        items = text.splitlines()
+
+    questions = []
+    for item in items:
+        question = item.get('question', '') if isinstance(item, dict) else str(item)
+        if question.strip():
+            questions.append(question.strip())
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a batch of questions")
+    parser.add_argument('questions', help="questions file (.txt, .json or .jsonl)")
+    parser.add_argument('--output', help="JSONL output file (default: stdout)")
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--max-parallel', type=int, default=8, help="concurrent LLM calls")
+    args = parser.parse_args()
+
+    load_dotenv()
+    from rag.pipeline import create_pipeline
+
+    questions = load_questions(args.questions)
+    print(f"📋 Loaded {len(questions)} questions from {args.questions}", file=sys.stderr)
+
+    pipeline = create_pipeline()
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+
+    start = time.time()
+    errors = 0
+    try:
+        for done, result in enumerate(pipeline.answer_batch(questions, top_k=args.top_k, max_parallel=args.max_parallel), 1):
+            errors += 'error' in result
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            print(f"  [{done}/{len(questions)}] {result['question'][:60]}", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.time() - start
+    print(f"\n✅ Answered {len(questions) - errors}/{len(questions)} questions in {elapsed:.1f}s "
+          f"({len(questions) / elapsed:.2f} q/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Micro-batching of concurrent query embeddings
+Requests arriving within a short window are encoded in one call
+"""
+
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+BATCH_WINDOW_MS = 3.0
+MAX_BATCH_SIZE = 16
+# Queueing delay samples kept for percentiles
+DELAY_SAMPLES = 2048
+
+
+class QueryBatcher:
+    """Collect concurrent encode() calls and run them as one batch
+
+    A single worker thread takes the first waiting query, then keeps
+    collecting until either `window_ms` has passed since that query arrived
+    or `max_batch_size` queries are waiting. The batch is encoded with one
+    `encode_fn(list_of_texts)` call and each caller receives its own row.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        window_ms: float = BATCH_WINDOW_MS,
+        max_batch_size: int = MAX_BATCH_SIZE
+    ):
+        self.encode_fn = encode_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self.batch_sizes: Counter = Counter()
+        self._delays = deque(maxlen=DELAY_SAMPLES)
+        self.queries = 0
+        self.batches = 0
+
+        self._worker = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+        self._worker.start()
+
+    def encode(self, text: str) -> np.ndarray:
+        """Blocking: enqueue one query and wait for its vector"""
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future.result()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = first[2] + self.window
+
+        while len(batch) < self.max_batch_size:
+            try:
+                # Queries that are already waiting join without delay
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                # Finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            started = time.perf_counter()
+            texts = [text for text, _, _ in batch]
+
+            try:
+                vectors = self.encode_fn(texts)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+            with self._lock:
+                self.batches += 1
+                self.queries += len(batch)
+                self.batch_sizes[len(batch)] += 1
+                self._delays.extend((started - enqueued) * 1000 for _, _, enqueued in batch)
+
+    def close(self):
+        """Stop the worker after draining queued queries"""
+        self._queue.put(None)
+        self._worker.join()
+
+    def stats(self) -> Dict:
+        """Batch-size distribution and queueing delay (ms) percentiles"""
+        with self._lock:
+            delays = sorted(self._delays)
+            batch_sizes = dict(sorted(self.batch_sizes.items()))
+            queries, batches = self.queries, self.batches
+
+        def percentile(p):
+            return round(delays[min(len(delays) - 1, int(len(delays) * p))], 3) if delays else 0.0
+
+        return {
+            'window_ms': self.window * 1000,
+            'max_batch_size': self.max_batch_size,
+            'queries': queries,
+            'batches': batches,
+            'mean_batch_size': queries / batches if batches else 0.0,
+            'batch_size_histogram': batch_sizes,
+            'queue_delay_ms': {
+                'p50': percentile(0.50),
+                'p95': percentile(0.95),
+                'p99': percentile(0.99),
+                'max': round(delays[-1], 3) if delays else 0.0
+            }
+        }
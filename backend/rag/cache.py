@@ -0,0 +1,199 @@
+"""
+Semantic answer cache keyed on query embeddings
+Reuses answers for near-duplicate questions without calling the LLM
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+# Defaults (overridable from the environment in app.py)
+SIMILARITY_THRESHOLD = 0.92
+MAX_ENTRIES = 1000
+MAX_BYTES = 32 * 1024 * 1024
+TTL_SECONDS = 3600
+
+# Rough per-entry bookkeeping overhead (dicts, floats, OrderedDict node)
+ENTRY_OVERHEAD_BYTES = 512
+
+
+class SemanticCache:
+    """In-process LRU/TTL cache of answers, looked up by cosine similarity
+
+    Entries live in a preallocated float32 matrix so a lookup is a single
+    matrix-vector product. An entry only matches queries with the same
+    top_k, and the whole cache is dropped when the collection version
+    passed to lookup()/store() changes.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SIMILARITY_THRESHOLD,
+        max_entries: int = MAX_ENTRIES,
+        max_bytes: int = MAX_BYTES,
+        ttl_seconds: float = TTL_SECONDS
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._top_k = np.zeros(max_entries, dtype=np.int32)
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        # slot -> entry, ordered from least to most recently used
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._bytes = 0
+        self._version = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _normalize(self, embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _check_version(self, version):
+        if version is not None and version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._clear()
+            self._version = version
+
+    def _clear(self):
+        self._valid[:] = False
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, slot: int):
+        entry = self._entries.pop(slot)
+        self._valid[slot] = False
+        self._free_slots.append(slot)
+        self._bytes -= entry['size']
+
+    def lookup(self, embedding: List[float], top_k: int, version=None) -> Optional[Dict]:
+        """Return the cached {answer, sources, usage, similarity} or None"""
+        with self._lock:
+            self._check_version(version)
+
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            query = self._normalize(embedding)
+            similarities = self._matrix @ query
+            similarities[~self._valid | (self._top_k != top_k)] = -np.inf
+
+            # An expired best match must not hide a live one further down
+            now = time.monotonic()
+            while True:
+                slot = int(np.argmax(similarities))
+                similarity = float(similarities[slot])
+
+                if similarity < self.threshold:
+                    self.misses += 1
+                    return None
+
+                entry = self._entries[slot]
+                if now - entry['created_at'] <= self.ttl_seconds:
+                    break
+                self._remove(slot)
+                self.expirations += 1
+                similarities[slot] = -np.inf
+
+            self._entries.move_to_end(slot)
+            self.hits += 1
+
+            return {
+                'answer': entry['answer'],
+                'sources': list(entry['sources']),
+                'usage': dict(entry['usage']),
+                'similarity': similarity
+            }
+
+    def store(
+        self,
+        embedding: List[float],
+        top_k: int,
+        answer: str,
+        sources: List[str],
+        usage: Dict,
+        version=None
+    ):
+        """Add an answer to the cache, evicting LRU entries as needed"""
+        with self._lock:
+            self._check_version(version)
+
+            vector = self._normalize(embedding)
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+            size = (
+                vector.nbytes
+                + len(answer.encode('utf-8'))
+                + sum(len(s) for s in sources)
+                + ENTRY_OVERHEAD_BYTES
+            )
+            if size > self.max_bytes:
+                return
+
+            # Drop expired entries first, then least recently used ones
+            now = time.monotonic()
+            for slot in [s for s, e in self._entries.items() if now - e['created_at'] > self.ttl_seconds]:
+                self._remove(slot)
+                self.expirations += 1
+
+            while self._entries and (not self._free_slots or self._bytes + size > self.max_bytes):
+                slot = next(iter(self._entries))
+                self._remove(slot)
+                self.evictions += 1
+
+            slot = self._free_slots.pop()
+            self._matrix[slot] = vector
+            self._top_k[slot] = top_k
+            self._valid[slot] = True
+            self._entries[slot] = {
+                'answer': answer,
+                'sources': list(sources),
+                'usage': dict(usage or {}),
+                'created_at': now,
+                'size': size
+            }
+            self._bytes += size
+
+    def invalidate(self):
+        """Drop every cached answer"""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'threshold': self.threshold,
+                'ttl_seconds': self.ttl_seconds
+            }
@@ -0,0 +1,165 @@
+"""
+Streaming text chunker
+Single pass over token offsets: chunks are sized in embedding-model tokens,
+cut at the last sentence end that fits, and overlap by token offset, so no
+chunk text is ever rebuilt or re-split.
+"""
+
+import re
+import unicodedata
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from rag.embeddings import MAX_SEQ_LENGTH
+
+
+# [CLS] and [SEP] take two positions of the model's max sequence length
+SPECIAL_TOKENS = 2
+CHUNK_TOKENS = MAX_SEQ_LENGTH - SPECIAL_TOKENS
+CHUNK_OVERLAP_TOKENS = 48
+# Chunks shorter than this (characters) carry too little to be worth indexing
+MIN_CHUNK_CHARS = 50
+
+# Words and single punctuation marks: BERT's pre-tokenization, used when no
+# model tokenizer is available (wordpieces can only add to this count)
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+SENTENCE_END_CHARS = frozenset(".!?")
+
+LINE_BREAKS = re.compile(r"\r\n?")
+WHITESPACE = re.compile(r"\s+")
+ALNUM = re.compile(r"[A-Za-z0-9]")
+
+Span = Tuple[int, int]
+
+
+def clean_text(text: str) -> str:
+    """NFKC-normalize, drop blank and symbol-only lines, collapse whitespace"""
+    text = LINE_BREAKS.sub("\n", unicodedata.normalize("NFKC", text))
+
+    cleaned_lines = []
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if len(stripped) < 4 and not ALNUM.search(stripped):
+            continue
+        cleaned_lines.append(stripped)
+
+    return WHITESPACE.sub(" ", " ".join(cleaned_lines)).strip()
+
+
+def regex_offsets(text: str) -> Iterator[Span]:
+    for match in TOKEN_PATTERN.finditer(text):
+        yield match.span()
+
+
+def tokenizer_offsets(tokenizer) -> Callable[[str], List[Span]]:
+    """Character offsets of every token, for a `tokenizers` or transformers fast tokenizer
+
+    Truncation and padding are disabled on a private copy, since a whole
+    document is tokenized at once.
+    """
+    if hasattr(tokenizer, 'no_truncation'):
+        from tokenizers import Tokenizer
+
+        tokenizer = Tokenizer.from_str(tokenizer.to_str())
+        tokenizer.no_truncation()
+        tokenizer.no_padding()
+
+        def offsets(text: str) -> List[Span]:
+            return tokenizer.encode(text, add_special_tokens=False).offsets
+    else:
+        def offsets(text: str) -> List[Span]:
+            return tokenizer(
+                text,
+                add_special_tokens=False,
+                return_offsets_mapping=True,
+                truncation=False,
+                verbose=False
+            )['offset_mapping']
+
+    return offsets
+
+
+class StreamingChunker:
+    """Token-budgeted chunker that yields chunks lazily
+
+    Without a tokenizer, tokens are approximated by TOKEN_PATTERN matches;
+    with one (see for_model), budgets are exact model tokens.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = CHUNK_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        tokenizer=None,
+        min_chars: int = MIN_CHUNK_CHARS
+    ):
+        if not 0 <= overlap_tokens < max_tokens // 2:
+            raise ValueError("overlap_tokens must be less than half of max_tokens")
+
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_chars = min_chars
+        self.tokenizer_name = type(tokenizer).__name__ if tokenizer is not None else "regex"
+        self.offsets = tokenizer_offsets(tokenizer) if tokenizer is not None else regex_offsets
+
+    @classmethod
+    def for_model(cls, model, overlap_tokens: int = CHUNK_OVERLAP_TOKENS, **kwargs) -> "StreamingChunker":
+        """Chunker sized to a SentenceTransformer's (or OnnxEmbedder's) max sequence length"""
+        max_seq_length = getattr(model, 'max_seq_length', None) or MAX_SEQ_LENGTH
+        tokenizer = getattr(model, 'tokenizer', None)
+        return cls(max_tokens=max_seq_length - SPECIAL_TOKENS, overlap_tokens=overlap_tokens, tokenizer=tokenizer, **kwargs)
+
+    def config(self) -> Dict:
+        """Settings that change chunk boundaries"""
+        return {
+            'chunk_tokens': self.max_tokens,
+            'chunk_overlap_tokens': self.overlap_tokens,
+            'min_chunk_chars': self.min_chars,
+            'tokenizer': self.tokenizer_name
+        }
+
+    def _overlap_start(self, text: str, spans: List[Span], cut: int) -> int:
+        """First token of the next chunk: overlap_tokens back from the cut, snapped to a word start"""
+        if not self.overlap_tokens:
+            return cut
+        start = max(cut - self.overlap_tokens, 1)
+        # Look back at most another overlap_tokens (long URLs have no word starts)
+        for candidate in range(start, max(start - self.overlap_tokens, 1) - 1, -1):
+            if text[spans[candidate][0] - 1].isspace():
+                return candidate
+        return start
+
+    def chunks(self, text: str) -> Iterator[str]:
+        """Yield chunks of already-cleaned text"""
+        # Token spans of the chunk being built
+        spans: List[Span] = []
+        # Number of leading spans that end on a sentence boundary
+        boundary = 0
+        # Whether spans hold anything beyond the previous chunk's overlap
+        pending = False
+
+        for span in self.offsets(text):
+            spans.append(span)
+            pending = True
+            if text[span[1] - 1] in SENTENCE_END_CHARS:
+                boundary = len(spans)
+
+            if len(spans) < self.max_tokens:
+                continue
+
+            # Prefer ending on a sentence, unless that leaves a short chunk
+            cut = boundary if boundary > self.max_tokens // 2 else len(spans)
+            chunk = text[spans[0][0]:spans[cut - 1][1]]
+            if len(chunk) >= self.min_chars:
+                yield chunk
+
+            start = self._overlap_start(text, spans, cut)
+            del spans[:start]
+            boundary = 0
+            pending = cut < len(spans) + start
+
+        if spans and pending:
+            chunk = text[spans[0][0]:spans[-1][1]]
+            if len(chunk) >= self.min_chars:
+                yield chunk
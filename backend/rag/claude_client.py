@@ -3,79 +3,205 @@ Claude API client for generating responses
 """
 
 import os
-from anthropic import Anthropic
-from typing import Dict
+from anthropic import Anthropic, AsyncAnthropic
+from typing import AsyncIterator, Dict, Iterator, List
 from dotenv import load_dotenv
 
+from rag.log import get_logger
+from rag.prompts import SYSTEM_PROMPT, build_prompt, build_prompt_parts
 
-SYSTEM_PROMPT = """You are a helpful AI assistant specializing in answering questions about Sierra AI, their products, values, and opportunities.
 
-Your knowledge comes exclusively from the provided context documents from Sierra's website. Follow these rules strictly:
-
-1. ONLY answer based on information in the provided context
-2. If the answer is not clearly supported by the context, say "I don't have enough information in my knowledge base to answer that question accurately."
-3. When you provide an answer, be specific and professional
-4. Cite which source you're drawing from when relevant
-5. Maintain Sierra's tone: professional, clear, customer-obsessed, and helpful
-6. Never make up or hallucinate information - stick to the facts provided
-
-Remember: It's better to say you don't know than to provide inaccurate information."""
+logger = get_logger(__name__)
 
 
 class ClaudeClient:
-    def __init__(self, api_key: str = None):
+    def __init__(
+        self,
+        api_key: str = None,
+        async_http_client=None,
+        base_url: str = None,
+        max_retries: int = 2,
+        prompt_caching: bool = True
+    ):
         load_dotenv()
         self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY not found in environment")
 
-        self.client = Anthropic(api_key=self.api_key)
+        # base_url lets tests and benchmarks point at a local stub server
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.client = Anthropic(api_key=self.api_key, base_url=base_url, max_retries=max_retries)
         self.model = "claude-3-5-sonnet-20241022"
+        self.prompt_caching = prompt_caching
+
+        # Async client for the ASGI server; shares the caller's httpx pool
+        self.async_http_client = async_http_client
+        self._async_client = None
+
+    @property
+    def async_client(self) -> AsyncAnthropic:
+        if self._async_client is None:
+            self._async_client = AsyncAnthropic(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=self.max_retries,
+                http_client=self.async_http_client
+            )
+        return self._async_client
+
+    def _with_timeout(self, client, timeout: float = None):
+        """Apply a per-call deadline; None keeps the SDK default"""
+        return client if timeout is None else client.with_options(timeout=timeout)
+
+    def build_prompt(self, user_message: str, context: str) -> str:
+        """Build the user prompt from retrieved context and the question"""
+        return build_prompt(user_message, context)
+
+    def build_request(self, user_message: str, context: str, history: List[Dict] = None) -> Dict:
+        """Keyword arguments for messages.create / messages.stream
+
+        history is a list of chat messages from earlier turns; 'system'
+        entries (the session summary) join the system prompt. With prompt
+        caching on, the system prompt, the end of the history and the
+        context prefix are marked as cache breakpoints, so later turns and
+        repeats of the same sources only pay for what is new. (Prefixes
+        below the model's minimum cacheable length are simply not cached.)
+        """
+        history = history or []
+        notes = [message["content"] for message in history if message["role"] == "system"]
+        turns = [dict(message) for message in history if message["role"] != "system"]
+
+        if not self.prompt_caching:
+            return {
+                "model": self.model,
+                "max_tokens": 2048,
+                "system": "\n\n".join([SYSTEM_PROMPT, *notes]),
+                "messages": [
+                    *turns,
+                    {
+                        "role": "user",
+                        "content": self.build_prompt(user_message, context)
+                    }
+                ]
+            }
 
-    def generate_response(self, user_message: str, context: str) -> Dict[str, str]:
+        prefix, question = build_prompt_parts(user_message, context)
+
+        system = [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}]
+        system += [{"type": "text", "text": note} for note in notes]
+
+        if turns:
+            turns[-1]["content"] = [
+                {"type": "text", "text": turns[-1]["content"], "cache_control": {"type": "ephemeral"}}
+            ]
+
+        return {
+            "model": self.model,
+            "max_tokens": 2048,
+            "system": system,
+            "messages": [
+                *turns,
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+                        {"type": "text", "text": question}
+                    ]
+                }
+            ]
+        }
+
+    def parse_response(self, response) -> Dict:
+        """Convert a message into the {answer, model, usage} dict"""
+        # Extract text content
+        answer = ""
+        for block in response.content:
+            if block.type == "text":
+                answer = block.text
+                break
+
+        return {
+            "answer": answer,
+            "model": response.model,
+            "usage": self.parse_usage(response.usage)
+        }
+
+    def parse_usage(self, usage) -> Dict:
+        """Token counts, including prompt-cache writes and reads
+
+        input_tokens excludes cached tokens; cached_input_tokens is the
+        same key OpenAIClient reports, so the two can be compared.
+        """
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        return {
+            "input_tokens": usage.input_tokens,
+            "output_tokens": usage.output_tokens,
+            "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+            "cache_read_input_tokens": cache_read,
+            "cached_input_tokens": cache_read
+        }
+
+    def generate_response(self, user_message: str, context: str, timeout: float = None, history: List[Dict] = None) -> Dict[str, str]:
         """Generate a response using Claude"""
 
-        prompt = f"""Context information from Sierra AI's website:
+        try:
+            response = self._with_timeout(self.client, timeout).messages.create(**self.build_request(user_message, context, history))
+            return self.parse_response(response)
+
+        except Exception as e:
+            logger.error(f"Error calling Claude API: {e}")
+            raise
+
+    async def agenerate_response(self, user_message: str, context: str, timeout: float = None, history: List[Dict] = None) -> Dict[str, str]:
+        """Async variant of generate_response"""
+
+        try:
+            response = await self._with_timeout(self.async_client, timeout).messages.create(**self.build_request(user_message, context, history))
+            return self.parse_response(response)
+
+        except Exception as e:
+            logger.error(f"Error calling Claude API: {e}")
+            raise
 
-{context}
+    def stream_response(self, user_message: str, context: str, timeout: float = None, history: List[Dict] = None) -> Iterator[Dict]:
+        """Stream a response from Claude
 
----
+        Yields {"type": "token", "text": ...} events as the completion is
+        generated, followed by a single {"type": "usage", ...} event.
+        """
+
+        try:
+            with self._with_timeout(self.client, timeout).messages.stream(**self.build_request(user_message, context, history)) as stream:
+                for text in stream.text_stream:
+                    if text:
+                        yield {"type": "token", "text": text}
 
-User question: {user_message}
+                response = stream.get_final_message()
+
+            result = self.parse_response(response)
+            yield {"type": "usage", "model": result["model"], "usage": result["usage"]}
+
+        except Exception as e:
+            logger.error(f"Error streaming from Claude API: {e}")
+            raise
 
-Please answer the user's question based solely on the context provided above. If the context doesn't contain enough information to answer accurately, say so."""
+    async def astream_response(self, user_message: str, context: str, timeout: float = None, history: List[Dict] = None) -> AsyncIterator[Dict]:
+        """Async variant of stream_response"""
 
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=2048,
-                system=SYSTEM_PROMPT,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
+            async with self._with_timeout(self.async_client, timeout).messages.stream(**self.build_request(user_message, context, history)) as stream:
+                async for text in stream.text_stream:
+                    if text:
+                        yield {"type": "token", "text": text}
 
-            # Extract text content
-            answer = ""
-            for block in response.content:
-                if block.type == "text":
-                    answer = block.text
-                    break
+                response = await stream.get_final_message()
 
-            return {
-                "answer": answer,
-                "model": response.model,
-                "usage": {
-                    "input_tokens": response.usage.input_tokens,
-                    "output_tokens": response.usage.output_tokens
-                }
-            }
+            result = self.parse_response(response)
+            yield {"type": "usage", "model": result["model"], "usage": result["usage"]}
 
         except Exception as e:
-            print(f"Error calling Claude API: {e}")
+            logger.error(f"Error streaming from Claude API: {e}")
             raise
 
 
@@ -102,4 +228,5 @@ if __name__ == "__main__":
     print(f"Answer: {result['answer']}\n")
     print(f"Model: {result['model']}")
     print(f"Tokens: {result['usage']['input_tokens']} in, {result['usage']['output_tokens']} out")
+    print(f"Prompt cache: {result['usage']['cache_creation_input_tokens']} written, {result['usage']['cache_read_input_tokens']} read")
     
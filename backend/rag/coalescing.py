@@ -0,0 +1,309 @@
+"""
+Single-flight request coalescing
+Identical questions arriving together (a shared link, a retrying client)
+run the pipeline once: the first request for a key does the work and every
+concurrent request for the same key waits for, and shares, its result.
+Streams are broadcast: each subscriber replays the events so far, then
+follows the live ones.
+
+Thread versions serve Flask; the async ones serve the ASGI app.
+"""
+
+import asyncio
+import threading
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterator, List, Tuple
+
+from rag.embedding_cache import normalize_text
+from rag.metrics import COALESCED_REQUESTS
+
+
+def coalesce_key(user_message: str, top_k: int) -> Tuple[str, int]:
+    """Requests that would produce the same answer share a key"""
+    return (normalize_text(user_message).casefold(), int(top_k))
+
+
+class SingleFlight:
+    """Run fn once per key among concurrent callers (threads)"""
+
+    def __init__(self, mode: str = "answer"):
+        self.mode = mode
+        self._flights: Dict[Hashable, Dict] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable):
+        """fn()'s result (or exception), shared with callers that arrive while it runs"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = {'done': threading.Event(), 'result': None, 'error': None}
+                self._flights[key] = flight
+
+        COALESCED_REQUESTS.inc(mode=self.mode, role="leader" if leader else "follower")
+        if not leader:
+            flight['done'].wait()
+            if flight['error'] is not None:
+                raise flight['error']
+            return flight['result']
+
+        try:
+            flight['result'] = fn()
+            return flight['result']
+        except Exception as e:
+            flight['error'] = e
+            raise
+        finally:
+            # Later arrivals start a fresh flight (and may hit the answer cache)
+            with self._lock:
+                del self._flights[key]
+            flight['done'].set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+
+class Broadcast:
+    """Events of one stream, kept so late subscribers can replay them (threads)"""
+
+    def __init__(self):
+        self.events: List = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self._cond = threading.Condition()
+
+    def publish(self, event):
+        with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def close(self, error: Exception = None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    @property
+    def abandoned(self) -> bool:
+        return self.subscribers == 0
+
+    def subscribe(self) -> Iterator:
+        """Counted as a subscriber from now on, not from the first next()"""
+        with self._cond:
+            self.subscribers += 1
+        return self._follow()
+
+    def _follow(self) -> Iterator:
+        try:
+            i = 0
+            while True:
+                with self._cond:
+                    while i == len(self.events) and not self.done:
+                        self._cond.wait()
+                    pending = self.events[i:]
+                    finished = self.done
+                i += len(pending)
+                yield from pending
+                if finished and i == len(self.events):
+                    if self.error is not None:
+                        raise self.error
+                    return
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+
+class StreamFlight:
+    """One producer per key, broadcast to every concurrent subscriber (threads)
+
+    The producer runs on its own thread, so a subscriber disconnecting
+    (including the first one) never stalls the others; it stops early
+    only once every subscriber has gone. Subscribing and giving up happen
+    under the same lock, so a late arrival either keeps the stream alive
+    or starts a new one, never joining a stream that is shutting down.
+    """
+
+    def __init__(self, mode: str = "stream"):
+        self.mode = mode
+        self._flights: Dict[Hashable, Broadcast] = {}
+        self._lock = threading.Lock()
+
+    def stream(self, key: Hashable, produce: Callable[[], Iterator]) -> Iterator:
+        with self._lock:
+            broadcast = self._flights.get(key)
+            leader = broadcast is None
+            if leader:
+                broadcast = Broadcast()
+                self._flights[key] = broadcast
+            events = broadcast.subscribe()
+
+        COALESCED_REQUESTS.inc(mode=self.mode, role="leader" if leader else "follower")
+        if leader:
+            threading.Thread(
+                target=self._run, args=(key, broadcast, produce), name="stream-flight", daemon=True
+            ).start()
+        return events
+
+    def _run(self, key: Hashable, broadcast: Broadcast, produce: Callable[[], Iterator]):
+        error = None
+        iterator = produce()
+        try:
+            for event in iterator:
+                broadcast.publish(event)
+                if self._give_up(key, broadcast):
+                    break
+        except Exception as e:
+            error = e
+        finally:
+            self._discard(key, broadcast)
+            broadcast.close(error)
+            # Closing the upstream can be slow; new requests already start afresh
+            iterator.close()
+
+    def _give_up(self, key: Hashable, broadcast: Broadcast) -> bool:
+        """Stop (and unlist) the stream if nobody is subscribed"""
+        with self._lock:
+            if not broadcast.abandoned:
+                return False
+            self._flights.pop(key, None)
+            return True
+
+    def _discard(self, key: Hashable, broadcast: Broadcast):
+        with self._lock:
+            if self._flights.get(key) is broadcast:
+                del self._flights[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+
+class AsyncSingleFlight:
+    """SingleFlight for the event loop
+
+    The work runs as its own task, so a waiter being cancelled (client
+    disconnect) does not cancel it for the others.
+    """
+
+    def __init__(self, mode: str = "answer"):
+        self.mode = mode
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        task = self._flights.get(key)
+        leader = task is None
+        if leader:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda _: self._flights.pop(key, None))
+
+        COALESCED_REQUESTS.inc(mode=self.mode, role="leader" if leader else "follower")
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+
+class AsyncBroadcast:
+    """Broadcast for the event loop"""
+
+    def __init__(self):
+        self.events: List = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.task = None
+        # Called when the last subscriber leaves early, before the task is cancelled
+        self.on_abandoned = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event):
+        self.events.append(event)
+        self._changed.set()
+
+    def close(self, error: Exception = None):
+        self.done = True
+        self.error = error
+        self._changed.set()
+
+    def subscribe(self) -> AsyncIterator:
+        self.subscribers += 1
+        return self._follow()
+
+    async def _follow(self) -> AsyncIterator:
+        try:
+            i = 0
+            while True:
+                while i == len(self.events) and not self.done:
+                    self._changed.clear()
+                    await self._changed.wait()
+                pending = self.events[i:]
+                finished = self.done
+                i += len(pending)
+                for event in pending:
+                    yield event
+                if finished and i == len(self.events):
+                    if self.error is not None:
+                        raise self.error
+                    return
+        finally:
+            self.subscribers -= 1
+            # Last one out stops the producer, freeing whatever it holds
+            if self.subscribers == 0 and not self.done and self.task is not None:
+                if self.on_abandoned is not None:
+                    self.on_abandoned()
+                self.task.cancel()
+
+
+class AsyncStreamFlight:
+    """StreamFlight for the event loop; the producer is a task per key"""
+
+    def __init__(self, mode: str = "stream"):
+        self.mode = mode
+        self._flights: Dict[Hashable, AsyncBroadcast] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    def stream(self, key: Hashable, produce: Callable[[], AsyncIterator], on_done: Callable = None) -> AsyncIterator:
+        """Subscribe to the stream for key, starting it with produce() if none is running
+
+        on_done (leader only) runs when the producer finishes, fails or is
+        cancelled, e.g. to release what the leader acquired for it.
+        """
+        broadcast = self._flights.get(key)
+        leader = broadcast is None
+        if leader:
+            broadcast = AsyncBroadcast()
+            self._flights[key] = broadcast
+            # Unlisted at once, so requests arriving while it winds down start afresh
+            broadcast.on_abandoned = lambda: self._discard(key, broadcast)
+            broadcast.task = asyncio.ensure_future(self._run(key, broadcast, produce))
+            if on_done is not None:
+                broadcast.task.add_done_callback(lambda _: on_done())
+
+        COALESCED_REQUESTS.inc(mode=self.mode, role="leader" if leader else "follower")
+        return broadcast.subscribe()
+
+    async def _run(self, key: Hashable, broadcast: AsyncBroadcast, produce: Callable[[], AsyncIterator]):
+        error = None
+        events = produce()
+        try:
+            async for event in events:
+                broadcast.publish(event)
+        except asyncio.CancelledError:
+            error = ConnectionAbortedError("Every subscriber disconnected")
+        except Exception as e:
+            error = e
+        finally:
+            self._discard(key, broadcast)
+            broadcast.close(error)
+            await events.aclose()
+
+    def _discard(self, key: Hashable, broadcast: AsyncBroadcast):
+        if self._flights.get(key) is broadcast:
+            del self._flights[key]
+
+    def in_flight(self) -> int:
+        return len(self._flights)
@@ -0,0 +1,109 @@
+"""
+Near-duplicate chunk detection
+MinHash signatures over word shingles, bucketed with LSH banding, so
+boilerplate repeated across pages (CTAs, testimonials, navigation text)
+collapses into one chunk instead of crowding real content out of top_k.
+"""
+
+import re
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+NUM_PERM = 128
+# 16 bands of 8 rows: pairs above ~0.7 Jaccard almost always share a bucket
+LSH_BANDS = 16
+SHINGLE_WORDS = 5
+# Estimated Jaccard similarity at which two chunks count as duplicates
+DEDUP_THRESHOLD = 0.8
+
+# Chroma metadata values must be scalars, so merged URL lists are joined
+URLS_SEPARATOR = " "
+
+MERSENNE_PRIME = (1 << 31) - 1
+WORD = re.compile(r"\w+")
+
+
+def split_urls(metadata: Dict) -> List[str]:
+    """Every source URL of a (possibly merged) chunk"""
+    urls = metadata.get('urls')
+    if urls:
+        return urls.split(URLS_SEPARATOR)
+    url = metadata.get('url', '')
+    return [url] if url else []
+
+
+class NearDuplicateIndex:
+    """Streaming MinHash LSH: add() each chunk, get back the chunk it duplicates
+
+    The first chunk of a near-duplicate group is its canonical member;
+    later near-duplicates map to it and are never embedded.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEDUP_THRESHOLD,
+        num_perm: int = NUM_PERM,
+        bands: int = LSH_BANDS,
+        shingle_words: int = SHINGLE_WORDS,
+        seed: int = 1
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_words = shingle_words
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+        self._b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+
+        # One dict per band: band hash -> canonical keys in that bucket
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+
+    def shingles(self, text: str) -> np.ndarray:
+        words = WORD.findall(text.lower())
+        if len(words) <= self.shingle_words:
+            grams = [" ".join(words)]
+        else:
+            grams = [" ".join(words[i:i + self.shingle_words]) for i in range(len(words) - self.shingle_words + 1)]
+        # crc32 is stable across processes (unlike hash()), reduced below the prime
+        return np.unique(np.array([zlib.crc32(g.encode('utf-8')) for g in grams], dtype=np.int64) % MERSENNE_PRIME)
+
+    def signature(self, text: str) -> np.ndarray:
+        """Minimum of each universal hash (a*x + b mod p) over the shingles"""
+        shingles = self.shingles(text)
+        hashed = (np.outer(shingles, self._a) + self._b) % MERSENNE_PRIME
+        return hashed.min(axis=0)
+
+    def add(self, key: str, text: str) -> Optional[str]:
+        """Index a chunk; returns the canonical key if it is a near-duplicate"""
+        signature = self.signature(text)
+        bands = [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+        candidates = set()
+        for bucket, band in zip(self._buckets, bands):
+            candidates.update(bucket.get(band, ()))
+
+        best_key, best_similarity = None, self.threshold
+        for candidate in candidates:
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= best_similarity:
+                best_key, best_similarity = candidate, similarity
+
+        if best_key is not None:
+            return best_key
+
+        self._signatures[key] = signature
+        for bucket, band in zip(self._buckets, bands):
+            bucket.setdefault(band, []).append(key)
+        return None
+
+    def __len__(self) -> int:
+        return len(self._signatures)
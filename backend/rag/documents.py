@@ -0,0 +1,107 @@
+"""
+Scraped document files
+JSON arrays (the original format) and append-only JSONL, one document per
+line, which the scraper can write while ingestion reads.
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+
+# How often a following reader polls a JSONL file for new lines
+FOLLOW_POLL_SECONDS = 0.2
+
+
+def iter_documents(path: str, follow_idle: float = 0) -> Iterator[Dict[str, str]]:
+    """Yield documents from a JSON array or a JSONL file
+
+    JSONL is read line by line, so memory stays flat however large the
+    file. With follow_idle > 0 the reader keeps tailing the file (like
+    `tail -f`) until no new line has arrived for that many seconds; a
+    partially written last line is held back until it is complete, and
+    skipped if it never is.
+
+    Every occurrence of a URL is yielded; consumers that stream (pipelined
+    ingestion) let later ones replace earlier ones. Use load_documents()
+    for the de-duplicated corpus.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        head = f.read(1)
+        while head.isspace():
+            head = f.read(1)
+
+        if head == '[':
+            f.seek(0)
+            yield from json.load(f)
+            return
+
+        f.seek(0)
+        partial = ""
+        last_line_at = time.monotonic()
+        while True:
+            line = f.readline()
+            if line:
+                partial += line
+                # Only the last line can lack a newline; wait for more or for EOF
+                if not partial.endswith("\n"):
+                    continue
+                if partial.strip():
+                    yield json.loads(partial)
+                partial = ""
+                last_line_at = time.monotonic()
+                continue
+
+            if follow_idle <= 0 or time.monotonic() - last_line_at > follow_idle:
+                break
+            time.sleep(FOLLOW_POLL_SECONDS)
+
+        # A writer that died mid-line leaves a truncated record behind
+        if partial.strip():
+            try:
+                yield json.loads(partial)
+            except json.JSONDecodeError:
+                print(f"Skipping truncated last line of {path}")
+
+
+def load_documents(path: str) -> List[Dict[str, str]]:
+    """Every document in the file, one per URL
+
+    An append-only JSONL file may hold several versions of a URL; the last
+    one wins, in the position of its last occurrence.
+    """
+    by_url: Dict[str, Dict[str, str]] = {}
+    for doc in iter_documents(path):
+        by_url.pop(doc['url'], None)
+        by_url[doc['url']] = doc
+    return list(by_url.values())
+
+
+class JsonlWriter:
+    """Thread-safe append-only JSONL writer, flushed after every document"""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def write(self, doc: Dict[str, str]):
+        line = json.dumps(doc, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
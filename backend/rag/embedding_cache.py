@@ -0,0 +1,175 @@
+"""
+Persistent embedding cache
+SQLite key/vector store keyed by hash(model + normalized text), so chunks
+whose text survives a chunking or cleaning change are not re-embedded and
+repeated query strings skip the encoder. Size-bounded with LRU eviction.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from rag.embeddings import EMBEDDING_MODEL
+from rag.metrics import EMBEDDING_CACHE_LOOKUPS
+
+
+EMBEDDING_CACHE_PATH = "./data/embedding_cache.sqlite3"
+# The server's query cache gets its own file, so ingestion never contends with it
+QUERY_EMBEDDING_CACHE_PATH = "./data/query_embedding_cache.sqlite3"
+EMBEDDING_CACHE_MAX_ENTRIES = 100000
+# A hit only rewrites last_used when it is older than this: recency is
+# approximate, but hot queries don't turn every lookup into a write
+TOUCH_INTERVAL_SECONDS = 300
+# When full, evict down to this share of max_entries in one statement
+EVICT_TO = 0.9
+# SQLite's default limit on bound parameters is 999
+LOOKUP_BATCH = 500
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def model_key(embedding_backend: str) -> str:
+    """Cache namespace: the quantized ONNX export embeds slightly differently"""
+    return f"{EMBEDDING_MODEL}:{embedding_backend}"
+
+
+def normalize_text(text: str) -> str:
+    """NFKC and collapsed whitespace: the same text however it was spaced"""
+    return WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class EmbeddingCache:
+    """Thread-safe vector cache for one embedding model
+
+    `model_key` must change whenever vectors would (model name, runtime,
+    quantization), since it is part of every key.
+    """
+
+    def __init__(self, path: str, model_key: str, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES, name: str = "document"):
+        self.path = path
+        self.model_key = model_key
+        self.max_entries = max_entries
+        # Metrics label: "document" (ingestion) or "query" (retrieval)
+        self.name = name
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.commit()
+        self._count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_key}\0{normalize_text(text)}".encode('utf-8')).digest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached vectors in input order, None for misses"""
+        return self._lookup([self.key(text) for text in texts])
+
+    def _lookup(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        found: Dict[bytes, np.ndarray] = {}
+
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            now = time.time()
+            stale = []
+            for i in range(0, len(unique_keys), LOOKUP_BATCH):
+                batch = unique_keys[i:i + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                for key, vector, last_used in self._db.execute(
+                    f"SELECT key, vector, last_used FROM embeddings WHERE key IN ({placeholders})", batch
+                ):
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+                    if now - last_used > TOUCH_INTERVAL_SECONDS:
+                        stale.append((now, key))
+
+            if stale:
+                self._db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", stale)
+                self._db.commit()
+
+            hits = sum(key in found for key in keys)
+            self.hits += hits
+            self.misses += len(keys) - hits
+
+        EMBEDDING_CACHE_LOOKUPS.inc(hits, cache=self.name, result="hit")
+        EMBEDDING_CACHE_LOOKUPS.inc(len(keys) - hits, cache=self.name, result="miss")
+        return [found.get(key) for key in keys]
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        self._store([self.key(text) for text in texts], vectors)
+
+    def _store(self, keys: List[bytes], vectors: np.ndarray):
+        now = time.time()
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in zip(keys, vectors)]
+        with self._lock:
+            self._db.executemany("INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows)
+            # Recounted rather than tracked: another process may write the same file.
+            # Stores only follow an encoder call, which costs far more than the count.
+            self._count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if self._count > self.max_entries:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Drop least recently used vectors down to EVICT_TO of capacity"""
+        excess = self._count - int(self.max_entries * EVICT_TO)
+        self._db.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self._count -= excess
+        self.evictions += excess
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Vectors for texts, calling encode_fn once with only the (distinct) misses"""
+        keys = [self.key(text) for text in texts]
+        vectors = self._lookup(keys)
+
+        # Texts that normalize to the same key are encoded once
+        missing: Dict[bytes, List[int]] = {}
+        for i, (key, vector) in enumerate(zip(keys, vectors)):
+            if vector is None:
+                missing.setdefault(key, []).append(i)
+
+        if missing:
+            miss_keys = list(missing)
+            encoded = np.asarray(encode_fn([texts[missing[key][0]] for key in miss_keys]), dtype=np.float32)
+            self._store(miss_keys, encoded)
+            for key, vector in zip(miss_keys, encoded):
+                for i in missing[key]:
+                    vectors[i] = vector
+
+        return np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'path': self.path,
+                'entries': self._count,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,276 @@
+"""
+Embedding backends
+PyTorch (sentence-transformers) or a quantized ONNX export run by onnxruntime
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Union
+
+import numpy as np
+
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+HF_MODEL_NAME = f"sentence-transformers/{EMBEDDING_MODEL}"
+ONNX_MODEL_DIR = "./onnx_model"
+ONNX_FP32_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+MAX_SEQ_LENGTH = 256
+EMBEDDING_DIM = 384
+
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+# Parity thresholds for the ONNX backend against PyTorch
+MIN_COSINE = 0.98
+MIN_TOPK_OVERLAP = 0.8
+
+PARITY_QUERIES = [
+    "What are Sierra's core values?",
+    "Who founded Sierra?",
+    "What does the Agent SDK do?",
+    "What is the software engineer job description?",
+    "How does Sierra handle customer experience?",
+    "Where is Sierra headquartered?",
+    "What industries does Sierra work with?",
+    "How do Sierra agents take actions?",
+]
+
+
+class OnnxEmbedder:
+    """Mean-pooled, L2-normalized MiniLM embeddings from an ONNX graph
+
+    Exposes the subset of SentenceTransformer.encode() the RAG code uses,
+    without importing torch or transformers at runtime.
+    """
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, quantized: bool = True, max_seq_length: int = MAX_SEQ_LENGTH):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_dir = model_dir
+        self.max_seq_length = max_seq_length
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        model_file = ONNX_INT8_FILE if quantized else ONNX_FP32_FILE
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file),
+            options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _encode_batch(self, sentences: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(sentences)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then normalize (as the ST pipeline does)
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        embeddings = summed / counts
+        norms = np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return (embeddings / norms).astype(np.float32)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        if not sentences:
+            return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+
+        # Sort by length so each batch pads to a similar size
+        order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+        embeddings = [None] * len(sentences)
+        for start in range(0, len(order), batch_size):
+            batch_rows = order[start:start + batch_size]
+            batch = self._encode_batch([sentences[i] for i in batch_rows])
+            for row, vector in zip(batch_rows, batch):
+                embeddings[row] = vector
+
+        embeddings = np.stack(embeddings)
+        return embeddings[0] if single else embeddings
+
+
+def load_embedding_model(backend: str = "torch", onnx_model_dir: str = ONNX_MODEL_DIR):
+    """Load the query/document encoder for the given backend
+
+    Imports are deferred so the ONNX backend never loads torch.
+    """
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(EMBEDDING_MODEL)
+
+    if backend == "onnx":
+        return OnnxEmbedder(onnx_model_dir)
+
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+def export_onnx(model_dir: str = ONNX_MODEL_DIR, opset: int = 14):
+    """Export all-MiniLM-L6-v2 to ONNX and write an int8 dynamically quantized copy
+
+    Needs torch and transformers, but only at export time.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(model_dir, exist_ok=True)
+    fp32_path = os.path.join(model_dir, ONNX_FP32_FILE)
+    int8_path = os.path.join(model_dir, ONNX_INT8_FILE)
+
+    print(f"Exporting {HF_MODEL_NAME} to {fp32_path}")
+    tokenizer = AutoTokenizer.from_pretrained(HF_MODEL_NAME)
+    model = AutoModel.from_pretrained(HF_MODEL_NAME).eval()
+
+    dummy = tokenizer(["Sierra builds conversational AI agents."], return_tensors="pt")
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "sequence"},
+        "token_type_ids": {0: "batch", 1: "sequence"},
+        "last_hidden_state": {0: "batch", 1: "sequence"},
+    }
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+
+    # Writes tokenizer.json, which the runtime reads via `tokenizers`
+    tokenizer.save_pretrained(model_dir)
+
+    print(f"Quantizing to int8: {int8_path}")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    for path in (fp32_path, int8_path):
+        print(f"  {os.path.basename(path)}: {os.path.getsize(path) / 1e6:.1f} MB")
+
+
+def check_parity(chroma_path: str = "./chroma_db", onnx_model_dir: str = ONNX_MODEL_DIR, top_k: int = 5) -> bool:
+    """Check that ONNX query vectors retrieve the same top-k as PyTorch
+
+    Compares vector cosine similarity directly, and top-k chunk ids
+    against the active knowledge base collection.
+    """
+    import chromadb
+    from rag.versioning import active_collection
+
+    torch_model = load_embedding_model("torch")
+    onnx_model = load_embedding_model("onnx", onnx_model_dir)
+
+    torch_vectors = torch_model.encode(PARITY_QUERIES)
+    onnx_vectors = onnx_model.encode(PARITY_QUERIES)
+    cosines = (torch_vectors * onnx_vectors).sum(axis=1)
+
+    collection = chromadb.PersistentClient(path=chroma_path).get_collection(active_collection(chroma_path))
+    torch_ids = collection.query(query_embeddings=torch_vectors.tolist(), n_results=top_k)['ids']
+    onnx_ids = collection.query(query_embeddings=onnx_vectors.tolist(), n_results=top_k)['ids']
+
+    overlaps = [
+        len(set(a) & set(b)) / max(len(a), 1)
+        for a, b in zip(torch_ids, onnx_ids)
+    ]
+
+    print(f"Cosine(torch, onnx): min {cosines.min():.4f}, mean {cosines.mean():.4f} (min allowed {MIN_COSINE})")
+    print(f"Top-{top_k} overlap: min {min(overlaps):.2f}, mean {sum(overlaps) / len(overlaps):.2f} "
+          f"(min allowed {MIN_TOPK_OVERLAP})")
+    top1 = sum(a[:1] == b[:1] for a, b in zip(torch_ids, onnx_ids))
+    print(f"Identical top-1: {top1}/{len(PARITY_QUERIES)}")
+
+    passed = cosines.min() >= MIN_COSINE and min(overlaps) >= MIN_TOPK_OVERLAP
+    print("Parity check passed" if passed else "Parity check FAILED")
+    return passed
+
+
+def _probe(backend: str, onnx_model_dir: str, iterations: int) -> Dict:
+    """Measure one backend in a fresh process (import time and RSS are per-process)"""
+    import resource
+
+    start = time.perf_counter()
+    model = load_embedding_model(backend, onnx_model_dir)
+    load_time = time.perf_counter() - start
+
+    model.encode(PARITY_QUERIES[0])  # warm-up
+    latencies = []
+    for i in range(iterations):
+        query = PARITY_QUERIES[i % len(PARITY_QUERIES)]
+        t = time.perf_counter()
+        model.encode(query)
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    latencies.sort()
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = max_rss / 1024 / 1024 if sys.platform == "darwin" else max_rss / 1024
+
+    return {
+        'backend': backend,
+        'import_load_seconds': round(load_time, 3),
+        'encode_ms_p50': round(latencies[len(latencies) // 2], 3),
+        'encode_ms_p95': round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        'peak_rss_mb': round(rss_mb, 1)
+    }
+
+
+def benchmark(onnx_model_dir: str = ONNX_MODEL_DIR, iterations: int = 200) -> List[Dict]:
+    """Report import+load time, single-query latency and peak RSS per backend"""
+    results = []
+    for backend in EMBEDDING_BACKENDS:
+        output = subprocess.run(
+            [sys.executable, "-m", "rag.embeddings", "probe",
+             "--backend", backend, "--onnx-dir", onnx_model_dir, "--iterations", str(iterations)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'backend':<8} {'import+load (s)':>16} {'p50 (ms)':>9} {'p95 (ms)':>9} {'RSS (MB)':>9}")
+    for r in results:
+        print(f"{r['backend']:<8} {r['import_load_seconds']:>16} {r['encode_ms_p50']:>9} "
+              f"{r['encode_ms_p95']:>9} {r['peak_rss_mb']:>9}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend tools")
+    parser.add_argument('command', choices=['export', 'parity', 'bench', 'probe'])
+    parser.add_argument('--onnx-dir', default=ONNX_MODEL_DIR)
+    parser.add_argument('--chroma-path', default="./chroma_db")
+    parser.add_argument('--backend', choices=EMBEDDING_BACKENDS, default="torch")
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export_onnx(args.onnx_dir)
+    elif args.command == 'parity':
+        sys.exit(0 if check_parity(args.chroma_path, args.onnx_dir) else 1)
+    elif args.command == 'bench':
+        benchmark(args.onnx_dir, args.iterations)
+    else:
+        print(json.dumps(_probe(args.backend, args.onnx_dir, args.iterations)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+HTML extraction
+Pure functions turning a raw page into title, cleaned text and links, so
+the scraper can run them in a process pool away from its fetch threads.
+Two interchangeable paths: BeautifulSoup (the original) and plain lxml,
+which skips building a soup tree.
+"""
+
+from typing import Dict, List
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, UnicodeDammit
+
+
+EXTRACTORS = ("soup", "lxml")
+
+# Elements whose text never belongs in the indexed content
+BOILERPLATE_TAGS = ("script", "style", "nav", "footer", "header")
+
+
+def clean_lines(text: str) -> str:
+    """Strip lines, split on double spaces and drop empty phrases"""
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+
+def normalize_link(base_url: str, href: str) -> str:
+    """Absolute URL without fragment or query string"""
+    return urljoin(base_url, href).split('#')[0].split('?')[0]
+
+
+def soup_text(soup: BeautifulSoup) -> str:
+    # Remove script and style elements
+    for script in soup(BOILERPLATE_TAGS):
+        script.decompose()
+
+    return clean_lines(soup.get_text(separator='\n'))
+
+
+def extract_with_soup(url: str, html: bytes) -> Dict:
+    soup = BeautifulSoup(html, 'lxml')
+
+    title = soup.find('title')
+    links: List[str] = [normalize_link(url, link['href']) for link in soup.find_all('a', href=True)]
+
+    return {
+        'title': title.get_text() if title else url,
+        'content': soup_text(soup),
+        'links': links
+    }
+
+
+def decode_html(html: bytes) -> str:
+    """UTF-8 if it decodes, else the encoding BeautifulSoup would have detected"""
+    try:
+        return html.decode('utf-8')
+    except UnicodeDecodeError:
+        return UnicodeDammit(html, is_html=True).unicode_markup or ""
+
+
+def lxml_text(root) -> str:
+    """Text nodes in document order, as soup.get_text(separator='\\n') joins them
+
+    Boilerplate elements and comments are skipped with their subtrees, but
+    their tails (text that follows them inside the parent) are kept.
+    """
+    from lxml import etree
+
+    parts = []
+    skipping = None
+    for event, element in etree.iterwalk(root, events=('start', 'end')):
+        if event == 'start':
+            if skipping is None:
+                if not isinstance(element.tag, str) or element.tag in BOILERPLATE_TAGS:
+                    skipping = element
+                elif element.text:
+                    parts.append(element.text)
+        else:
+            if element is skipping:
+                skipping = None
+            if skipping is None and element.tail and element is not root:
+                parts.append(element.tail)
+
+    return '\n'.join(parts)
+
+
+def extract_with_lxml(url: str, html: bytes) -> Dict:
+    """Same output as extract_with_soup, straight from lxml's tree"""
+    from lxml import etree, html as lxml_html
+
+    try:
+        root = lxml_html.document_fromstring(decode_html(html))
+    except ValueError:
+        # Unicode input with an XML encoding declaration; let lxml decode it
+        root = lxml_html.document_fromstring(html)
+    except etree.ParserError:
+        return {'title': url, 'content': "", 'links': []}
+
+    title = root.find('.//title')
+    links = [
+        normalize_link(url, element.get('href'))
+        for element in root.iter('a')
+        if element.get('href') is not None
+    ]
+
+    return {
+        'title': title.text_content() if title is not None else url,
+        'content': clean_lines(lxml_text(root)),
+        'links': links
+    }
+
+
+def extract_page(url: str, html: bytes, extractor: str = "soup") -> Dict:
+    """Title, cleaned text and (unfiltered) links of a page; picklable for process pools"""
+    if extractor == "lxml":
+        return extract_with_lxml(url, html)
+    if extractor == "soup":
+        return extract_with_soup(url, html)
+    raise ValueError(f"Unknown extractor: {extractor}")
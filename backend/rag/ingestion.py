@@ -3,140 +3,250 @@ Document ingestion pipeline
 Processes scraped content, chunks it, generates embeddings, and stores in ChromaDB
 """
 
+import argparse
 import json
-from typing import List, Dict
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Tuple
 from pathlib import Path
 import chromadb
 from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
 import hashlib
-import re
-import unicodedata
-from typing import List
-import nltk
-from nltk.tokenize import sent_tokenize
+
+from rag.chunking import StreamingChunker, clean_text
+from rag.dedup import DEDUP_THRESHOLD, URLS_SEPARATOR, NearDuplicateIndex
+from rag.documents import iter_documents, load_documents
+from rag.embedding_cache import EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_PATH, EmbeddingCache, model_key
+from rag.embeddings import EMBEDDING_BACKENDS, EMBEDDING_MODEL, ONNX_MODEL_DIR, load_embedding_model
+from rag.lexical import InvertedIndex, LEXICAL_INDEX_FILE
+from rag.versioning import CollectionAlias, next_version, version_dir
 
 # Configuration
-CHUNK_SIZE = 800
-CHUNK_OVERLAP = 200
-EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+MANIFEST_FILE = "ingest_manifest.json"
+
+# Bulk ingestion
+ENCODE_BATCH_SIZE = 256
+WRITE_BATCH_SIZE = 2048
+
+# Pipelined ingestion: items each stage queue may hold before its producer blocks
+STAGE_QUEUE_SIZE = 8
+QUEUE_POLL_SECONDS = 0.1
+
+# End-of-stream marker passed down the stage queues
+DONE = object()
+
+
+class Stage(threading.Thread):
+    """One pipeline stage: a worker thread between two bounded queues
+
+    `process(item)` returns the items to pass downstream and `flush()`
+    (optional) whatever is still buffered at end of stream. Busy time
+    excludes time spent blocked on a full downstream queue, so it shows
+    which stage is the bottleneck. An error in any stage sets `stop`,
+    which drains every other stage.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        process: Callable,
+        inbox: queue.Queue,
+        outbox: queue.Queue,
+        stop: threading.Event,
+        unit: str = "items",
+        size: Callable = None,
+        flush: Callable = None
+    ):
+        super().__init__(name=f"ingest-{name}", daemon=True)
+        self.stage_name = name
+        self.process = process
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop = stop
+        self.unit = unit
+        self.size = size or (lambda item: 1)
+        self.flush = flush
+        self.units = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.error = None
+
+    def put(self, item) -> bool:
+        start = time.perf_counter()
+        try:
+            while not self.stop.is_set():
+                try:
+                    self.outbox.put(item, timeout=QUEUE_POLL_SECONDS)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self.blocked += time.perf_counter() - start
+
+    def get(self):
+        while not self.stop.is_set():
+            try:
+                return self.inbox.get(timeout=QUEUE_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return DONE
+
+    def _emit(self, produce: Callable, *args):
+        blocked_before = self.blocked
+        start = time.perf_counter()
+        for output in produce(*args) or ():
+            if output is not None and self.outbox is not None:
+                self.put(output)
+        self.busy += time.perf_counter() - start - (self.blocked - blocked_before)
+
+    def run(self):
+        try:
+            while True:
+                item = self.get()
+                if item is DONE:
+                    break
+                self.units += self.size(item)
+                self._emit(self.process, item)
+            if self.flush is not None and not self.stop.is_set():
+                self._emit(self.flush)
+        except Exception as e:
+            self.error = e
+            self.stop.set()
+        finally:
+            if self.outbox is not None:
+                self.put(DONE)
+
+    def report(self, elapsed: float) -> str:
+        rate = self.units / self.busy if self.busy else 0.0
+        return (f"  {self.stage_name:<6} {self.units:>7} {self.unit:<7} busy {self.busy:6.1f}s "
+                f"({rate:8.1f} {self.unit}/s busy, {self.units / elapsed:8.1f}/s wall), "
+                f"blocked downstream {self.blocked:5.1f}s")
 
 
 class DocumentIngestion:
-    def __init__(self, chroma_path: str = "./chroma_db"):
+    def __init__(
+        self,
+        chroma_path: str = "./chroma_db",
+        embedding_backend: str = "torch",
+        onnx_model_dir: str = ONNX_MODEL_DIR,
+        embedding_cache_path: str = EMBEDDING_CACHE_PATH,
+        embedding_cache_max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES
+    ):
         self.chroma_path = chroma_path
+        self.embedding_backend = embedding_backend
+        self.onnx_model_dir = onnx_model_dir
         self.client = chromadb.PersistentClient(path=chroma_path)
+        self.alias = CollectionAlias(chroma_path)
+        # Incremental runs update whichever version is live
+        self.collection_name = self.alias.active()
         self.collection = None
         self.embedding_model = None
+        # Chunk vectors by content hash; None re-embeds everything
+        self.embedding_cache = None
+        if embedding_cache_path:
+            self.embedding_cache = EmbeddingCache(
+                embedding_cache_path,
+                model_key(embedding_backend),
+                max_entries=embedding_cache_max_entries
+            )
+        # Regex token estimate until the model (and its tokenizer) is loaded
+        self.chunker = StreamingChunker()
 
     def initialize(self):
         """Initialize embedding model and ChromaDB collection"""
         print("Initializing ingestion pipeline...")
 
         # Load embedding model
-        print(f"Loading embedding model: {EMBEDDING_MODEL}")
-        self.embedding_model = SentenceTransformer(EMBEDDING_MODEL)
+        print(f"Loading embedding model: {EMBEDDING_MODEL} ({self.embedding_backend})")
+        self.embedding_model = load_embedding_model(self.embedding_backend, self.onnx_model_dir)
+        self.chunker = StreamingChunker.for_model(self.embedding_model)
+        print(f"Chunking to {self.chunker.max_tokens} tokens ({self.chunker.overlap_tokens} overlap)")
 
         # Get or create collection
         try:
-            self.collection = self.client.get_collection("sierra_knowledge")
-            print(f"Found existing collection with {self.collection.count()} documents")
+            self.collection = self.client.get_collection(self.collection_name)
+            print(f"Found existing collection {self.collection_name} with {self.collection.count()} documents")
         except:
             self.collection = self.client.create_collection(
-                name="sierra_knowledge",
+                name=self.collection_name,
                 metadata={"description": "Sierra AI knowledge base"}
             )
-            print("Created new collection: sierra_knowledge")
+            print(f"Created new collection: {self.collection_name}")
 
-    CHUNK_SIZE = 800
-    CHUNK_OVERLAP = 200
+    def start_version(self) -> str:
+        """Point this run at a new, empty collection version (blue/green)
 
+        Nothing serves from it until activate_version() repoints the alias.
+        """
+        self.collection_name = next_version(self.client)
+        self.collection = self.client.create_collection(
+            name=self.collection_name,
+            metadata={"description": "Sierra AI knowledge base"}
+        )
+        print(f"Building new version: {self.collection_name}")
+        return self.collection_name
+
+    def activate_version(self) -> bool:
+        """Atomically make the collection this run built the live one"""
+        count = self.collection.count()
+        if count == 0:
+            print(f"⚠️ {self.collection_name} is empty; keeping {self.alias.active()} active")
+            self.client.delete_collection(self.collection_name)
+            return False
+
+        previous = self.alias.active()
+        self.alias.activate(self.collection_name)
+        print(f"✅ Activated {self.collection_name} ({count} chunks); roll back to {previous} with "
+              f"`python -m rag.versioning rollback`")
+        return True
+
+    @property
+    def store_path(self) -> str:
+        """Directory holding this collection's manifest and lexical index"""
+        return version_dir(self.chroma_path, self.collection_name)
 
     def clean_text_for_rag(self, text: str) -> str:
-        text = unicodedata.normalize("NFKC", text)
+        return clean_text(text)
 
-        text = text.replace("\r\n", "\n").replace("\r", "\n")
-
-        cleaned_lines = []
-        for line in text.split("\n"):
-            stripped = line.strip()
-            if not stripped:
-                continue
-            if len(stripped) < 4 and not re.search(r"[A-Za-z0-9]", stripped):
-                continue
-            cleaned_lines.append(stripped)
-
-        text = " ".join(cleaned_lines)
-
-        text = re.sub(r"\s+", " ", text).strip()
-
-        return text
-
-
-    def chunk_text(self, text: str) -> List[str]:
-        
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        """Clean a document and yield its chunks lazily"""
         if not text or not text.strip():
-            return []
-
-        text = self.clean_text_for_rag(text)
-
-        sentences = sent_tokenize(text)
-
-        chunks: List[str] = []
-        current_chunk_sentences: List[str] = []
-        current_len = 0
-
-        for sent in sentences:
-            sent = sent.strip()
-            if not sent:
-                continue
-
-            sent_len = len(sent) + 2
-
-            if current_len + sent_len > CHUNK_SIZE:
-                if current_chunk_sentences:
-                    chunk_text = " ".join(current_chunk_sentences).strip()
-                    chunks.append(chunk_text)
-
-                    words = chunk_text.split()
-
-                    approx_words_overlap = max(1, int(CHUNK_OVERLAP / 5))
-                    overlap_words = words[-approx_words_overlap:]
-
-                    current_chunk_sentences = [" ".join(overlap_words), sent]
-                    current_len = len(" ".join(current_chunk_sentences))
-                else:
-                    current_chunk_sentences = [sent]
-                    current_len = sent_len
-            else:
-                current_chunk_sentences.append(sent)
-                current_len += sent_len
-
-        if current_chunk_sentences:
-            chunk_text = " ".join(current_chunk_sentences).strip()
-            chunks.append(chunk_text)
-
-        chunks = [c for c in chunks if len(c) > 50]
-
-        return chunks
+            return iter(())
+        return self.chunker.chunks(self.clean_text_for_rag(text))
 
+    def chunk_text(self, text: str) -> List[str]:
+        return list(self.iter_chunks(text))
 
     def generate_id(self, text: str, metadata: dict) -> str:
         content = f"{metadata['url']}:{text[:100]}"
         return hashlib.md5(content.encode()).hexdigest()
 
-    def ingest_document(self, doc: Dict[str, str]) -> int:
+    def content_hash(self, doc: Dict[str, str]) -> str:
+        """Hash of everything that feeds a document's chunks"""
+        content = f"{doc['title']}\0{doc['content']}"
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def chunking_config(self) -> Dict:
+        """Settings that change chunk text or vectors; a change forces re-ingestion"""
+        return {
+            **self.chunker.config(),
+            'embedding_model': EMBEDDING_MODEL,
+            'embedding_backend': self.embedding_backend
+        }
+
+    def prepare_chunks(self, doc: Dict[str, str]) -> Tuple[List[str], List[str], List[Dict]]:
+        """Chunk a document into parallel (ids, documents, metadatas) lists"""
+        return self.chunk_records(doc, self.chunk_text(doc['content']))
+
+    def chunk_records(self, doc: Dict[str, str], chunks: List[str]) -> Tuple[List[str], List[str], List[Dict]]:
+        """Ids and metadata for a document's chunks"""
         url = doc['url']
         title = doc['title']
-        content = doc['content']
-
-        chunks = self.chunk_text(content)
-
-        if not chunks:
-            return 0
 
         ids = []
-        embeddings = []
         documents = []
         metadatas = []
 
@@ -151,8 +261,22 @@ class DocumentIngestion:
                 'total_chunks': len(chunks)
             })
 
+        return ids, documents, metadatas
+
+    def ingest_document(self, doc: Dict[str, str], manifest: Dict = None) -> int:
+        ids, documents, metadatas = self.prepare_chunks(doc)
+
+        if manifest is not None:
+            manifest['documents'][doc['url']] = {
+                'hash': self.content_hash(doc),
+                'chunk_ids': ids
+            }
+
+        if not ids:
+            return 0
+
         # Generate embeddings
-        embeddings = self.embedding_model.encode(documents).tolist()
+        embeddings = self.encode_corpus(documents)
 
         # Add to ChromaDB
         self.collection.add(
@@ -162,50 +286,569 @@ class DocumentIngestion:
             metadatas=metadatas
         )
 
-        return len(chunks)
+        return len(ids)
+
+    def manifest_path(self) -> str:
+        return os.path.join(self.store_path, MANIFEST_FILE)
+
+    def load_manifest(self) -> Dict:
+        """Load the per-URL content hash manifest written by previous runs"""
+        try:
+            with open(self.manifest_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'config': None, 'documents': {}}
+
+    def save_manifest(self, manifest: Dict):
+        """Write the manifest atomically so a crash never leaves it half-written"""
+        Path(self.store_path).mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path() + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path())
+
+    def lexical_index_path(self) -> str:
+        return os.path.join(self.store_path, LEXICAL_INDEX_FILE)
+
+    def build_lexical_index(self):
+        """Rebuild the BM25 inverted index over every chunk in the collection"""
+        start = time.perf_counter()
+        stored = self.collection.get(include=['documents'])
+        index = InvertedIndex().build(stored['ids'], stored['documents'])
+        index.save(self.lexical_index_path())
+        elapsed = time.perf_counter() - start
+        print(f"Built lexical index: {len(index.postings)} terms over {len(index.ids)} chunks ({elapsed:.2f}s)")
+
+    def existing_chunk_ids(self) -> Dict[str, List[str]]:
+        """Map url -> chunk ids currently stored in the collection"""
+        existing = self.collection.get(include=['metadatas'])
+        by_url: Dict[str, List[str]] = {}
+        for chunk_id, metadata in zip(existing['ids'], existing['metadatas']):
+            by_url.setdefault(metadata.get('url', ''), []).append(chunk_id)
+        return by_url
 
     def ingest_all(self, scraped_content_path: str = "./data/scraped_content.json"):
         
         """Ingest all scraped documents"""
         print(f"Loading scraped content from {scraped_content_path}")
 
-        with open(scraped_content_path, 'r', encoding='utf-8') as f:
-            documents = json.load(f)
+        documents = load_documents(scraped_content_path)
 
         print(f"Found {len(documents)} documents to ingest\n")
 
+        start = time.perf_counter()
         total_chunks = 0
+        manifest = {'config': self.chunking_config(), 'documents': {}}
 
         for i, doc in enumerate(documents, 1):
             print(f"[{i}/{len(documents)}] Processing: {doc['title'][:50]}...")
-            chunks_added = self.ingest_document(doc)
+            chunks_added = self.ingest_document(doc, manifest=manifest)
             total_chunks += chunks_added
             print(f"Added {chunks_added} chunks")
 
+        self.save_manifest(manifest)
+        self.build_lexical_index()
+
+        elapsed = time.perf_counter() - start
         print(f"\nIngestion complete!")
         print(f"Total documents: {len(documents)}")
         print(f"Total chunks: {total_chunks}")
+        print(f"Throughput: {total_chunks / elapsed:.1f} chunks/sec ({elapsed:.1f}s)")
+        print(f"Collection size: {self.collection.count()}")
+
+    def encode_corpus(self, documents: List[str], batch_size: int = ENCODE_BATCH_SIZE, processes: int = 0) -> List[List[float]]:
+        """Embed a whole corpus in fixed-size batches
+
+        Chunks already in the embedding cache are not re-encoded. With
+        processes > 1 the work is spread over a SentenceTransformer
+        multi-process pool of CPU workers (torch backend only; ONNX Runtime
+        already uses every core within one process).
+        """
+        if self.embedding_cache is not None:
+            return self.embedding_cache.encode(
+                documents, lambda misses: self._encode(misses, batch_size, processes)
+            ).tolist()
+        return self._encode(documents, batch_size, processes).tolist()
+
+    def _encode(self, documents: List[str], batch_size: int, processes: int):
+        if processes and processes > 1 and hasattr(self.embedding_model, 'start_multi_process_pool'):
+            pool = self.embedding_model.start_multi_process_pool(target_devices=['cpu'] * processes)
+            try:
+                embeddings = self.embedding_model.encode_multi_process(documents, pool, batch_size=batch_size)
+            finally:
+                self.embedding_model.stop_multi_process_pool(pool)
+        else:
+            embeddings = self.embedding_model.encode(documents, batch_size=batch_size, show_progress_bar=False)
+
+        return embeddings
+
+    def report_embedding_cache(self):
+        if self.embedding_cache is None:
+            return
+        stats = self.embedding_cache.stats()
+        print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.1%} hit rate), {stats['entries']} entries, {stats['evictions']} evicted")
+
+    def collapse_near_duplicates(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict],
+        threshold: float = DEDUP_THRESHOLD
+    ) -> Tuple[List[str], List[str], List[Dict], set]:
+        """Drop chunks that near-duplicate an earlier one, merging their URLs into it
+
+        The kept chunk lists every page it stands for in metadata['urls']
+        (joined, since Chroma metadata must be scalar). Returns the kept
+        (ids, documents, metadatas) and the set of dropped ids.
+        """
+        index = NearDuplicateIndex(threshold=threshold)
+        urls: Dict[str, List[str]] = {}
+        kept_ids, kept_documents, kept_metadatas = [], [], []
+        dropped = set()
+
+        for chunk_id, text, metadata in zip(ids, documents, metadatas):
+            canonical = index.add(chunk_id, text)
+            if canonical is None:
+                urls[chunk_id] = [metadata['url']]
+                kept_ids.append(chunk_id)
+                kept_documents.append(text)
+                kept_metadatas.append(metadata)
+            else:
+                if metadata['url'] not in urls[canonical]:
+                    urls[canonical].append(metadata['url'])
+                dropped.add(chunk_id)
+
+        for chunk_id, metadata in zip(kept_ids, kept_metadatas):
+            if len(urls[chunk_id]) > 1:
+                metadata['urls'] = URLS_SEPARATOR.join(urls[chunk_id])
+
+        return kept_ids, kept_documents, kept_metadatas, dropped
+
+    def ingest_bulk(
+        self,
+        scraped_content_path: str = "./data/scraped_content.json",
+        batch_size: int = ENCODE_BATCH_SIZE,
+        write_batch_size: int = WRITE_BATCH_SIZE,
+        processes: int = 0,
+        dedup_threshold: float = None
+    ):
+        """Ingest the whole corpus in three corpus-wide passes
+
+        Chunks every document first, sorts the chunks by length so each
+        encode batch holds similarly sized inputs (less padding), embeds in
+        large batches, then upserts into Chroma in large write batches.
+        With dedup_threshold set, near-duplicate chunks across the corpus
+        are collapsed before anything is embedded, and the next incremental
+        or pipelined run re-ingests in full rather than per URL.
+        """
+        print(f"Loading scraped content from {scraped_content_path}")
+
+        documents = load_documents(scraped_content_path)
+
+        print(f"Found {len(documents)} documents to ingest\n")
+
+        # 1. Chunk
+        start = time.perf_counter()
+        manifest = {'config': self.chunking_config(), 'documents': {}}
+        ids, chunk_documents, metadatas = [], [], []
+
+        for doc in documents:
+            doc_ids, doc_chunks, doc_metadatas = self.prepare_chunks(doc)
+            manifest['documents'][doc['url']] = {
+                'hash': self.content_hash(doc),
+                'chunk_ids': doc_ids
+            }
+            ids.extend(doc_ids)
+            chunk_documents.extend(doc_chunks)
+            metadatas.extend(doc_metadatas)
+
+        chunked_count = len(ids)
+        dropped = set()
+        if dedup_threshold:
+            dedup_start = time.perf_counter()
+            ids, chunk_documents, metadatas, dropped = self.collapse_near_duplicates(
+                ids, chunk_documents, metadatas, threshold=dedup_threshold
+            )
+            # Dropped chunks are never stored, so they are not this URL's to delete later
+            for entry in manifest['documents'].values():
+                entry['chunk_ids'] = [chunk_id for chunk_id in entry['chunk_ids'] if chunk_id not in dropped]
+            # Kept chunks are shared between pages, so per-URL updates can't be applied
+            # to them: a config that differs from chunking_config() makes the next
+            # incremental or pipelined run re-ingest everything instead
+            manifest['config']['dedup_threshold'] = dedup_threshold
+            print(f"Collapsed {len(dropped)} near-duplicate chunks of {chunked_count} "
+                  f"({len(dropped) / max(chunked_count, 1) * 100:.1f}% smaller index, "
+                  f"threshold {dedup_threshold}) in {time.perf_counter() - dedup_start:.2f}s")
+
+        order = sorted(range(len(ids)), key=lambda i: len(chunk_documents[i]))
+        ids = [ids[i] for i in order]
+        chunk_documents = [chunk_documents[i] for i in order]
+        metadatas = [metadatas[i] for i in order]
+
+        chunked_at = time.perf_counter()
+        total_chunks = len(ids)
+        print(f"Chunked into {total_chunks} chunks in {chunked_at - start:.1f}s")
+
+        if not ids:
+            self.save_manifest(manifest)
+            print("Nothing to ingest")
+            return
+
+        # 2. Embed
+        embeddings = self.encode_corpus(chunk_documents, batch_size=batch_size, processes=processes)
+
+        embedded_at = time.perf_counter()
+        embed_time = embedded_at - chunked_at
+        print(f"Embedded {total_chunks} chunks in {embed_time:.1f}s "
+              f"({total_chunks / embed_time:.1f} chunks/sec, batch size {batch_size}, "
+              f"processes {processes or 1})")
+        if dropped:
+            print(f"Embedding time saved by deduplication: ~{embed_time / total_chunks * len(dropped):.1f}s")
+
+        # 3. Write, respecting Chroma's own per-call limit
+        write_batch_size = min(write_batch_size, getattr(self.client, 'max_batch_size', write_batch_size))
+        for i in range(0, total_chunks, write_batch_size):
+            self.collection.upsert(
+                ids=ids[i:i + write_batch_size],
+                embeddings=embeddings[i:i + write_batch_size],
+                documents=chunk_documents[i:i + write_batch_size],
+                metadatas=metadatas[i:i + write_batch_size]
+            )
+
+        self.save_manifest(manifest)
+
+        written_at = time.perf_counter()
+        write_time = written_at - embedded_at
+        elapsed = written_at - start
+        print(f"Wrote {total_chunks} chunks in {write_time:.1f}s "
+              f"({total_chunks / write_time:.1f} chunks/sec, write batch size {write_batch_size})")
+
+        self.build_lexical_index()
+
+        print(f"\nBulk ingestion complete!")
+        print(f"Total documents: {len(documents)}")
+        print(f"Total chunks: {total_chunks}" + (f" ({chunked_count} before deduplication)" if dropped else ""))
+        print(f"Throughput: {total_chunks / elapsed:.1f} chunks/sec ({elapsed:.1f}s)")
+        print(f"Collection size: {self.collection.count()}")
+
+    def ingest_pipelined(
+        self,
+        scraped_content_path: str = "./data/scraped_content.json",
+        batch_size: int = ENCODE_BATCH_SIZE,
+        write_batch_size: int = WRITE_BATCH_SIZE,
+        queue_size: int = STAGE_QUEUE_SIZE,
+        follow_idle: float = 0
+    ):
+        """Stream documents through clean -> chunk -> embed -> store stages
+
+        Each stage is a thread joined to the next by a bounded queue, so
+        chunking the next documents overlaps with embedding and writing the
+        previous ones, and memory is bounded by the queue sizes rather than
+        the corpus. Documents are read lazily (JSONL line by line); with
+        follow_idle the reader tails a JSONL file the scraper is still
+        appending to. A URL seen again replaces its earlier chunks.
+
+        Documents whose content hash matches the previous run's manifest
+        (e.g. pages the scraper got a 304 for) are carried over without
+        being re-chunked or re-embedded; chunks of URLs that are no longer
+        in the source are deleted at the end.
+        """
+        print(f"Streaming documents from {scraped_content_path}")
+
+        start = time.perf_counter()
+        stop = threading.Event()
+        docs_q, cleaned_q, batches_q, embedded_q = (queue.Queue(maxsize=queue_size) for _ in range(4))
+        write_batch_size = min(write_batch_size, getattr(self.client, 'max_batch_size', write_batch_size))
+
+        manifest = {'config': self.chunking_config(), 'documents': {}}
+        previous = self.load_manifest()
+        if previous['config'] != manifest['config']:
+            # Without trustworthy hashes, start from what is actually stored
+            previous = {
+                'documents': {url: {'hash': None, 'chunk_ids': ids} for url, ids in self.existing_chunk_ids().items()}
+            }
+        pending = {'ids': [], 'documents': [], 'metadatas': []}
+
+        def clean(doc):
+            cleaned = self.clean_text_for_rag(doc['content']) if doc.get('content', '').strip() else ""
+            return [(doc, cleaned)]
+
+        def take_pending():
+            batch = ('upsert', pending['ids'], pending['documents'], pending['metadatas'])
+            pending['ids'], pending['documents'], pending['metadatas'] = [], [], []
+            return batch
+
+        def chunk(item):
+            doc, cleaned = item
+            ids, documents, metadatas = self.chunk_records(doc, list(self.chunker.chunks(cleaned)) if cleaned else [])
+
+            # Chunks of this URL from earlier in this run, or else from the last run
+            earlier = manifest['documents'].get(doc['url']) or previous['documents'].get(doc['url'])
+            manifest['documents'][doc['url']] = {'hash': self.content_hash(doc), 'chunk_ids': ids}
+            if earlier:
+                # Earlier chunks of this URL must be written before their stale ids are deleted
+                if pending['ids']:
+                    yield take_pending()
+                stale_ids = list(set(earlier['chunk_ids']) - set(ids))
+                if stale_ids:
+                    yield ('delete', stale_ids)
+
+            pending['ids'].extend(ids)
+            pending['documents'].extend(documents)
+            pending['metadatas'].extend(metadatas)
+            while len(pending['ids']) >= batch_size:
+                yield ('upsert', pending['ids'][:batch_size], pending['documents'][:batch_size], pending['metadatas'][:batch_size])
+                del pending['ids'][:batch_size], pending['documents'][:batch_size], pending['metadatas'][:batch_size]
+            # Following a live crawl, don't hold a partial batch while waiting for pages
+            if follow_idle and pending['ids'] and cleaned_q.empty():
+                yield take_pending()
+
+        def flush_chunks():
+            if pending['ids']:
+                yield take_pending()
+
+        def embed(item):
+            if item[0] == 'delete':
+                return [item]
+            _, ids, documents, metadatas = item
+            embeddings = self.encode_corpus(documents, batch_size=batch_size)
+            return [('upsert', ids, documents, metadatas, embeddings)]
+
+        def store(item):
+            if item[0] == 'delete':
+                self.collection.delete(ids=item[1])
+                return
+            _, ids, documents, metadatas, embeddings = item
+            for i in range(0, len(ids), write_batch_size):
+                self.collection.upsert(
+                    ids=ids[i:i + write_batch_size],
+                    embeddings=embeddings[i:i + write_batch_size],
+                    documents=documents[i:i + write_batch_size],
+                    metadatas=metadatas[i:i + write_batch_size]
+                )
+
+        def batch_size_of(item):
+            return len(item[1]) if item[0] == 'upsert' else 0
+
+        stages = [
+            Stage('clean', clean, docs_q, cleaned_q, stop, unit="docs"),
+            Stage('chunk', chunk, cleaned_q, batches_q, stop, unit="docs", flush=flush_chunks),
+            Stage('embed', embed, batches_q, embedded_q, stop, unit="chunks", size=batch_size_of),
+            Stage('store', store, embedded_q, None, stop, unit="chunks", size=batch_size_of)
+        ]
+        for stage in stages:
+            stage.start()
+
+        # The calling thread is the reader stage
+        reader = Stage('read', None, None, docs_q, stop, unit="docs")
+        read_start = time.perf_counter()
+        read_urls = set()
+        skipped = flagged_unchanged = 0
+        try:
+            for doc in iter_documents(scraped_content_path, follow_idle=follow_idle):
+                reader.units += 1
+                flagged_unchanged += bool(doc.get('unchanged'))
+
+                # The scraper's `unchanged` flag is relative to its last crawl, not
+                # to the last ingestion, so the content hash has the final say
+                entry = previous['documents'].get(doc['url'])
+                if doc['url'] not in read_urls and entry and entry['hash'] == self.content_hash(doc):
+                    manifest['documents'][doc['url']] = entry
+                    read_urls.add(doc['url'])
+                    skipped += 1
+                    continue
+                read_urls.add(doc['url'])
+
+                if not reader.put(doc):
+                    break
+        except Exception as e:
+            reader.error = e
+            stop.set()
+        finally:
+            reader.busy = time.perf_counter() - read_start - reader.blocked
+            reader.put(DONE)
+
+        for stage in stages:
+            stage.join()
+
+        errors = [stage.error for stage in [reader, *stages] if stage.error is not None]
+        if errors:
+            raise errors[0]
+
+        # URLs that dropped out of the source, as in ingest_incremental
+        removed_urls = [url for url in previous['documents'] if url not in read_urls]
+        removed_ids = [chunk_id for url in removed_urls for chunk_id in previous['documents'][url]['chunk_ids']]
+        for i in range(0, len(removed_ids), write_batch_size):
+            self.collection.delete(ids=removed_ids[i:i + write_batch_size])
+
+        self.save_manifest(manifest)
+        self.build_lexical_index()
+
+        elapsed = time.perf_counter() - start
+        total_chunks = sum(len(entry['chunk_ids']) for entry in manifest['documents'].values())
+        print(f"\nPipelined ingestion complete in {elapsed:.1f}s (queue size {queue_size}, batch size {batch_size})")
+        for stage in [reader, *stages]:
+            print(stage.report(elapsed))
+        print(f"Total documents: {len(manifest['documents'])} "
+              f"({skipped} unchanged since the last run skipped, {flagged_unchanged} flagged unchanged by the scraper)")
+        print(f"Documents removed: {len(removed_urls)} ({len(removed_ids)} chunks deleted)")
+        print(f"Total chunks: {total_chunks} ({stages[2].units} embedded)")
+        print(f"Throughput: {stages[2].units / elapsed:.1f} chunks/sec")
+        print(f"Collection size: {self.collection.count()}")
+
+    def ingest_incremental(self, scraped_content_path: str = "./data/scraped_content.json"):
+        """Re-index only what changed since the last run
+
+        Unchanged documents (same content hash and chunking config) are
+        skipped. Changed documents are re-chunked and upserted, and any of
+        their old chunk ids that no longer exist are deleted, as are all
+        chunks of URLs that disappeared from the scraped content.
+        """
+        print(f"Loading scraped content from {scraped_content_path}")
+        start = time.perf_counter()
+
+        documents = load_documents(scraped_content_path)
+
+        manifest = self.load_manifest()
+        config = self.chunking_config()
+
+        if manifest['config'] != config:
+            if manifest['config'] is not None:
+                print("Chunking config changed, re-ingesting every document")
+            # Without trustworthy hashes, start from what is actually stored
+            old_ids = self.existing_chunk_ids()
+            manifest = {
+                'config': config,
+                'documents': {url: {'hash': None, 'chunk_ids': ids} for url, ids in old_ids.items()}
+            }
+
+        seen_urls = set()
+        skipped = updated = added_chunks = deleted_chunks = 0
+
+        for doc in documents:
+            url = doc['url']
+            seen_urls.add(url)
+
+            content_hash = self.content_hash(doc)
+            entry = manifest['documents'].get(url)
+            if entry and entry['hash'] == content_hash:
+                skipped += 1
+                continue
+
+            print(f"Updating: {doc['title'][:50]}...")
+            ids, chunk_documents, metadatas = self.prepare_chunks(doc)
+
+            if ids:
+                embeddings = self.encode_corpus(chunk_documents)
+                self.collection.upsert(
+                    ids=ids,
+                    embeddings=embeddings,
+                    documents=chunk_documents,
+                    metadatas=metadatas
+                )
+                added_chunks += len(ids)
+
+            stale_ids = set(entry['chunk_ids']) - set(ids) if entry else set()
+            if stale_ids:
+                self.collection.delete(ids=list(stale_ids))
+                deleted_chunks += len(stale_ids)
+
+            manifest['documents'][url] = {'hash': content_hash, 'chunk_ids': ids}
+            updated += 1
+
+        removed_urls = [url for url in manifest['documents'] if url not in seen_urls]
+        for url in removed_urls:
+            stale_ids = manifest['documents'].pop(url)['chunk_ids']
+            if stale_ids:
+                self.collection.delete(ids=stale_ids)
+                deleted_chunks += len(stale_ids)
+
+        self.save_manifest(manifest)
+        if updated or removed_urls or not os.path.exists(self.lexical_index_path()):
+            self.build_lexical_index()
+
+        elapsed = time.perf_counter() - start
+        print(f"\nIncremental ingestion complete in {elapsed:.1f}s")
+        print(f"Unchanged documents skipped: {skipped}")
+        print(f"Documents updated: {updated}")
+        print(f"Documents removed: {len(removed_urls)}")
+        print(f"Chunks upserted: {added_chunks}, chunks deleted: {deleted_chunks}")
         print(f"Collection size: {self.collection.count()}")
 
     def clear_collection(self):
         """Clear all data from the collection"""
         print("Clearing existing collection...")
-        self.client.delete_collection("sierra_knowledge")
+        self.client.delete_collection(self.collection_name)
         self.collection = self.client.create_collection(
-            name="sierra_knowledge",
+            name=self.collection_name,
             metadata={"description": "Sierra AI knowledge base"}
         )
+        for path in (self.manifest_path(), self.lexical_index_path()):
+            if os.path.exists(path):
+                os.remove(path)
         print("Collection cleared")
 
 
 def main():
     """Run the ingestion pipeline"""
-    ingestion = DocumentIngestion()
+    parser = argparse.ArgumentParser(description="Ingest scraped content into ChromaDB")
+    parser.add_argument('--source', default="./data/scraped_content.json", help="scraped content file (JSON array or JSONL)")
+    parser.add_argument('--incremental', action='store_true', help="only re-index changed documents")
+    parser.add_argument('--clear', action='store_true', help="clear the collection before ingesting")
+    parser.add_argument('--blue-green', action='store_true',
+                        help="build a complete new collection version and activate it only when done (not with --incremental)")
+    parser.add_argument('--bulk', action='store_true', help="chunk, embed and write the corpus in large batches")
+    parser.add_argument('--pipelined', action='store_true', help="stream documents through concurrent clean/chunk/embed/store stages")
+    parser.add_argument('--queue-size', type=int, default=STAGE_QUEUE_SIZE, help="bounded queue size between --pipelined stages")
+    parser.add_argument('--follow', type=float, default=0, metavar='SECONDS',
+                        help="with --pipelined, keep reading a growing JSONL source until idle this long")
+    parser.add_argument('--batch-size', type=int, default=ENCODE_BATCH_SIZE, help="encode batch size for --bulk and --pipelined")
+    parser.add_argument('--processes', type=int, default=0, help="CPU encode processes for --bulk (torch backend)")
+    parser.add_argument('--dedup', action='store_true', help="with --bulk, collapse near-duplicate chunks before embedding")
+    parser.add_argument('--dedup-threshold', type=float, default=DEDUP_THRESHOLD, help="MinHash Jaccard similarity for --dedup")
+    parser.add_argument('--embedding-backend', choices=EMBEDDING_BACKENDS, default="torch", help="embedding runtime")
+    parser.add_argument('--embedding-cache', default=EMBEDDING_CACHE_PATH, help="persistent chunk embedding cache (SQLite)")
+    parser.add_argument('--embedding-cache-max-entries', type=int, default=EMBEDDING_CACHE_MAX_ENTRIES)
+    parser.add_argument('--no-embedding-cache', action='store_true', help="re-embed every chunk")
+    args = parser.parse_args()
+    if args.blue_green and args.incremental:
+        # A new version starts empty, with no manifest to diff against
+        parser.error("--blue-green builds a complete new version; it cannot be combined with --incremental")
+    if args.processes > 1 and args.embedding_backend != "torch":
+        # Checked before any chunking: only SentenceTransformer has a multi-process pool
+        parser.error(f"--processes needs the torch embedding backend, not {args.embedding_backend}")
+
+    ingestion = DocumentIngestion(
+        embedding_backend=args.embedding_backend,
+        embedding_cache_path=None if args.no_embedding_cache else args.embedding_cache,
+        embedding_cache_max_entries=args.embedding_cache_max_entries
+    )
     ingestion.initialize()
 
-    # ingestion.clear_collection()
+    if args.blue_green:
+        ingestion.start_version()
+    elif args.clear:
+        ingestion.clear_collection()
+
+    if args.incremental:
+        ingestion.ingest_incremental(args.source)
+    elif args.pipelined:
+        ingestion.ingest_pipelined(args.source, batch_size=args.batch_size, queue_size=args.queue_size, follow_idle=args.follow)
+    elif args.bulk:
+        ingestion.ingest_bulk(
+            args.source,
+            batch_size=args.batch_size,
+            processes=args.processes,
+            dedup_threshold=args.dedup_threshold if args.dedup else None
+        )
+    else:
+        ingestion.ingest_all(args.source)
+
+    if args.blue_green:
+        ingestion.activate_version()
 
-    ingestion.ingest_all()
+    ingestion.report_embedding_cache()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,125 @@
+"""
+BM25 inverted index over chunk ids
+Built at ingestion time and used for the lexical side of hybrid retrieval
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+LEXICAL_INDEX_FILE = "lexical_index.json"
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in is it
+its of on or our s so than that the their them there these they this to was
+we what when where which who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric terms with stopwords removed"""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class InvertedIndex:
+    """Term -> postings index scored with BM25
+
+    On disk each term maps to a flat [doc, tf, doc, tf, ...] list. On load
+    the query-independent part of BM25 (idf and length normalization) is
+    folded into one weight per posting, so a query is just a sum of
+    precomputed weights over its terms.
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.doc_lens: List[int] = []
+        self.postings: Dict[str, List[int]] = {}
+        self._weights: Dict[str, Tuple[List[int], List[float]]] = {}
+
+    def build(self, ids: List[str], documents: List[str]) -> "InvertedIndex":
+        self.ids = list(ids)
+        self.doc_lens = []
+        postings: Dict[str, List[int]] = {}
+
+        for doc_idx, text in enumerate(documents):
+            terms = tokenize(text)
+            self.doc_lens.append(len(terms))
+            for term, tf in Counter(terms).items():
+                postings.setdefault(term, []).extend((doc_idx, tf))
+
+        self.postings = postings
+        self._precompute()
+        return self
+
+    def _precompute(self):
+        n = len(self.ids)
+        avg_len = (sum(self.doc_lens) / n) if n else 0.0
+        self._weights = {}
+
+        for term, flat in self.postings.items():
+            docs = flat[0::2]
+            tfs = flat[1::2]
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            weights = []
+            for doc_idx, tf in zip(docs, tfs):
+                norm = K1 * (1 - B + B * self.doc_lens[doc_idx] / avg_len) if avg_len else K1
+                weights.append(idf * tf * (K1 + 1) / (tf + norm))
+            self._weights[term] = (docs, weights)
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """Return (chunk id, BM25 score) pairs, best first"""
+        scores: Dict[int, float] = {}
+
+        for term in set(tokenize(query)):
+            entry = self._weights.get(term)
+            if entry is None:
+                continue
+            for doc_idx, weight in zip(*entry):
+                scores[doc_idx] = scores.get(doc_idx, 0.0) + weight
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(self.ids[doc_idx], score) for doc_idx, score in best]
+
+    def save(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'ids': self.ids,
+                'doc_lens': self.doc_lens,
+                'postings': self.postings
+            }, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "InvertedIndex":
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        index = cls()
+        index.ids = data['ids']
+        index.doc_lens = data['doc_lens']
+        index.postings = data['postings']
+        index._precompute()
+        return index
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: score(id) = sum of 1 / (k + rank)"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, 1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
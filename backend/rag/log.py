@@ -0,0 +1,48 @@
+"""
+Non-blocking log sink
+Request-path status lines are put on an in-memory queue by a QueueHandler;
+a background QueueListener does the blocking write to stdout, so a slow
+terminal or log pipe never stalls a request.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+
+_listener = None
+_lock = threading.Lock()
+
+
+def _setup():
+    global _listener
+
+    log_queue = queue.SimpleQueue()
+    sink = logging.StreamHandler(sys.stdout)
+    # Plain messages, matching the emoji status lines printed elsewhere
+    sink.setFormatter(logging.Formatter("%(message)s"))
+
+    root = logging.getLogger("rag")
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, sink, respect_handler_level=True)
+    _listener.start()
+    # Flush whatever is still queued on shutdown
+    atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the 'rag' hierarchy, backed by the shared queue sink"""
+    with _lock:
+        if _listener is None:
+            _setup()
+
+    if name != "rag" and not name.startswith("rag."):
+        name = f"rag.{name}"
+    return logging.getLogger(name)
@@ -0,0 +1,192 @@
+"""
+Lightweight in-process metrics
+Counters, gauges and histograms rendered in the Prometheus text format,
+without pulling in a client library.
+"""
+
+import bisect
+import threading
+from typing import Dict, List, Tuple
+
+
+# Seconds; covers a ~1 ms cache lookup up to a slow LLM call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labelnames: Tuple[str, ...], labels: Dict) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(self.labelnames, labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value:g}" for key, value in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(self.labelnames, labels)] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # key -> (per-bucket counts, sum, count)
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, ([*s[0]], s[1], s[2])) for key, s in self._series.items())
+
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "rag_stage_duration_seconds",
+    "Chat pipeline stage latency (embed, cache, query, format, generate, first_token, total, batch_embed, batch_query)",
+    ("stage",)
+)
+LLM_TOKENS = REGISTRY.counter(
+    "rag_llm_tokens_total",
+    "LLM tokens by kind (input, output, cached_input)",
+    ("kind",)
+)
+SEMANTIC_CACHE_LOOKUPS = REGISTRY.counter(
+    "rag_semantic_cache_lookups_total",
+    "Semantic answer cache lookups by result (hit, miss)",
+    ("result",)
+)
+EMBEDDING_CACHE_LOOKUPS = REGISTRY.counter(
+    "rag_embedding_cache_lookups_total",
+    "Persistent embedding cache lookups by cache (query, document) and result (hit, miss)",
+    ("cache", "result")
+)
+CHAT_REQUESTS = REGISTRY.counter(
+    "rag_chat_requests_total",
+    "Chat turns by mode (answer, stream, batch) and outcome (ok, error)",
+    ("mode", "outcome")
+)
+COALESCED_REQUESTS = REGISTRY.counter(
+    "rag_coalesced_requests_total",
+    "Chat requests by mode (answer, stream) and single-flight role (leader runs the pipeline, follower shares it)",
+    ("mode", "role")
+)
+RATE_LIMITED = REGISTRY.counter(
+    "rag_rate_limited_total",
+    "Requests rejected with 429 by the per-client rate limiter, by endpoint",
+    ("endpoint",)
+)
+SEMANTIC_CACHE_HIT_RATIO = REGISTRY.gauge(
+    "rag_semantic_cache_hit_ratio",
+    "Share of semantic cache lookups that hit, since startup"
+)
+IN_FLIGHT = REGISTRY.gauge(
+    "rag_chat_in_flight",
+    "Chat turns currently being processed, by mode",
+    ("mode",)
+)
+
+
+def record_usage(usage: Dict):
+    """Add an LLM usage dict to the token counters"""
+    if not usage:
+        return
+    LLM_TOKENS.inc(usage.get('input_tokens', 0), kind="input")
+    LLM_TOKENS.inc(usage.get('output_tokens', 0), kind="output")
+    LLM_TOKENS.inc(usage.get('cached_input_tokens', 0), kind="cached_input")
+
+
+def record_cache_lookup(hit: bool):
+    SEMANTIC_CACHE_LOOKUPS.inc(result="hit" if hit else "miss")
+    hits = SEMANTIC_CACHE_LOOKUPS.value(result="hit")
+    total = hits + SEMANTIC_CACHE_LOOKUPS.value(result="miss")
+    SEMANTIC_CACHE_HIT_RATIO.set(hits / total)
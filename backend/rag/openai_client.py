@@ -3,80 +3,179 @@ OpenAI API client for generating responses
 """
 
 import os
-from openai import OpenAI
-from typing import Dict
+from openai import AsyncOpenAI, OpenAI
+from typing import AsyncIterator, Dict, Iterator, List
 from dotenv import load_dotenv
 
+from rag.log import get_logger
+from rag.prompts import SYSTEM_PROMPT, build_prompt
 
-SYSTEM_PROMPT = """You are a helpful AI assistant specializing in answering questions about Sierra AI, their products, values, and opportunities.
 
-Your knowledge comes exclusively from the provided context documents from Sierra's website. Follow these rules strictly:
-
-1. ONLY answer based on information in the provided context
-2. If the answer is not clearly supported by the context, say "I don't have enough information in my knowledge base to answer that question accurately."
-3. When you provide an answer, be specific and professional
-4. Cite which source you're drawing from when relevant
-5. Maintain Sierra's tone: professional, clear, customer-obsessed, and helpful
-6. Never make up or hallucinate information - stick to the facts provided
-
-Remember: It's better to say you don't know than to provide inaccurate information."""
+logger = get_logger(__name__)
 
 
 class OpenAIClient:
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, async_http_client=None, base_url: str = None, max_retries: int = 2):
         load_dotenv()
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY not found in environment")
 
-        self.client = OpenAI(api_key=self.api_key)
+        # base_url lets tests and benchmarks point at a local stub server
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.client = OpenAI(api_key=self.api_key, base_url=base_url, max_retries=max_retries)
         self.model = "gpt-3.5-turbo"
 
-    def generate_response(self, user_message: str, context: str) -> Dict[str, str]:
+        # Async client for the ASGI server; shares the caller's httpx pool
+        self.async_http_client = async_http_client
+        self._async_client = None
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=self.max_retries,
+                http_client=self.async_http_client
+            )
+        return self._async_client
+
+    def _with_timeout(self, client, timeout: float = None):
+        """Apply a per-call deadline; None keeps the SDK default"""
+        return client if timeout is None else client.with_options(timeout=timeout)
+
+    def build_prompt(self, user_message: str, context: str) -> str:
+        """Build the user prompt from retrieved context and the question"""
+        return build_prompt(user_message, context)
+
+    def build_request(self, user_message: str, context: str, history: List[Dict] = None) -> Dict:
+        """Keyword arguments for chat.completions.create
+
+        OpenAI caches long prompt prefixes automatically; the system prompt,
+        then any session history, then the context come first so repeated
+        turns and sources share a prefix.
+        """
+        prompt = self.build_prompt(user_message, context)
+
+        return {
+            "model": self.model,
+            "max_tokens": 2048,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": SYSTEM_PROMPT
+                },
+                *(history or []),
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        }
+
+    def parse_response(self, response) -> Dict:
+        """Convert a completion into the {answer, model, usage} dict"""
+        return {
+            "answer": response.choices[0].message.content,
+            "model": response.model,
+            "usage": self.parse_usage(response.usage)
+        }
+
+    def parse_usage(self, usage) -> Dict:
+        """Token counts; cached_input_tokens is the cached share of input_tokens"""
+        details = getattr(usage, "prompt_tokens_details", None)
+        return {
+            "input_tokens": usage.prompt_tokens,
+            "output_tokens": usage.completion_tokens,
+            "cached_input_tokens": (getattr(details, "cached_tokens", None) or 0) if details else 0
+        }
+
+    def generate_response(self, user_message: str, context: str, timeout: float = None, history: List[Dict] = None) -> Dict[str, str]:
         """Generate a response using OpenAI ChatGPT"""
 
-        prompt = f"""Context information from Sierra AI's website:
+        try:
+            response = self._with_timeout(self.client, timeout).chat.completions.create(**self.build_request(user_message, context, history))
+            return self.parse_response(response)
+
+        except Exception as e:
+            logger.error(f"Error calling OpenAI API: {e}")
+            raise
+
+    async def agenerate_response(self, user_message: str, context: str, timeout: float = None, history: List[Dict] = None) -> Dict[str, str]:
+        """Async variant of generate_response"""
 
-{context}
+        try:
+            response = await self._with_timeout(self.async_client, timeout).chat.completions.create(**self.build_request(user_message, context, history))
+            return self.parse_response(response)
 
----
+        except Exception as e:
+            logger.error(f"Error calling OpenAI API: {e}")
+            raise
 
-User question: {user_message}
+    def stream_response(self, user_message: str, context: str, timeout: float = None, history: List[Dict] = None) -> Iterator[Dict]:
+        """Stream a response from OpenAI ChatGPT
 
-Please answer the user's question based solely on the context provided above. If the context doesn't contain enough information to answer accurately, say so."""
+        Yields {"type": "token", "text": ...} events as the completion is
+        generated, followed by a single {"type": "usage", ...} event.
+        """
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                max_tokens=2048,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": SYSTEM_PROMPT
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
+            stream = self._with_timeout(self.client, timeout).chat.completions.create(
+                **self.build_request(user_message, context, history),
+                stream=True,
+                stream_options={"include_usage": True}
             )
 
-            # Extract text content
-            answer = response.choices[0].message.content
+            state = {"model": self.model, "usage": {"input_tokens": 0, "output_tokens": 0, "cached_input_tokens": 0}}
 
-            return {
-                "answer": answer,
-                "model": response.model,
-                "usage": {
-                    "input_tokens": response.usage.prompt_tokens,
-                    "output_tokens": response.usage.completion_tokens
-                }
-            }
+            for chunk in stream:
+                text = self._read_chunk(chunk, state)
+                if text:
+                    yield {"type": "token", "text": text}
+
+            yield {"type": "usage", "model": state["model"], "usage": state["usage"]}
 
         except Exception as e:
-            print(f"Error calling OpenAI API: {e}")
+            logger.error(f"Error streaming from OpenAI API: {e}")
             raise
 
+    async def astream_response(self, user_message: str, context: str, timeout: float = None, history: List[Dict] = None) -> AsyncIterator[Dict]:
+        """Async variant of stream_response"""
+
+        try:
+            stream = await self._with_timeout(self.async_client, timeout).chat.completions.create(
+                **self.build_request(user_message, context, history),
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+
+            state = {"model": self.model, "usage": {"input_tokens": 0, "output_tokens": 0, "cached_input_tokens": 0}}
+
+            async for chunk in stream:
+                text = self._read_chunk(chunk, state)
+                if text:
+                    yield {"type": "token", "text": text}
+
+            yield {"type": "usage", "model": state["model"], "usage": state["usage"]}
+
+        except Exception as e:
+            logger.error(f"Error streaming from OpenAI API: {e}")
+            raise
+
+    def _read_chunk(self, chunk, state: Dict) -> str:
+        """Record model/usage from a stream chunk and return its text delta"""
+        state["model"] = chunk.model or state["model"]
+
+        # The final chunk carries usage and no choices
+        if chunk.usage is not None:
+            state["usage"] = self.parse_usage(chunk.usage)
+
+        if chunk.choices:
+            return chunk.choices[0].delta.content or ""
+        return ""
+
 
 # Test the client
 if __name__ == "__main__":
@@ -100,5 +199,5 @@ if __name__ == "__main__":
 
     print(f"Answer: {result['answer']}\n")
     print(f"Model: {result['model']}")
-    print(f"Tokens: {result['usage']['input_tokens']} in, {result['usage']['output_tokens']} out")
+    print(f"Tokens: {result['usage']['input_tokens']} in ({result['usage']['cached_input_tokens']} cached), {result['usage']['output_tokens']} out")
 
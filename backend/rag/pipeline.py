@@ -0,0 +1,580 @@
+"""
+Chat pipeline shared by the Flask and ASGI servers
+Embed -> semantic cache -> retrieve -> pack context -> generate
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from rag.cache import SemanticCache
+from rag.embedding_cache import EMBEDDING_CACHE_MAX_ENTRIES, QUERY_EMBEDDING_CACHE_PATH
+from rag.log import get_logger
+from rag.metrics import CHAT_REQUESTS, IN_FLIGHT, STAGE_SECONDS, record_cache_lookup, record_usage
+from rag.retrieval import Retriever, CONTEXT_TOKEN_BUDGET
+from rag.sessions import SessionStore, SESSION_TOKEN_BUDGET
+
+
+logger = get_logger(__name__)
+
+NO_CONTEXT_ANSWER = "I don't have any relevant information in my knowledge base to answer this question. My knowledge is limited to Sierra AI's website content."
+
+
+class ChatPipeline:
+    """One chat turn, split into a CPU-bound and an LLM-bound half
+
+    prepare() does everything up to the LLM call (embedding, cache lookup,
+    retrieval, context packing) and is safe to run in a worker thread.
+    answer()/stream() are the blocking entry points used by Flask;
+    aanswer()/astream() run prepare() in an executor and use the LLM
+    client's async methods. Every stage is timed into rag.metrics, and the
+    per-turn breakdown is returned when include_timings is set.
+
+    With a session store, a session_id makes the turn conversational: the
+    session's history goes to the LLM, its running history vector is
+    blended into the retrieval embedding, and follow-ups bypass the
+    semantic cache (their answers depend on the conversation).
+    """
+
+    def __init__(
+        self,
+        retriever: Retriever,
+        llm_client,
+        answer_cache: Optional[SemanticCache] = None,
+        context_token_budget: int = CONTEXT_TOKEN_BUDGET,
+        session_store: Optional[SessionStore] = None
+    ):
+        self.retriever = retriever
+        self.llm_client = llm_client
+        self.answer_cache = answer_cache
+        self.context_token_budget = context_token_budget
+        self.session_store = session_store
+
+    def _mark(self, prepared: Dict, stage: str, start: float) -> float:
+        """Record the time since start as a stage duration; returns now"""
+        now = time.perf_counter()
+        prepared['timings'][stage] = now - start
+        STAGE_SECONDS.observe(now - start, stage=stage)
+        return now
+
+    def _finish(self, prepared: Dict, started: float, include_timings: bool) -> Optional[Dict]:
+        """Record the total turn time; returns the breakdown in ms if requested"""
+        self._mark(prepared, 'total', started)
+        if not include_timings:
+            return None
+        return {f"{stage}_ms": round(seconds * 1000, 2) for stage, seconds in prepared['timings'].items()}
+
+    def _new_prepared(self, user_message: str, top_k: int) -> Dict:
+        return {
+            'user_message': user_message,
+            'top_k': top_k,
+            'query_embedding': None,
+            'cached': None,
+            'sources': [],
+            'context': None,
+            'context_stats': None,
+            'session': None,
+            'history': None,
+            'follow_up': False,
+            'timings': {}
+        }
+
+    def _lookup_cache(self, prepared: Dict, version) -> bool:
+        """Check the semantic cache; on a hit, fill in the cached answer"""
+        start = time.perf_counter()
+        cached = self.answer_cache.lookup(prepared['query_embedding'], prepared['top_k'], version=version)
+        self._mark(prepared, 'cache', start)
+        record_cache_lookup(bool(cached))
+
+        if cached:
+            prepared['cached'] = cached
+            prepared['sources'] = cached['sources']
+        return bool(cached)
+
+    def _attach_context(self, prepared: Dict, relevant_docs: List[Dict]):
+        """Pack retrieved chunks under the token budget"""
+        if not relevant_docs:
+            return
+
+        start = time.perf_counter()
+        context, context_stats = self.retriever.build_context(relevant_docs, token_budget=self.context_token_budget)
+        self._mark(prepared, 'format', start)
+
+        prepared['sources'] = self.retriever.get_unique_sources(relevant_docs)
+        prepared['context'] = context
+        prepared['context_stats'] = context_stats
+
+    def _open_session(self, prepared: Dict, session_id: Optional[str]):
+        """Attach the session and, for follow-ups, its history"""
+        if session_id is None or self.session_store is None:
+            return
+
+        session = self.session_store.get_or_create(session_id)
+        prepared['session'] = session
+        if session.has_history():
+            prepared['follow_up'] = True
+            prepared['history'] = self.session_store.history_messages(session)
+
+    def prepare(self, user_message: str, top_k: int = 5, session_id: Optional[str] = None) -> Dict:
+        """Embed, check the cache, retrieve and pack context"""
+        logger.info(f"\n📩 Query: {user_message}")
+        prepared = self._new_prepared(user_message, top_k)
+        self._open_session(prepared, session_id)
+
+        # Embed once; the vector serves both the cache and retrieval
+        start = time.perf_counter()
+        prepared['query_embedding'] = self.retriever.embed_query(user_message)
+        self._mark(prepared, 'embed', start)
+
+        retrieval_embedding = prepared['query_embedding']
+        if prepared['follow_up']:
+            # Fold in earlier turns without re-embedding the transcript
+            retrieval_embedding = self.session_store.retrieval_embedding(prepared['session'], retrieval_embedding)
+
+        elif self.answer_cache is not None:
+            if self._lookup_cache(prepared, self.retriever.collection_version()):
+                logger.info(f"⚡ Semantic cache hit (similarity {prepared['cached']['similarity']:.3f})\n")
+                return prepared
+
+        # Retrieve relevant documents
+        start = time.perf_counter()
+        relevant_docs = self.retriever.retrieve_by_embedding(retrieval_embedding, top_k=top_k, query=user_message)
+        self._mark(prepared, 'query', start)
+        logger.info(f"📚 Retrieved {len(relevant_docs)} relevant chunks")
+
+        # Pack context under the token budget
+        self._attach_context(prepared, relevant_docs)
+        if prepared['context_stats']:
+            logger.info(f"📦 Context: {prepared['context_stats']['tokens']} tokens ({prepared['context_stats']['tokens_saved']} saved)")
+
+        return prepared
+
+    def prepare_batch(self, user_messages: List[str], top_k: int = 5) -> List[Dict]:
+        """prepare() for many questions: one encode call and one multi-query search
+
+        Batch-wide embed and query durations are recorded under the
+        batch_embed/batch_query stages so they don't skew per-query ones.
+        """
+        logger.info(f"\n📩 Batch of {len(user_messages)} queries")
+        batch = [self._new_prepared(user_message, top_k) for user_message in user_messages]
+        if not batch:
+            return batch
+
+        start = time.perf_counter()
+        for prepared, embedding in zip(batch, self.retriever.embed_queries(user_messages)):
+            prepared['query_embedding'] = embedding
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="batch_embed")
+
+        pending = batch
+        if self.answer_cache is not None:
+            version = self.retriever.collection_version()
+            pending = [prepared for prepared in batch if not self._lookup_cache(prepared, version)]
+
+        if pending:
+            start = time.perf_counter()
+            results = self.retriever.retrieve_batch_by_embeddings(
+                [prepared['query_embedding'] for prepared in pending],
+                top_k=top_k,
+                queries=[prepared['user_message'] for prepared in pending]
+            )
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage="batch_query")
+
+            for prepared, relevant_docs in zip(pending, results):
+                self._attach_context(prepared, relevant_docs)
+
+        logger.info(f"📚 Retrieved context for {len(pending)} queries ({len(batch) - len(pending)} cache hits)")
+        return batch
+
+    def store(self, prepared: Dict, answer: str, usage: Dict):
+        """Store a generated answer in the semantic cache, if caching is enabled"""
+        if self.answer_cache is not None and not prepared['follow_up']:
+            self.answer_cache.store(
+                prepared['query_embedding'], prepared['top_k'], answer, prepared['sources'], usage,
+                version=self.retriever.collection_version()
+            )
+
+    def _shortcut_response(self, prepared: Dict) -> Optional[Dict]:
+        """Response for cache hits and empty retrievals (no LLM call needed)"""
+        cached = prepared['cached']
+        if cached:
+            return {
+                'answer': cached['answer'],
+                'sources': cached['sources'],
+                'usage': cached['usage'],
+                'cached': True
+            }
+
+        if prepared['context'] is None:
+            return {
+                'answer': NO_CONTEXT_ANSWER,
+                'sources': []
+            }
+
+        return None
+
+    def _response(self, prepared: Dict, result: Dict) -> Dict:
+        logger.info(f"✓ Response generated ({result['usage']['output_tokens']} tokens)\n")
+        record_usage(result['usage'])
+        self.store(prepared, result['answer'], result['usage'])
+
+        return {
+            'answer': result['answer'],
+            'sources': prepared['sources'],
+            'usage': result['usage'],
+            'context': prepared['context_stats'],
+            'cached': False
+        }
+
+    def _remember(self, prepared: Dict, answer: str):
+        if prepared['session'] is not None:
+            self.session_store.add_turn(prepared['session'], prepared['user_message'], answer, prepared['query_embedding'])
+
+    def _finalize(self, prepared: Dict, response: Dict, started: float, include_timings: bool) -> Dict:
+        """Record the turn in its session; attach the session id and timings"""
+        self._remember(prepared, response['answer'])
+        if prepared['session'] is not None:
+            response['session_id'] = prepared['session'].session_id
+
+        timings = self._finish(prepared, started, include_timings)
+        if timings is not None:
+            response['timings'] = timings
+        return response
+
+    def answer(self, user_message: str, top_k: int = 5, include_timings: bool = False,
+               session_id: Optional[str] = None) -> Dict:
+        """Run a full chat turn and return the /api/chat response body"""
+        started = time.perf_counter()
+        IN_FLIGHT.inc(mode="answer")
+        try:
+            prepared = self.prepare(user_message, top_k, session_id)
+
+            response = self._shortcut_response(prepared)
+            if response is None:
+                logger.info("🤖 Generating response...")
+                start = time.perf_counter()
+                result = self.llm_client.generate_response(user_message, prepared['context'], history=prepared['history'])
+                self._mark(prepared, 'generate', start)
+                response = self._response(prepared, result)
+
+            CHAT_REQUESTS.inc(mode="answer", outcome="ok")
+            return self._finalize(prepared, response, started, include_timings)
+
+        except Exception:
+            CHAT_REQUESTS.inc(mode="answer", outcome="error")
+            raise
+
+        finally:
+            IN_FLIGHT.dec(mode="answer")
+
+    def _shortcut_events(self, prepared: Dict) -> Optional[list]:
+        cached = prepared['cached']
+        if cached:
+            return [
+                ('sources', {'sources': cached['sources']}),
+                ('token', {'text': cached['answer']}),
+                ('usage', {'usage': cached['usage'], 'cached': True})
+            ]
+
+        if prepared['context'] is None:
+            return [
+                ('sources', {'sources': []}),
+                ('token', {'text': NO_CONTEXT_ANSWER})
+            ]
+
+        return None
+
+    def _stream_event(self, prepared: Dict, event: Dict, answer_parts: list, start: float) -> Tuple[str, Dict]:
+        if event['type'] == 'token':
+            if not answer_parts:
+                self._mark(prepared, 'first_token', start)
+            answer_parts.append(event['text'])
+            return 'token', {'text': event['text']}
+
+        logger.info(f"✓ Response streamed ({event['usage']['output_tokens']} tokens)\n")
+        record_usage(event['usage'])
+        self.store(prepared, ''.join(answer_parts), event['usage'])
+        return 'usage', {
+            'model': event['model'],
+            'usage': event['usage'],
+            'context': prepared['context_stats'],
+            'cached': False
+        }
+
+    def _done_event(self, prepared: Dict, answer: str, started: float, include_timings: bool) -> Tuple[str, Dict]:
+        CHAT_REQUESTS.inc(mode="stream", outcome="ok")
+        # Same trailer as a JSON response: session_id and timings, if any
+        done = self._finalize(prepared, {'answer': answer}, started, include_timings)
+        del done['answer']
+        return 'done', done
+
+    def stream(self, user_message: str, top_k: int = 5, include_timings: bool = False,
+               session_id: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """Yield (event, data) pairs: sources, token..., usage, done"""
+        started = time.perf_counter()
+        IN_FLIGHT.inc(mode="stream")
+        try:
+            prepared = self.prepare(user_message, top_k, session_id)
+
+            answer_parts = []
+            shortcut = self._shortcut_events(prepared)
+            if shortcut:
+                for event, data in shortcut:
+                    if event == 'token':
+                        answer_parts.append(data['text'])
+                    yield event, data
+            else:
+                yield 'sources', {'sources': prepared['sources']}
+
+                start = time.perf_counter()
+                for event in self.llm_client.stream_response(user_message, prepared['context'], history=prepared['history']):
+                    yield self._stream_event(prepared, event, answer_parts, start)
+                self._mark(prepared, 'generate', start)
+
+            yield self._done_event(prepared, ''.join(answer_parts), started, include_timings)
+
+        except Exception:
+            CHAT_REQUESTS.inc(mode="stream", outcome="error")
+            raise
+
+        finally:
+            IN_FLIGHT.dec(mode="stream")
+
+    async def aprepare(self, user_message: str, top_k: int, executor: Executor, session_id: Optional[str] = None) -> Dict:
+        """prepare() on a dedicated executor so the event loop never blocks on CPU work"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.prepare, user_message, top_k, session_id)
+
+    async def aanswer(self, user_message: str, top_k: int, executor: Executor, include_timings: bool = False,
+                      session_id: Optional[str] = None) -> Dict:
+        started = time.perf_counter()
+        IN_FLIGHT.inc(mode="answer")
+        try:
+            prepared = await self.aprepare(user_message, top_k, executor, session_id)
+
+            response = self._shortcut_response(prepared)
+            if response is None:
+                start = time.perf_counter()
+                result = await self.llm_client.agenerate_response(user_message, prepared['context'], history=prepared['history'])
+                self._mark(prepared, 'generate', start)
+                response = self._response(prepared, result)
+
+            CHAT_REQUESTS.inc(mode="answer", outcome="ok")
+            return self._finalize(prepared, response, started, include_timings)
+
+        except Exception:
+            CHAT_REQUESTS.inc(mode="answer", outcome="error")
+            raise
+
+        finally:
+            IN_FLIGHT.dec(mode="answer")
+
+    async def astream(self, user_message: str, top_k: int, executor: Executor, include_timings: bool = False,
+                      session_id: Optional[str] = None) -> AsyncIterator[Tuple[str, Dict]]:
+        started = time.perf_counter()
+        IN_FLIGHT.inc(mode="stream")
+        try:
+            prepared = await self.aprepare(user_message, top_k, executor, session_id)
+
+            answer_parts = []
+            shortcut = self._shortcut_events(prepared)
+            if shortcut:
+                for event, data in shortcut:
+                    if event == 'token':
+                        answer_parts.append(data['text'])
+                    yield event, data
+            else:
+                yield 'sources', {'sources': prepared['sources']}
+
+                start = time.perf_counter()
+                async for event in self.llm_client.astream_response(user_message, prepared['context'], history=prepared['history']):
+                    yield self._stream_event(prepared, event, answer_parts, start)
+                self._mark(prepared, 'generate', start)
+
+            yield self._done_event(prepared, ''.join(answer_parts), started, include_timings)
+
+        except Exception:
+            CHAT_REQUESTS.inc(mode="stream", outcome="error")
+            raise
+
+        finally:
+            IN_FLIGHT.dec(mode="stream")
+
+    def _answer_prepared(self, index: int, prepared: Dict) -> Dict:
+        response = self._shortcut_response(prepared)
+        if response is None:
+            start = time.perf_counter()
+            result = self.llm_client.generate_response(prepared['user_message'], prepared['context'])
+            self._mark(prepared, 'generate', start)
+            response = self._response(prepared, result)
+
+        return {'index': index, 'question': prepared['user_message'], **response}
+
+    def _batch_error(self, index: int, user_message: str, e: Exception) -> Dict:
+        CHAT_REQUESTS.inc(mode="batch", outcome="error")
+        logger.error(f"❌ Batch question {index} failed: {e}")
+        return {'index': index, 'question': user_message, 'error': str(e)}
+
+    def answer_batch(self, user_messages: List[str], top_k: int = 5, max_parallel: int = 8) -> Iterator[Dict]:
+        """Answer many questions, yielding each result as soon as it completes
+
+        Retrieval is batched (see prepare_batch); LLM calls fan out over at
+        most max_parallel threads. Results carry their input index since
+        they arrive out of order; a failed question yields an 'error' entry
+        instead of aborting the batch.
+        """
+        IN_FLIGHT.inc(mode="batch")
+        pool = ThreadPoolExecutor(max_workers=max(1, max_parallel), thread_name_prefix="batch-llm")
+        try:
+            batch = self.prepare_batch(user_messages, top_k)
+            futures = {pool.submit(self._answer_prepared, i, prepared): i for i, prepared in enumerate(batch)}
+
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    yield self._batch_error(index, user_messages[index], e)
+                    continue
+                CHAT_REQUESTS.inc(mode="batch", outcome="ok")
+                yield result
+
+        finally:
+            # Don't start queued questions if the consumer went away
+            pool.shutdown(wait=False, cancel_futures=True)
+            IN_FLIGHT.dec(mode="batch")
+
+    async def aanswer_batch(self, user_messages: List[str], top_k: int, executor: Executor,
+                            max_parallel: int = 8) -> AsyncIterator[Dict]:
+        """Async variant of answer_batch, bounded by a semaphore"""
+        IN_FLIGHT.inc(mode="batch")
+        semaphore = asyncio.Semaphore(max(1, max_parallel))
+        tasks = []
+
+        async def answer_one(index: int, prepared: Dict) -> Dict:
+            async with semaphore:
+                try:
+                    response = self._shortcut_response(prepared)
+                    if response is None:
+                        start = time.perf_counter()
+                        result = await self.llm_client.agenerate_response(prepared['user_message'], prepared['context'])
+                        self._mark(prepared, 'generate', start)
+                        response = self._response(prepared, result)
+                except Exception as e:
+                    return self._batch_error(index, prepared['user_message'], e)
+
+                CHAT_REQUESTS.inc(mode="batch", outcome="ok")
+                return {'index': index, 'question': prepared['user_message'], **response}
+
+        try:
+            loop = asyncio.get_running_loop()
+            batch = await loop.run_in_executor(executor, self.prepare_batch, user_messages, top_k)
+            tasks = [asyncio.ensure_future(answer_one(i, prepared)) for i, prepared in enumerate(batch)]
+
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+
+        finally:
+            for task in tasks:
+                task.cancel()
+            IN_FLIGHT.dec(mode="batch")
+
+
+def create_llm_client(async_http_client=None):
+    """Build the LLM client selected by LLM_PROVIDER (openai, claude or router)"""
+    provider = os.getenv('LLM_PROVIDER', 'openai').lower()
+
+    if provider == 'openai':
+        from rag.openai_client import OpenAIClient
+        return OpenAIClient(async_http_client=async_http_client)
+
+    if provider == 'claude':
+        from rag.claude_client import ClaudeClient
+        return ClaudeClient(async_http_client=async_http_client)
+
+    if provider != 'router':
+        raise ValueError(f"Unknown LLM_PROVIDER: {provider}")
+
+    from rag.claude_client import ClaudeClient
+    from rag.openai_client import OpenAIClient
+    from rag.router import ProviderRouter, DEADLINE_SECONDS, MAX_ATTEMPTS, ROUTER_WORKERS, STREAM_IDLE_SECONDS
+
+    factories = {
+        'openai': (OpenAIClient, 'OPENAI_API_KEY'),
+        'claude': (ClaudeClient, 'ANTHROPIC_API_KEY')
+    }
+    providers = {}
+    for name in os.getenv('LLM_PROVIDER_ORDER', 'openai,claude').split(','):
+        name = name.strip()
+        if name not in factories:
+            raise ValueError(f"Unknown provider in LLM_PROVIDER_ORDER: {name}")
+        client_class, key_var = factories[name]
+        if not os.getenv(key_var):
+            print(f"⚠️  Skipping {name}: {key_var} not set")
+            continue
+        # The router owns retries; SDK-level retries would stack under it
+        providers[name] = client_class(async_http_client=async_http_client, max_retries=0)
+
+    return ProviderRouter(
+        providers,
+        deadline=float(os.getenv('LLM_DEADLINE', DEADLINE_SECONDS)),
+        max_attempts=int(os.getenv('LLM_MAX_ATTEMPTS', MAX_ATTEMPTS)),
+        hedge=os.getenv('LLM_HEDGE', 'true').lower() == 'true',
+        max_workers=int(os.getenv('LLM_ROUTER_WORKERS', ROUTER_WORKERS)),
+        idle_timeout=float(os.getenv('LLM_STREAM_IDLE_TIMEOUT', STREAM_IDLE_SECONDS))
+    )
+
+
+def create_pipeline(async_http_client=None) -> ChatPipeline:
+    """Build the retriever, LLM client and cache from environment settings"""
+    retriever = Retriever(
+        backend=os.getenv('RETRIEVER_BACKEND', 'chroma'),
+        index_path=os.getenv('VECTOR_INDEX_PATH', './vector_index'),
+        mode=os.getenv('RETRIEVAL_MODE', 'dense'),
+        embedding_backend=os.getenv('EMBEDDING_BACKEND', 'torch'),
+        onnx_model_dir=os.getenv('ONNX_MODEL_DIR', './onnx_model'),
+        batch_window_ms=float(os.getenv('EMBED_BATCH_WINDOW_MS', 0)),
+        max_batch_size=int(os.getenv('EMBED_MAX_BATCH_SIZE', 16)),
+        embedding_cache_path=os.getenv('QUERY_EMBEDDING_CACHE_PATH', QUERY_EMBEDDING_CACHE_PATH) or None,
+        embedding_cache_max_entries=int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', EMBEDDING_CACHE_MAX_ENTRIES))
+    )
+    retriever.initialize()
+    print(f"✓ Initialized retriever (backend: {retriever.backend}, mode: {retriever.mode})")
+    if retriever.embedding_cache is not None:
+        print(f"✓ Embedding cache enabled ({retriever.embedding_cache.path})")
+
+    # Initialize LLM client
+    llm_client = create_llm_client(async_http_client=async_http_client)
+    print(f"✓ LLM client initialized ({type(llm_client).__name__}, model: {llm_client.model})")
+
+    # Initialize semantic answer cache
+    answer_cache = None
+    if os.getenv('SEMANTIC_CACHE_ENABLED', 'true').lower() == 'true':
+        answer_cache = SemanticCache(
+            threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.92)),
+            max_entries=int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', 1000)),
+            max_bytes=int(float(os.getenv('SEMANTIC_CACHE_MAX_MB', 32)) * 1024 * 1024),
+            ttl_seconds=float(os.getenv('SEMANTIC_CACHE_TTL', 3600))
+        )
+        print(f"✓ Semantic cache enabled (threshold: {answer_cache.threshold})")
+
+    # Initialize multi-turn session store
+    session_store = None
+    if os.getenv('SESSIONS_ENABLED', 'true').lower() == 'true':
+        session_store = SessionStore(
+            token_budget=int(os.getenv('SESSION_TOKEN_BUDGET', SESSION_TOKEN_BUDGET)),
+            max_sessions=int(os.getenv('SESSION_MAX_COUNT', 10000)),
+            max_bytes=int(float(os.getenv('SESSION_MAX_MB', 64)) * 1024 * 1024),
+            db_path=os.getenv('SESSION_DB_PATH') or None
+        )
+        print(f"✓ Sessions enabled (token budget: {session_store.token_budget}, "
+              f"{'sqlite: ' + session_store.db_path if session_store.db_path else 'in-memory'})")
+
+    return ChatPipeline(
+        retriever,
+        llm_client,
+        answer_cache=answer_cache,
+        context_token_budget=int(os.getenv('CONTEXT_TOKEN_BUDGET', CONTEXT_TOKEN_BUDGET)),
+        session_store=session_store
+    )
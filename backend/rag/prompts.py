@@ -0,0 +1,46 @@
+"""
+Prompt layout shared by the LLM clients
+Ordered for provider prefix caching: the unchanging system prompt and
+instructions first, then the retrieved context, and the question last.
+"""
+
+from typing import Tuple
+
+
+SYSTEM_PROMPT = """You are a helpful AI assistant specializing in answering questions about Sierra AI, their products, values, and opportunities.
+
+Your knowledge comes exclusively from the provided context documents from Sierra's website. Follow these rules strictly:
+
+1. ONLY answer based on information in the provided context
+2. If the answer is not clearly supported by the context, say "I don't have enough information in my knowledge base to answer that question accurately."
+3. When you provide an answer, be specific and professional
+4. Cite which source you're drawing from when relevant
+5. Maintain Sierra's tone: professional, clear, customer-obsessed, and helpful
+6. Never make up or hallucinate information - stick to the facts provided
+
+Remember: It's better to say you don't know than to provide inaccurate information."""
+
+ANSWER_INSTRUCTIONS = "Please answer the user's question based solely on the context provided below. If the context doesn't contain enough information to answer accurately, say so."
+
+
+def build_prompt_parts(user_message: str, context: str) -> Tuple[str, str]:
+    """Split the user prompt into (cacheable context prefix, question)
+
+    Nothing request-specific other than the context goes into the prefix,
+    so two requests that retrieve the same sources share it byte for byte.
+    """
+    prefix = f"""{ANSWER_INSTRUCTIONS}
+
+Context information from Sierra AI's website:
+
+{context}
+
+---
+"""
+    return prefix, f"User question: {user_message}"
+
+
+def build_prompt(user_message: str, context: str) -> str:
+    """Build the user prompt from retrieved context and the question"""
+    prefix, question = build_prompt_parts(user_message, context)
+    return f"{prefix}\n{question}"
@@ -0,0 +1,137 @@
+"""
+Token-bucket rate limiting
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from rag.log import get_logger
+
+
+logger = get_logger(__name__)
+
+_untrusted_forwarded_warned = False
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second"""
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self.rate = rate
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens if available
+
+        Returns 0.0 on success, otherwise the number of seconds until enough
+        tokens will have accumulated (nothing is taken in that case).
+        A request costing more than the capacity is admitted once the bucket
+        is full and leaves it in debt, so the caller still pays the full cost
+        before anything else gets through.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            needed = min(tokens, self.capacity)
+            if self.tokens >= needed:
+                self.tokens -= tokens
+                return 0.0
+
+            return (needed - self.tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until tokens are available, then take them"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+class KeyedRateLimiter:
+    """One token bucket per key (host, client id, ...)
+
+    At most max_keys buckets are kept; a new key evicts the least recently
+    used one, which only resets that key's allowance to a full burst.
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bucket(self, key: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[key] = bucket
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+    def acquire(self, key: str, tokens: float = 1.0):
+        """Block until `key` may proceed"""
+        self.bucket(key).acquire(tokens)
+
+    def try_acquire(self, key: str, tokens: float = 1.0) -> float:
+        """Non-blocking; returns 0.0 on success or the seconds to wait"""
+        return self.bucket(key).try_acquire(tokens)
+
+
+def client_key(
+    remote_addr: Optional[str],
+    forwarded_for: Optional[str] = None,
+    trust_forwarded: bool = False,
+    proxy_hops: int = 1
+) -> str:
+    """Who to rate-limit: the peer address, or the client address our proxies saw
+
+    Each proxy appends the address it received the request from to
+    X-Forwarded-For, so behind `proxy_hops` trusted proxies the client is
+    that many entries from the right. Entries further left are written by
+    the client itself and can't be trusted.
+    """
+    global _untrusted_forwarded_warned
+
+    if forwarded_for:
+        if trust_forwarded:
+            hops = [hop.strip() for hop in forwarded_for.split(',')]
+            # Fewer entries than proxies: not from our proxy chain
+            if proxy_hops >= 1 and len(hops) >= proxy_hops and hops[-proxy_hops]:
+                return hops[-proxy_hops]
+        elif not _untrusted_forwarded_warned:
+            _untrusted_forwarded_warned = True
+            logger.warning(
+                f"⚠️ Requests carry X-Forwarded-For but TRUST_FORWARDED_FOR is off: every client behind "
+                f"the proxy at {remote_addr} shares one rate limit. Set TRUST_FORWARDED_FOR=true if the proxy is yours."
+            )
+    return remote_addr or "unknown"
+
+
+def retry_after(wait: float) -> str:
+    """Retry-After header value (whole seconds, at least 1)"""
+    return str(max(1, math.ceil(wait)))
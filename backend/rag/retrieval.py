@@ -1,34 +1,190 @@
 """
-Retrieval module for querying ChromaDB
+Retrieval module for querying ChromaDB (or an exported NumPy vector index)
 """
 
+import os
+import threading
+import time
 import chromadb
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
+from rag.batching import QueryBatcher, MAX_BATCH_SIZE
+from rag.dedup import split_urls
+from rag.embedding_cache import EMBEDDING_CACHE_MAX_ENTRIES, EmbeddingCache, model_key
+from rag.embeddings import ONNX_MODEL_DIR, load_embedding_model
+from rag.lexical import InvertedIndex, LEXICAL_INDEX_FILE, reciprocal_rank_fusion
+from rag.log import get_logger
+from rag.versioning import CollectionAlias, version_dir
 
-EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+logger = get_logger(__name__)
+
+
+# How often (seconds) to re-check whether the collection (or active version) has changed
+VERSION_CHECK_INTERVAL = 5.0
+
+# Hybrid retrieval: each side contributes top_k * multiplier candidates
+HYBRID_CANDIDATE_MULTIPLIER = 4
+RRF_K = 60
+
+# Context packing
+CONTEXT_TOKEN_BUDGET = 1500
+CHARS_PER_TOKEN = 4
+# Chunks overlap by ~CHUNK_OVERLAP_TOKENS tokens (~4 chars each); search a generous tail for it
+OVERLAP_SEARCH_CHARS = 1000
+OVERLAP_PROBE_CHARS = 16
+# Don't bother packing a truncated run smaller than this
+MIN_TRUNCATED_TOKENS = 40
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def strip_overlap(previous: str, following: str) -> str:
+    """Drop the prefix of `following` that repeats the tail of `previous`
+
+    Candidate overlap starts are found with str.find on a short probe, then
+    confirmed with startswith, so no string is rebuilt while searching. The
+    first confirmed candidate is the longest overlap.
+    """
+    probe = following[:OVERLAP_PROBE_CHARS]
+    if not probe:
+        return following
+
+    start = max(0, len(previous) - OVERLAP_SEARCH_CHARS)
+    i = previous.find(probe, start)
+    while i != -1:
+        tail_length = len(previous) - i
+        if following.startswith(previous[i:]):
+            return following[tail_length:].lstrip()
+        i = previous.find(probe, i + 1)
+
+    return following
+
+
+class ActiveVersion:
+    """A collection version and its lexical index, published together
+
+    Never mutated: a swap replaces the whole object, and each request reads
+    it once, so it never mixes one version's vectors with another's BM25 index.
+    """
+
+    __slots__ = ('name', 'collection', 'lexical_index')
+
+    def __init__(self, name: str = None, collection=None, lexical_index: InvertedIndex = None):
+        self.name = name
+        self.collection = collection
+        self.lexical_index = lexical_index
 
 
 class Retriever:
-    def __init__(self, chroma_path: str = "./chroma_db"):
+    def __init__(
+        self,
+        chroma_path: str = "./chroma_db",
+        backend: str = "chroma",
+        index_path: str = "./vector_index",
+        mode: str = "dense",
+        embedding_backend: str = "torch",
+        onnx_model_dir: str = ONNX_MODEL_DIR,
+        batch_window_ms: float = 0.0,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        embedding_cache_path: str = None,
+        embedding_cache_max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES
+    ):
+        if backend not in ("chroma", "numpy"):
+            raise ValueError(f"Unknown retriever backend: {backend}")
+        if mode not in ("dense", "hybrid"):
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+
         self.chroma_path = chroma_path
-        self.client = chromadb.PersistentClient(path=chroma_path)
-        self.collection = None
+        self.backend = backend
+        self.index_path = index_path
+        self.mode = mode
+        self.embedding_backend = embedding_backend
+        self.onnx_model_dir = onnx_model_dir
+        self.batch_window_ms = batch_window_ms
+        self.max_batch_size = max_batch_size
+        self.embedding_cache_path = embedding_cache_path
+        self.embedding_cache_max_entries = embedding_cache_max_entries
+        self.batcher = None
+        self.embedding_cache = None
+        self.client = None
+        self.alias = None
+        self.active = ActiveVersion()
+        self.index = None
         self.embedding_model = None
+        self._version = None
+        self._version_checked_at = 0.0
+        self._alias_stamp = None
+        self._alias_checked_at = 0.0
+        self._swap_lock = threading.Lock()
+
+    @property
+    def collection_name(self) -> str:
+        return self.active.name
+
+    @property
+    def collection(self):
+        return self.active.collection
+
+    @property
+    def lexical_index(self) -> InvertedIndex:
+        return self.active.lexical_index
 
     def initialize(self):
-        """Initialize embedding model and connect to ChromaDB"""
+        """Initialize embedding model and connect to ChromaDB or the vector index"""
         print("Initializing retrieval system...")
 
         # Load embedding model
-        self.embedding_model = SentenceTransformer(EMBEDDING_MODEL)
+        self.embedding_model = load_embedding_model(self.embedding_backend, self.onnx_model_dir)
+
+        # Coalesce concurrent query encodes into one batched call
+        if self.batch_window_ms > 0:
+            self.batcher = QueryBatcher(
+                self.embedding_model.encode,
+                window_ms=self.batch_window_ms,
+                max_batch_size=self.max_batch_size
+            )
+
+        # Repeated query strings skip the encoder entirely
+        if self.embedding_cache_path:
+            self.embedding_cache = EmbeddingCache(
+                self.embedding_cache_path,
+                model_key(self.embedding_backend),
+                max_entries=self.embedding_cache_max_entries,
+                name="query"
+            )
+
+        if self.backend == "chroma":
+            # Blue/green ingestion repoints this alias; see refresh_collection()
+            self.alias = CollectionAlias(self.chroma_path)
+            self._alias_stamp = self.alias.stamp()
+            self.active = ActiveVersion(self.alias.active())
+
+        if self.mode == "hybrid":
+            self.load_lexical_index()
+
+        if self.backend == "numpy":
+            # Imported lazily so the Chroma backend never pays for it
+            from rag.vector_index import VectorIndex
+
+            self.index = VectorIndex(self.index_path)
+            self.index.load()
+            print(f"Loaded vector index with {self.index.count()} documents from {self.index_path}")
+
+            if self.index.count() == 0:
+                print("Warning: Vector index is empty. Run ingestion and export first.")
+            return
 
         # Get collection
+        self.client = chromadb.PersistentClient(path=self.chroma_path)
         try:
-            self.collection = self.client.get_collection("sierra_knowledge")
-            count = self.collection.count()
-            print(f"Connected to collection with {count} documents")
+            collection = self.client.get_collection(self.collection_name)
+            self.active = ActiveVersion(self.collection_name, collection, self.lexical_index)
+            count = collection.count()
+            print(f"Connected to collection {self.collection_name} with {count} documents")
 
             if count == 0:
                 print("Warning: Collection is empty. Run ingestion first.")
@@ -37,31 +193,250 @@ class Retriever:
             print(f"Exception: {e}")
             raise e
 
+    def load_lexical_index(self):
+        """Load the BM25 index written at ingestion time (next to the active store)"""
+        lexical_index = self._read_lexical_index(self.collection_name)
+        self.active = ActiveVersion(self.collection_name, self.collection, lexical_index)
+        print(f"Loaded lexical index with {len(self.lexical_index.postings)} terms")
+
+    def _read_lexical_index(self, collection_name: str) -> InvertedIndex:
+        if self.backend == "numpy":
+            base_path = self.index_path
+        else:
+            base_path = version_dir(self.chroma_path, collection_name)
+        return InvertedIndex.load(os.path.join(base_path, LEXICAL_INDEX_FILE))
+
+    def refresh_collection(self) -> bool:
+        """Swap to a newly activated collection version; True if it changed
+
+        Checks the alias file at most every VERSION_CHECK_INTERVAL seconds.
+        The new collection and lexical index are opened first, then published
+        as one ActiveVersion in a single assignment: requests already running
+        keep the version they started with, and no request waits on a reload.
+        """
+        if self.alias is None or time.monotonic() - self._alias_checked_at < VERSION_CHECK_INTERVAL:
+            return False
+        if not self._swap_lock.acquire(blocking=False):
+            return False
+
+        try:
+            self._alias_checked_at = time.monotonic()
+            stamp = self.alias.stamp()
+            if stamp == self._alias_stamp:
+                return False
+            self._alias_stamp = stamp
+
+            name = self.alias.active()
+            if name == self.collection_name:
+                return False
+
+            try:
+                collection = self.client.get_collection(name)
+                lexical_index = self._read_lexical_index(name) if self.mode == "hybrid" else None
+            except Exception as e:
+                logger.warning(f"⚠️ Could not switch to collection {name}, staying on {self.collection_name}: {e}")
+                return False
+
+            previous = self.collection_name
+            self.active = ActiveVersion(name, collection, lexical_index)
+            # Invalidates answers cached against the previous version
+            self._version = None
+            logger.info(f"🔄 Switched from collection {previous} to {name} ({collection.count()} chunks)")
+            return True
+        finally:
+            self._swap_lock.release()
+
+    def collection_version(self) -> Tuple:
+        """Fingerprint of the collection contents, used to invalidate caches
+
+        Combines the collection id, its size and the mtime of the SQLite
+        file Chroma writes to on every add/upsert/delete. Re-checked at most
+        every VERSION_CHECK_INTERVAL seconds to keep it off the hot path.
+        """
+        self.refresh_collection()
+        now = time.monotonic()
+        if self.index is not None:
+            if self._version is None or now - self._version_checked_at >= VERSION_CHECK_INTERVAL:
+                self._version = self.index.version()
+                self._version_checked_at = now
+            return self._version
+
+        if self._version is None or now - self._version_checked_at >= VERSION_CHECK_INTERVAL:
+            sqlite_path = os.path.join(self.chroma_path, "chroma.sqlite3")
+            try:
+                mtime = os.path.getmtime(sqlite_path)
+            except OSError:
+                mtime = None
+            collection = self.collection
+            self._version = (str(collection.id), collection.count(), mtime)
+            self._version_checked_at = now
+        return self._version
+
+    def embed_query(self, query: str) -> List[float]:
+        """Generate the embedding for a query"""
+        if self.embedding_cache is not None:
+            return self.embedding_cache.encode([query], self._encode_misses)[0].tolist()
+        return self._encode_one(query).tolist()
+
+    def _encode_one(self, query: str):
+        if self.batcher is not None:
+            return self.batcher.encode(query)
+        return self.embedding_model.encode(query)
+
+    def _encode_misses(self, queries: List[str]):
+        # A lone miss still goes through the micro-batcher
+        if len(queries) == 1:
+            return [self._encode_one(queries[0])]
+        return self.embedding_model.encode(queries)
+
     def retrieve(self, query: str, top_k: int = 5) -> List[Dict]:
         """Retrieve top-k most relevant chunks for a query"""
         # Generate query embedding
-        query_embedding = self.embedding_model.encode(query).tolist()
+        query_embedding = self.embed_query(query)
+
+        return self.retrieve_by_embedding(query_embedding, top_k=top_k, query=query)
+
+    def retrieve_by_embedding(self, query_embedding: List[float], top_k: int = 5, query: str = None) -> List[Dict]:
+        """Retrieve top-k most relevant chunks for a precomputed query embedding
+
+        In hybrid mode (and when the query text is given) dense and BM25
+        candidates are fused with reciprocal rank fusion.
+        """
+        return self.retrieve_batch_by_embeddings([query_embedding], top_k, [query] if query else None)[0]
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed many queries in a single encode call (bypasses the micro-batcher)"""
+        if self.embedding_cache is not None:
+            return self.embedding_cache.encode(queries, self.embedding_model.encode).tolist()
+        return self.embedding_model.encode(queries).tolist()
+
+    def retrieve_batch(self, queries: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """retrieve() for many queries: one encode call and one vector query"""
+        return self.retrieve_batch_by_embeddings(self.embed_queries(queries), top_k, queries)
+
+    def retrieve_batch_by_embeddings(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        queries: List[str] = None
+    ) -> List[List[Dict]]:
+        """Top-k chunks for each embedding, from a single multi-query search"""
+        if not query_embeddings:
+            return []
+
+        self.refresh_collection()
+        # Read once: the whole request sees a single version
+        active = self.active
+
+        if self.mode == "hybrid" and queries:
+            candidates = self._retrieve_dense_batch(active, query_embeddings, top_k * HYBRID_CANDIDATE_MULTIPLIER)
+            return [
+                self._fuse_hybrid(active, dense_docs, query, top_k)
+                for dense_docs, query in zip(candidates, queries)
+            ]
 
-        # Query ChromaDB
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
+        return self._retrieve_dense_batch(active, query_embeddings, top_k)
+
+    def _retrieve_dense_batch(
+        self,
+        active: ActiveVersion,
+        query_embeddings: List[List[float]],
+        top_k: int
+    ) -> List[List[Dict]]:
+        if self.index is not None:
+            return self._retrieve_from_index(query_embeddings, top_k)
+
+        # Query ChromaDB (one call for every query)
+        results = active.collection.query(
+            query_embeddings=query_embeddings,
             n_results=top_k
         )
 
         # Format results
-        retrieved_docs = []
+        batch = []
+
+        for q in range(len(query_embeddings)):
+            retrieved_docs = []
+
+            if results['documents'] and len(results['documents'][q]) > 0:
+                for i in range(len(results['documents'][q])):
+                    doc = {
+                        'id': results['ids'][q][i],
+                        'content': results['documents'][q][i],
+                        'metadata': results['metadatas'][q][i],
+                        'distance': results['distances'][q][i] if 'distances' in results else None
+                    }
+                    retrieved_docs.append(doc)
+
+            batch.append(retrieved_docs)
+
+        return batch
+
+    def _retrieve_from_index(self, query_embeddings: List[List[float]], top_k: int) -> List[List[Dict]]:
+        """Query the NumPy index, returning the same shape as the Chroma path"""
+        batch = []
+
+        for hits in self.index.search_batch(query_embeddings, top_k):
+            retrieved_docs = []
+            for row, similarity in hits:
+                doc = self.index.get(row)
+                retrieved_docs.append({
+                    'id': doc['id'],
+                    'content': doc['content'],
+                    'metadata': doc['metadata'],
+                    # Squared L2 between unit vectors, matching Chroma's default space
+                    'distance': 2.0 - 2.0 * similarity
+                })
+            batch.append(retrieved_docs)
+
+        return batch
 
-        if results['documents'] and len(results['documents'][0]) > 0:
-            for i in range(len(results['documents'][0])):
-                doc = {
-                    'content': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i],
-                    'distance': results['distances'][0][i] if 'distances' in results else None
-                }
-                retrieved_docs.append(doc)
+    def _fuse_hybrid(self, active: ActiveVersion, dense_docs: List[Dict], query: str, top_k: int) -> List[Dict]:
+        """Fuse dense candidates with BM25 rankings using reciprocal rank fusion"""
+        n_candidates = top_k * HYBRID_CANDIDATE_MULTIPLIER
+        lexical_hits = active.lexical_index.search(query, n_candidates)
+
+        fused = reciprocal_rank_fusion(
+            [[doc['id'] for doc in dense_docs], [chunk_id for chunk_id, _ in lexical_hits]],
+            k=RRF_K
+        )[:top_k]
+
+        docs_by_id = {doc['id']: doc for doc in dense_docs}
+        missing = [chunk_id for chunk_id, _ in fused if chunk_id not in docs_by_id]
+        if missing:
+            docs_by_id.update(self._fetch_by_ids(active, missing))
+
+        retrieved_docs = []
+        for chunk_id, score in fused:
+            doc = docs_by_id.get(chunk_id)
+            if doc is None:
+                # Lexical index is ahead of/behind the vector store; skip
+                continue
+            retrieved_docs.append({**doc, 'score': score})
 
         return retrieved_docs
 
+    def _fetch_by_ids(self, active: ActiveVersion, ids: List[str]) -> Dict[str, Dict]:
+        """Load lexical-only hits that the dense side did not return"""
+        if self.index is not None:
+            docs = {}
+            for chunk_id in ids:
+                row = self.index.row_of(chunk_id)
+                if row is not None:
+                    docs[chunk_id] = {**self.index.get(row), 'distance': None}
+            return docs
+
+        results = active.collection.get(ids=ids, include=['documents', 'metadatas'])
+        return {
+            chunk_id: {
+                'id': chunk_id,
+                'content': content,
+                'metadata': metadata,
+                'distance': None
+            }
+            for chunk_id, content, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+        }
+
     def format_context(self, docs: List[Dict]) -> str:
         """Format retrieved documents into context string for Claude"""
         if not docs:
@@ -82,14 +457,118 @@ class Retriever:
 
         return "\n\n---\n\n".join(context_parts)
 
+    def build_context(self, docs: List[Dict], token_budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, Dict]:
+        """Pack retrieved chunks into a context string under a token budget
+
+        Chunks from the same URL with consecutive chunk_index values are
+        merged into one block with the duplicated overlap removed. Blocks
+        are then packed best-first (by the rank of their best chunk) until
+        the budget is used; the last block may be truncated at a sentence
+        boundary. Packed blocks are emitted in a stable (URL, position)
+        order rather than rank order, so the same sources always produce the
+        same bytes and the prompt prefix stays cacheable by the provider.
+        Returns the context and token statistics, including how many tokens
+        were saved versus format_context().
+        """
+        if not docs:
+            return "No relevant information found.", {
+                'tokens': 0, 'naive_tokens': 0, 'tokens_saved': 0,
+                'chunks': 0, 'blocks': 0, 'overlap_tokens_removed': 0, 'dropped_blocks': 0
+            }
+
+        # Group by URL, remembering each chunk's retrieval rank
+        by_url: Dict[str, List[Tuple[int, Dict]]] = {}
+        for rank, doc in enumerate(docs):
+            by_url.setdefault(doc['metadata'].get('url', ''), []).append((rank, doc))
+
+        # Merge runs of consecutive chunk indices
+        blocks = []
+        overlap_chars = 0
+        for url, ranked_docs in by_url.items():
+            ranked_docs.sort(key=lambda item: item[1]['metadata'].get('chunk_index', -1))
+            current = None
+            for rank, doc in ranked_docs:
+                index = doc['metadata'].get('chunk_index')
+                if current is not None and index is not None and current['last_index'] == index - 1:
+                    text = strip_overlap(current['parts'][-1], doc['content'])
+                    overlap_chars += len(doc['content']) - len(text)
+                    current['parts'].append(text)
+                    current['last_index'] = index
+                    current['rank'] = min(current['rank'], rank)
+                    current['urls'].extend(u for u in split_urls(doc['metadata']) if u not in current['urls'])
+                else:
+                    current = {
+                        'url': url,
+                        # A deduplicated chunk also stands for the pages whose copy was dropped
+                        'urls': split_urls(doc['metadata']) or [url],
+                        'title': doc['metadata'].get('title', 'Unknown'),
+                        'parts': [doc['content']],
+                        'first_index': index if index is not None else -1,
+                        'last_index': index,
+                        'rank': rank
+                    }
+                    blocks.append(current)
+
+        blocks.sort(key=lambda block: block['rank'])
+
+        # Pack best-first under the budget
+        separator_tokens = estimate_tokens("\n\n---\n\n")
+        remaining = token_budget
+        packed = []
+        dropped = 0
+
+        for block in blocks:
+            header = self._block_header(len(packed) + 1, block)
+            text = " ".join(block['parts'])
+            cost = estimate_tokens(header) + estimate_tokens(text) + (separator_tokens if packed else 0)
+
+            if cost > remaining:
+                available = remaining - estimate_tokens(header) - (separator_tokens if packed else 0)
+                if available < MIN_TRUNCATED_TOKENS:
+                    dropped += 1
+                    continue
+                text = text[:available * CHARS_PER_TOKEN]
+                boundary = text.rfind(". ")
+                if boundary > len(text) // 2:
+                    text = text[:boundary + 1]
+                cost = estimate_tokens(header) + estimate_tokens(text) + (separator_tokens if packed else 0)
+
+            packed.append((block, text))
+            remaining -= cost
+
+        packed.sort(key=lambda item: (item[0]['url'], item[0]['first_index']))
+        context = "\n\n---\n\n".join(
+            f"{self._block_header(i, block)}{text}"
+            for i, (block, text) in enumerate(packed, 1)
+        )
+        tokens = estimate_tokens(context)
+        naive_tokens = estimate_tokens(self.format_context(docs))
+
+        return context, {
+            'tokens': tokens,
+            'naive_tokens': naive_tokens,
+            'tokens_saved': max(0, naive_tokens - tokens),
+            'chunks': len(docs),
+            'blocks': len(packed),
+            'overlap_tokens_removed': overlap_chars // CHARS_PER_TOKEN,
+            'dropped_blocks': dropped
+        }
+
+    @staticmethod
+    def _block_header(number: int, block: Dict) -> str:
+        header = f"[Source {number}: {block['title']}]\nURL: {block['url']}\n"
+        also = [url for url in block['urls'] if url != block['url']]
+        if also:
+            header += f"Also at: {', '.join(also)}\n"
+        return header
+
     def get_unique_sources(self, docs: List[Dict]) -> List[str]:
         """Extract unique source URLs from retrieved documents"""
         sources = set()
         for doc in docs:
-            url = doc['metadata'].get('url', '')
-            if url:
-                sources.add(url)
-        return list(sources)
+            # Deduplicated chunks stand for several pages
+            sources.update(split_urls(doc['metadata']))
+        return sorted(sources)
 
 
 # Test the retriever
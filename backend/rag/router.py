@@ -0,0 +1,584 @@
+"""
+Latency-aware LLM provider router
+Wraps several clients (OpenAIClient, ClaudeClient, ...) behind the same
+generate_response/stream_response interface, with per-call deadlines,
+jittered retries, hedged requests and failover.
+"""
+
+import asyncio
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import AsyncIterator, Dict, Iterator, List
+
+from rag.log import get_logger
+
+
+logger = get_logger(__name__)
+
+DEADLINE_SECONDS = 30.0
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.2
+BACKOFF_MAX = 2.0
+
+# Hedge after the primary's p95 (response time, or time to first token when
+# streaming); until enough samples exist, use the default
+HEDGE_DEFAULT_SECONDS = 4.0
+HEDGE_MIN_SECONDS = 0.5
+MIN_SAMPLES = 10
+
+# Once a stream has produced output, the deadline no longer applies (long
+# answers take as long as they take); instead each event must follow the
+# previous one within this many seconds
+STREAM_IDLE_SECONDS = 15.0
+
+WINDOW_SIZE = 100
+# Threads for sync hedged calls and stream pumps; a losing non-streaming
+# hedge can't be interrupted and holds its worker until it returns
+ROUTER_WORKERS = 64
+# Each unit of error rate inflates a provider's score by this factor
+ERROR_PENALTY = 5.0
+
+
+def percentile(samples, p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+class ProviderStats:
+    """Rolling latency and error window for one provider"""
+
+    def __init__(self, window: int = WINDOW_SIZE, fallback_latency: float = DEADLINE_SECONDS):
+        # Stand-in median for a provider that has failed without ever succeeding
+        self.fallback_latency = fallback_latency
+        self.latencies = deque(maxlen=window)
+        self.first_token = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.abandoned = 0
+        self._lock = threading.Lock()
+
+    def record_hedge(self):
+        with self._lock:
+            self.hedges += 1
+
+    def record_hedge_win(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def record_abandoned(self):
+        """A hedge loser stopped early: its elapsed time is not a latency sample"""
+        with self._lock:
+            self.abandoned += 1
+
+    def record(self, ok: bool, latency: float = None, first_token: float = None):
+        with self._lock:
+            self.calls += 1
+            self.outcomes.append(ok)
+            if not ok:
+                self.errors += 1
+                return
+            if latency is not None:
+                self.latencies.append(latency)
+            if first_token is not None:
+                self.first_token.append(first_token)
+
+    def error_rate(self) -> float:
+        with self._lock:
+            return (self.outcomes.count(False) / len(self.outcomes)) if self.outcomes else 0.0
+
+    def hedge_delay(self, streaming: bool = False) -> float:
+        with self._lock:
+            samples = list(self.first_token if streaming else self.latencies)
+        if len(samples) < MIN_SAMPLES:
+            return HEDGE_DEFAULT_SECONDS
+        return max(HEDGE_MIN_SECONDS, percentile(samples, 0.95))
+
+    def score(self) -> float:
+        """Lower is better: median latency inflated by recent errors
+
+        Untried providers score 0 so they get tried; one that has only
+        failed scores as if it took the whole deadline.
+        """
+        with self._lock:
+            samples = list(self.latencies)
+        error_rate = self.error_rate()
+        if samples:
+            median = percentile(samples, 0.5)
+        else:
+            median = self.fallback_latency if error_rate > 0 else 0.0
+        return median * (1 + ERROR_PENALTY * error_rate)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            latencies = list(self.latencies)
+            first_token = list(self.first_token)
+            calls, errors, hedges, hedge_wins = self.calls, self.errors, self.hedges, self.hedge_wins
+            abandoned = self.abandoned
+
+        return {
+            'calls': calls,
+            'errors': errors,
+            'error_rate': self.error_rate(),
+            'latency_p50': percentile(latencies, 0.5) if latencies else None,
+            'latency_p95': percentile(latencies, 0.95) if latencies else None,
+            'first_token_p95': percentile(first_token, 0.95) if first_token else None,
+            'hedges_launched': hedges,
+            'hedge_wins': hedge_wins,
+            'hedges_abandoned': abandoned
+        }
+
+
+class ProviderRouter:
+    """Route each call to the currently best provider, hedging slow ones
+
+    - every call gets a deadline, passed down as the client timeout; a
+      stream must produce its first output by then, and afterwards only has
+      to keep producing (at most idle_timeout between events)
+    - failures are retried with full-jitter exponential backoff
+    - if the chosen provider has not answered (or, when streaming, produced
+      its first token) by its p95, the next provider is raced against it
+      and the first to answer wins; an outright failure fails over at once
+    - providers are ranked by a rolling latency/error window
+    """
+
+    def __init__(
+        self,
+        providers: Dict[str, object],
+        deadline: float = DEADLINE_SECONDS,
+        max_attempts: int = MAX_ATTEMPTS,
+        hedge: bool = True,
+        window: int = WINDOW_SIZE,
+        max_workers: int = ROUTER_WORKERS,
+        idle_timeout: float = STREAM_IDLE_SECONDS
+    ):
+        if not providers:
+            raise ValueError("ProviderRouter needs at least one provider")
+
+        self.providers = dict(providers)
+        self.order = list(self.providers)
+        self.deadline = deadline
+        self.max_attempts = max(1, max_attempts)
+        self.hedge = hedge
+        self.idle_timeout = idle_timeout
+        self.stats = {name: ProviderStats(window, fallback_latency=deadline) for name in self.providers}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-router")
+
+    @property
+    def model(self) -> str:
+        return self.providers[self.ranked()[0]].model
+
+    def ranked(self) -> List[str]:
+        return sorted(self.order, key=lambda name: (self.stats[name].score(), self.order.index(name)))
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+    def _next_hedge(self, name: str, backups: List[str], streaming: bool):
+        if not (self.hedge and backups):
+            return None
+        return time.monotonic() + self.stats[name].hedge_delay(streaming)
+
+    # Non-streaming
+
+    def _call(self, name: str, user_message: str, context: str, history: List[Dict], deadline_at: float) -> Dict:
+        timeout = max(0.001, deadline_at - time.monotonic())
+        start = time.monotonic()
+        try:
+            result = self.providers[name].generate_response(user_message, context, timeout=timeout, history=history)
+        except Exception:
+            self.stats[name].record(False)
+            raise
+
+        self.stats[name].record(True, latency=time.monotonic() - start)
+        return {**result, 'provider': name}
+
+    def _hedged_call(self, user_message: str, context: str, history: List[Dict], deadline_at: float) -> Dict:
+        order = self.ranked()
+        primary, backups = order[0], order[1:]
+        pending = {self.executor.submit(self._call, primary, user_message, context, history, deadline_at): primary}
+        hedge_at = self._next_hedge(primary, backups, streaming=False)
+        errors = []
+
+        while True:
+            now = time.monotonic()
+            if now >= deadline_at:
+                raise TimeoutError(f"No provider answered within {self.deadline}s")
+
+            timeout = deadline_at - now
+            if hedge_at is not None:
+                timeout = max(0.0, min(timeout, hedge_at - now))
+
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if name != primary:
+                    self.stats[name].record_hedge_win()
+                # Losers keep running in the pool and still feed the stats
+                return result
+
+            hedge_due = hedge_at is not None and time.monotonic() >= hedge_at
+            if backups and (not pending or hedge_due):
+                name = backups.pop(0)
+                if pending:
+                    self.stats[name].record_hedge()
+                pending[self.executor.submit(self._call, name, user_message, context, history, deadline_at)] = name
+                hedge_at = self._next_hedge(name, backups, streaming=False)
+            elif not pending:
+                raise errors[-1]
+
+    def generate_response(self, user_message: str, context: str, timeout: float = None, history: List[Dict] = None) -> Dict:
+        deadline_at = time.monotonic() + (timeout or self.deadline)
+        last_error = None
+
+        for attempt in range(self.max_attempts):
+            try:
+                return self._hedged_call(user_message, context, history, deadline_at)
+            except Exception as e:
+                last_error = e
+                delay = self._backoff(attempt)
+                if attempt + 1 >= self.max_attempts or time.monotonic() + delay >= deadline_at:
+                    break
+                logger.warning(f"Provider call failed ({e}); retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+        raise last_error
+
+    # Streaming
+
+    def _pump(self, name: str, user_message: str, context: str, history: List[Dict], deadline_at: float,
+              events: "queue.Queue", cancelled: threading.Event):
+        """Run one provider's stream on a worker thread, forwarding events"""
+        start = time.monotonic()
+        first_token = None
+        try:
+            timeout = max(0.001, deadline_at - start)
+            stream = self.providers[name].stream_response(user_message, context, timeout=timeout, history=history)
+            try:
+                for event in stream:
+                    if cancelled.is_set():
+                        # Lost the race; a truncated run says nothing about its latency
+                        self.stats[name].record_abandoned()
+                        return
+                    if first_token is None:
+                        first_token = time.monotonic() - start
+                    events.put((name, 'event', event))
+            finally:
+                stream.close()
+        except Exception as e:
+            self.stats[name].record(False)
+            events.put((name, 'error', e))
+            return
+
+        self.stats[name].record(True, latency=time.monotonic() - start, first_token=first_token)
+        events.put((name, 'end', None))
+
+    def _hedged_stream(self, user_message: str, context: str, history: List[Dict], deadline_at: float) -> Iterator[Dict]:
+        order = self.ranked()
+        primary, backups = order[0], order[1:]
+        events: "queue.Queue" = queue.Queue()
+        cancel = {}
+        active = set()
+        errors = []
+        winner = None
+
+        def launch(name):
+            cancel[name] = threading.Event()
+            active.add(name)
+            self.executor.submit(self._pump, name, user_message, context, history, deadline_at, events, cancel[name])
+
+        launch(primary)
+        hedge_at = self._next_hedge(primary, backups, streaming=True)
+        last_event_at = None
+
+        try:
+            while True:
+                now = time.monotonic()
+                limit = deadline_at if winner is None else last_event_at + self.idle_timeout
+                if now >= limit:
+                    raise self._stream_timeout(winner)
+
+                timeout = limit - now
+                if winner is None and hedge_at is not None:
+                    timeout = max(0.0, min(timeout, hedge_at - now))
+
+                try:
+                    name, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    if winner is None and backups and hedge_at is not None and time.monotonic() >= hedge_at:
+                        name = backups.pop(0)
+                        self.stats[name].record_hedge()
+                        launch(name)
+                        hedge_at = self._next_hedge(name, backups, streaming=True)
+                    continue
+
+                if winner is None:
+                    if kind == 'error':
+                        active.discard(name)
+                        errors.append(payload)
+                        if backups and not active:
+                            name = backups.pop(0)
+                            launch(name)
+                            hedge_at = self._next_hedge(name, backups, streaming=True)
+                        elif not active:
+                            raise errors[-1]
+                        continue
+
+                    # First output decides the race
+                    winner = name
+                    if winner != primary:
+                        self.stats[winner].record_hedge_win()
+                    for other, flag in cancel.items():
+                        if other != winner:
+                            flag.set()
+
+                if name != winner:
+                    continue
+                last_event_at = time.monotonic()
+
+                if kind == 'event':
+                    if payload['type'] == 'usage':
+                        payload = {**payload, 'provider': winner}
+                    yield payload
+                elif kind == 'end':
+                    return
+                else:
+                    raise payload
+        finally:
+            for flag in cancel.values():
+                flag.set()
+
+    def _stream_timeout(self, winner: str) -> TimeoutError:
+        if winner is None:
+            return TimeoutError(f"No provider started streaming within {self.deadline}s")
+        return TimeoutError(f"{winner} stalled for {self.idle_timeout}s mid-stream")
+
+    def stream_response(self, user_message: str, context: str, timeout: float = None, history: List[Dict] = None) -> Iterator[Dict]:
+        deadline_at = time.monotonic() + (timeout or self.deadline)
+        last_error = None
+
+        for attempt in range(self.max_attempts):
+            started = False
+            try:
+                for event in self._hedged_stream(user_message, context, history, deadline_at):
+                    started = True
+                    yield event
+                return
+            except Exception as e:
+                # Once tokens reached the caller, a retry would duplicate them
+                if started:
+                    raise
+                last_error = e
+                delay = self._backoff(attempt)
+                if attempt + 1 >= self.max_attempts or time.monotonic() + delay >= deadline_at:
+                    break
+                logger.warning(f"Provider stream failed ({e}); retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+        raise last_error
+
+    # Async (ASGI server)
+
+    async def _acall(self, name: str, user_message: str, context: str, history: List[Dict], deadline_at: float) -> Dict:
+        timeout = max(0.001, deadline_at - time.monotonic())
+        start = time.monotonic()
+        try:
+            result = await self.providers[name].agenerate_response(user_message, context, timeout=timeout, history=history)
+        except Exception:
+            self.stats[name].record(False)
+            raise
+
+        self.stats[name].record(True, latency=time.monotonic() - start)
+        return {**result, 'provider': name}
+
+    async def _ahedged_call(self, user_message: str, context: str, history: List[Dict], deadline_at: float) -> Dict:
+        order = self.ranked()
+        primary, backups = order[0], order[1:]
+        pending = {asyncio.ensure_future(self._acall(primary, user_message, context, history, deadline_at)): primary}
+        hedge_at = self._next_hedge(primary, backups, streaming=False)
+        errors = []
+
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= deadline_at:
+                    raise TimeoutError(f"No provider answered within {self.deadline}s")
+
+                timeout = deadline_at - now
+                if hedge_at is not None:
+                    timeout = max(0.0, min(timeout, hedge_at - now))
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    if name != primary:
+                        self.stats[name].record_hedge_win()
+                    return task.result()
+
+                hedge_due = hedge_at is not None and time.monotonic() >= hedge_at
+                if backups and (not pending or hedge_due):
+                    name = backups.pop(0)
+                    if pending:
+                        self.stats[name].record_hedge()
+                    pending[asyncio.ensure_future(self._acall(name, user_message, context, history, deadline_at))] = name
+                    hedge_at = self._next_hedge(name, backups, streaming=False)
+                elif not pending:
+                    raise errors[-1]
+        finally:
+            # Unlike threads, losing coroutines can simply be cancelled
+            for task in pending:
+                task.cancel()
+
+    async def agenerate_response(self, user_message: str, context: str, timeout: float = None, history: List[Dict] = None) -> Dict:
+        deadline_at = time.monotonic() + (timeout or self.deadline)
+        last_error = None
+
+        for attempt in range(self.max_attempts):
+            try:
+                return await self._ahedged_call(user_message, context, history, deadline_at)
+            except Exception as e:
+                last_error = e
+                delay = self._backoff(attempt)
+                if attempt + 1 >= self.max_attempts or time.monotonic() + delay >= deadline_at:
+                    break
+                logger.warning(f"Provider call failed ({e}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+        raise last_error
+
+    async def _apump(self, name: str, user_message: str, context: str, history: List[Dict], deadline_at: float, events: asyncio.Queue):
+        start = time.monotonic()
+        first_token = None
+        try:
+            timeout = max(0.001, deadline_at - start)
+            async for event in self.providers[name].astream_response(user_message, context, timeout=timeout, history=history):
+                if first_token is None:
+                    first_token = time.monotonic() - start
+                await events.put((name, 'event', event))
+        except asyncio.CancelledError:
+            self.stats[name].record_abandoned()
+            raise
+        except Exception as e:
+            self.stats[name].record(False)
+            await events.put((name, 'error', e))
+            return
+
+        self.stats[name].record(True, latency=time.monotonic() - start, first_token=first_token)
+        await events.put((name, 'end', None))
+
+    async def _ahedged_stream(self, user_message: str, context: str, history: List[Dict], deadline_at: float) -> AsyncIterator[Dict]:
+        order = self.ranked()
+        primary, backups = order[0], order[1:]
+        events: asyncio.Queue = asyncio.Queue()
+        tasks = {}
+        errors = []
+        winner = None
+
+        def launch(name):
+            tasks[name] = asyncio.ensure_future(self._apump(name, user_message, context, history, deadline_at, events))
+
+        launch(primary)
+        hedge_at = self._next_hedge(primary, backups, streaming=True)
+        last_event_at = None
+
+        try:
+            while True:
+                now = time.monotonic()
+                limit = deadline_at if winner is None else last_event_at + self.idle_timeout
+                if now >= limit:
+                    raise self._stream_timeout(winner)
+
+                timeout = limit - now
+                if winner is None and hedge_at is not None:
+                    timeout = max(0.0, min(timeout, hedge_at - now))
+
+                try:
+                    name, kind, payload = await asyncio.wait_for(events.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    if winner is None and backups and hedge_at is not None and time.monotonic() >= hedge_at:
+                        name = backups.pop(0)
+                        self.stats[name].record_hedge()
+                        launch(name)
+                        hedge_at = self._next_hedge(name, backups, streaming=True)
+                    continue
+
+                if winner is None:
+                    if kind == 'error':
+                        tasks.pop(name, None)
+                        errors.append(payload)
+                        if backups and not tasks:
+                            name = backups.pop(0)
+                            launch(name)
+                            hedge_at = self._next_hedge(name, backups, streaming=True)
+                        elif not tasks:
+                            raise errors[-1]
+                        continue
+
+                    winner = name
+                    if winner != primary:
+                        self.stats[winner].record_hedge_win()
+                    for other, task in tasks.items():
+                        if other != winner:
+                            task.cancel()
+
+                if name != winner:
+                    continue
+                last_event_at = time.monotonic()
+
+                if kind == 'event':
+                    if payload['type'] == 'usage':
+                        payload = {**payload, 'provider': winner}
+                    yield payload
+                elif kind == 'end':
+                    return
+                else:
+                    raise payload
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    async def astream_response(self, user_message: str, context: str, timeout: float = None, history: List[Dict] = None) -> AsyncIterator[Dict]:
+        deadline_at = time.monotonic() + (timeout or self.deadline)
+        last_error = None
+
+        for attempt in range(self.max_attempts):
+            started = False
+            try:
+                async for event in self._ahedged_stream(user_message, context, history, deadline_at):
+                    started = True
+                    yield event
+                return
+            except Exception as e:
+                if started:
+                    raise
+                last_error = e
+                delay = self._backoff(attempt)
+                if attempt + 1 >= self.max_attempts or time.monotonic() + delay >= deadline_at:
+                    break
+                logger.warning(f"Provider stream failed ({e}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+        raise last_error
+
+    def snapshot(self) -> Dict:
+        """Per-provider rolling stats and the current ranking"""
+        return {
+            'ranking': self.ranked(),
+            'providers': {name: stats.snapshot() for name, stats in self.stats.items()}
+        }
@@ -3,108 +3,428 @@ Web scraper for sierra.ai website
 Crawls the site and extracts text content for RAG ingestion
 """
 
+import argparse
 import requests
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urlparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import threading
 import time
 import json
+import hashlib
+import os
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Set, List, Dict
+from typing import Set, List, Dict, Iterable, Optional
+
+from rag.documents import JsonlWriter, load_documents
+from rag.extraction import EXTRACTORS, extract_page, soup_text
+from rag.ratelimit import KeyedRateLimiter
+
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+HTTP_CACHE_FILE = "data/http_cache.json"
+# CLI crawl defaults; the polite rate is site-specific, so each can be overridden
+SCRAPER_WORKERS = int(os.getenv('SCRAPER_WORKERS', 4))
+SCRAPER_REQUESTS_PER_SECOND = float(os.getenv('SCRAPER_REQUESTS_PER_SECOND', 4.0))
+SCRAPER_BURST = int(os.getenv('SCRAPER_BURST', 4))
+# Sitemap indexes can nest; never follow more than this many sitemap files
+MAX_SITEMAPS = 20
+# Raw pages saved with html_dir are listed here as {"url", "file"} lines
+HTML_INDEX_FILE = "index.jsonl"
+
+
+def parse_lastmod(value: Optional[str]) -> float:
+    """W3C datetime (as used in sitemaps) to a UTC timestamp, 0 if missing or invalid"""
+    if not value:
+        return 0.0
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return 0.0
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class ValidatorCache:
+    """Per-URL HTTP validators and last extracted page, persisted as JSON
+
+    Re-crawls send If-None-Match / If-Modified-Since from here; on a 304
+    (or a 200 whose extracted text hashes the same) the cached title,
+    content and links stand in for the page.
+    """
+
+    def __init__(self, path: str = HTTP_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries: Dict[str, Dict] = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            return self.entries.get(url)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        entry = self.get(url)
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def update(self, url: str, headers: Dict[str, str], title: str, content: str, links: List[str]) -> str:
+        """Store a fresh 200 response's validators and extracted page; returns the content hash"""
+        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        with self._lock:
+            self.entries[url] = {
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'hash': content_hash,
+                'title': title,
+                'content': content,
+                'links': links,
+                'fetched_at': time.time()
+            }
+        return content_hash
+
+    def save(self):
+        """Write atomically so an interrupted crawl never corrupts the cache"""
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+class Frontier:
+    """FIFO crawl frontier with O(1) de-duplication
+
+    Every URL is accepted at most once over the life of the frontier, so a
+    page that is queued, in flight or already visited is never re-queued.
+    """
+
+    def __init__(self, urls: Iterable[str] = ()):
+        self._queue = deque()
+        self._seen: Set[str] = set()
+        # Discovery order, used to return results in BFS order
+        self.order: Dict[str, int] = {}
+        for url in urls:
+            self.push(url)
+
+    def push(self, url: str) -> bool:
+        if url in self._seen:
+            return False
+        self._seen.add(url)
+        self.order[url] = len(self.order)
+        self._queue.append(url)
+        return True
+
+    def pop(self) -> str:
+        return self._queue.popleft()
+
+    def __len__(self) -> int:
+        return len(self._queue)
 
 
 class SierraScraper:
-    def __init__(self, base_url: str = "https://sierra.ai", max_pages: int = 50):
-        self.base_url = base_url
+    def __init__(
+        self,
+        base_url: str = "https://sierra.ai",
+        max_pages: int = 50,
+        workers: int = 1,
+        requests_per_second: float = 1.0,
+        burst: int = 1,
+        stream_path: str = None,
+        cache_path: str = None,
+        use_sitemap: bool = True,
+        extractor: str = "soup",
+        extract_processes: int = 0,
+        html_dir: str = None
+    ):
+        if extractor not in EXTRACTORS:
+            raise ValueError(f"Unknown extractor: {extractor}")
+
+        self.base_url = base_url.rstrip('/')
+        self.base_host = self.normalize_host(urlparse(base_url).netloc)
         self.max_pages = max_pages
+        self.workers = max(1, workers)
         self.visited_urls: Set[str] = set()
         self.scraped_content: List[Dict[str, str]] = []
         self.session = requests.Session()
         self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            'User-Agent': USER_AGENT
         })
+        # Per-host politeness limit shared by all workers
+        self.rate_limiter = KeyedRateLimiter(requests_per_second, burst)
+        self._content_lock = threading.Lock()
+        self._local = threading.local()
+        # Append each document to this JSONL file as soon as it is scraped,
+        # so ingestion can follow the crawl (ingestion --pipelined --follow)
+        self.stream_path = stream_path
+        self.stream_writer = None
+        # Conditional re-crawls: validators and content hashes per URL
+        self.validator_cache = ValidatorCache(cache_path) if cache_path else None
+        self.use_sitemap = use_sitemap
+        self.stats = {'fetched': 0, 'not_modified': 0, 'unchanged': 0, 'bytes': 0}
+        # HTML parsing: "soup" or "lxml", inline on the fetch threads or,
+        # with extract_processes > 0, in a separate process pool
+        self.extractor = extractor
+        self.extract_processes = max(0, extract_processes)
+        self.html_dir = html_dir
+        self.html_index = None
+
+    def get_session(self) -> requests.Session:
+        """requests.Session is not thread-safe, so each worker gets its own"""
+        if self.workers == 1:
+            return self.session
+
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({'User-Agent': USER_AGENT})
+            self._local.session = session
+        return session
+
+    @staticmethod
+    def normalize_host(netloc: str) -> str:
+        netloc = netloc.lower()
+        return netloc[4:] if netloc.startswith('www.') else netloc
 
     def is_valid_url(self, url: str) -> bool:
-        # Check if URL belongs to sierra.ai domain
+        # Check if URL belongs to the crawled site (with or without www.)
         parsed = urlparse(url)
-        return parsed.netloc == 'sierra.ai' or parsed.netloc == 'www.sierra.ai'
-
-    def clean_text(self, soup: BeautifulSoup) -> str:
-        # Remove script and style elements
-        for script in soup(["script", "style", "nav", "footer", "header"]):
-            script.decompose()
+        return parsed.scheme in ('http', 'https') and self.normalize_host(parsed.netloc) == self.base_host
 
-        text = soup.get_text(separator='\n')
+    def fetch_sitemap(self) -> List[str]:
+        """Page URLs from /sitemap.xml (following sitemap indexes), newest lastmod first"""
+        pending = [f"{self.base_url}/sitemap.xml"]
+        seen: Set[str] = set()
+        lastmods: Dict[str, float] = {}
 
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = '\n'.join(chunk for chunk in chunks if chunk)
+        while pending and len(seen) < MAX_SITEMAPS:
+            sitemap_url = pending.pop(0)
+            if sitemap_url in seen:
+                continue
+            seen.add(sitemap_url)
+
+            try:
+                self.rate_limiter.acquire(urlparse(sitemap_url).netloc)
+                response = self.session.get(sitemap_url, timeout=10)
+                response.raise_for_status()
+                root = ET.fromstring(response.content)
+            except Exception as e:
+                print(f"No usable sitemap at {sitemap_url}: {e}")
+                continue
 
-        return text
+            for entry in root:
+                # Tags are namespaced: {http://www.sitemaps.org/schemas/sitemap/0.9}url
+                kind = entry.tag.rsplit('}', 1)[-1]
+                fields = {child.tag.rsplit('}', 1)[-1]: (child.text or '').strip() for child in entry}
+                loc = fields.get('loc', '').split('#')[0]
+                if not loc:
+                    continue
+                if kind == 'sitemap':
+                    pending.append(loc)
+                elif kind == 'url' and self.is_valid_url(loc):
+                    lastmods[loc] = max(lastmods.get(loc, 0.0), parse_lastmod(fields.get('lastmod')))
+
+        # Recently modified pages first, so a max_pages budget goes to what changed
+        return sorted(lastmods, key=lambda url: -lastmods[url])
+
+    def _store_document(self, url: str, title: str, content: str, unchanged: bool = False):
+        if not content or len(content) <= 100:  # Only store if meaningful content
+            return
+
+        doc = {
+            'url': url,
+            'title': title,
+            'content': content
+        }
+        if unchanged:
+            # Same text as the last crawl: incremental ingestion can skip it
+            doc['unchanged'] = True
+        with self._content_lock:
+            self.scraped_content.append(doc)
+        if self.stream_writer is not None:
+            self.stream_writer.write(doc)
 
-    def scrape_page(self, url: str) -> tuple[str, List[str]]:
-        try:
-            print(f"  Scraping: {url}")
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
+    def clean_text(self, soup: BeautifulSoup) -> str:
+        return soup_text(soup)
 
-            soup = BeautifulSoup(response.content, 'lxml')
+    def save_html(self, url: str, html: bytes):
+        """Keep the raw page (e.g. as an extraction benchmark fixture)"""
+        filename = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16] + ".html"
+        with open(os.path.join(self.html_dir, filename), 'wb') as f:
+            f.write(html)
+        self.html_index.write({'url': url, 'file': filename})
 
-            # Extract title
-            title = soup.find('title')
-            title_text = title.get_text() if title else url
+    def fetch_page(self, url: str) -> Optional[Dict]:
+        """Download a page, conditionally when it is in the validator cache
 
-            # Extract main content
-            content = self.clean_text(soup)
+        Returns the raw response (`html` is None for a 304) and the cache
+        entry it was validated against, or None on error.
+        """
+        try:
+            print(f"  Scraping: {url}")
+            self.rate_limiter.acquire(urlparse(url).netloc)
+            cached = self.validator_cache.get(url) if self.validator_cache else None
+            headers = self.validator_cache.conditional_headers(url) if cached else {}
+            response = self.get_session().get(url, timeout=10, headers=headers)
 
-            # Store content
-            if content and len(content) > 100:  # Only store if meaningful content
-                self.scraped_content.append({
-                    'url': url,
-                    'title': title_text,
-                    'content': content
-                })
+            if response.status_code == 304 and cached:
+                with self._content_lock:
+                    self.stats['not_modified'] += 1
+                return {'url': url, 'cached': cached, 'html': None, 'headers': response.headers}
 
-            # Extract links
-            links = []
-            for link in soup.find_all('a', href=True):
-                absolute_url = urljoin(url, link['href'])
-                clean_url = absolute_url.split('#')[0].split('?')[0]
-                if self.is_valid_url(clean_url):
-                    links.append(clean_url)
+            response.raise_for_status()
+            with self._content_lock:
+                self.stats['fetched'] += 1
+                self.stats['bytes'] += len(response.content)
+            if self.html_dir:
+                self.save_html(url, response.content)
 
-            return content, links
+            return {'url': url, 'cached': cached, 'html': response.content, 'headers': response.headers}
 
         except Exception as e:
             print(f"Error scraping {url}: {e}")
-            return "", []
+            return None
 
-    def crawl(self):
-        print(f"Starting crawl of {self.base_url}")
-        print(f"Max pages: {self.max_pages}\n")
+    def finish_page(self, fetched: Dict, extracted: Optional[Dict]) -> List[str]:
+        """Record an extracted (or not-modified) page; returns its in-site links"""
+        url = fetched['url']
+        cached = fetched['cached']
 
-        to_visit = [self.base_url]
+        if extracted is None:
+            self._store_document(url, cached['title'], cached['content'], unchanged=True)
+            return cached['links']
 
-        while to_visit and len(self.visited_urls) < self.max_pages:
-            url = to_visit.pop(0)
+        links = [link for link in extracted['links'] if self.is_valid_url(link)]
 
-            if url in self.visited_urls:
-                continue
+        # Store content, flagged if the text hashes the same as last crawl
+        unchanged = False
+        if self.validator_cache is not None:
+            content_hash = self.validator_cache.update(url, fetched['headers'], extracted['title'], extracted['content'], links)
+            unchanged = cached is not None and cached['hash'] == content_hash
+            if unchanged:
+                with self._content_lock:
+                    self.stats['unchanged'] += 1
+        self._store_document(url, extracted['title'], extracted['content'], unchanged=unchanged)
 
-            self.visited_urls.add(url)
-            content, links = self.scrape_page(url)
+        return links
 
-            # Add new links to queue
-            for link in links:
-                if link not in self.visited_urls and link not in to_visit:
-                    to_visit.append(link)
+    def _fetch_and_extract(self, url: str, extract: bool):
+        fetched = self.fetch_page(url)
+        if fetched is None or fetched['html'] is None or not extract:
+            return fetched, None
+        return fetched, extract_page(url, fetched['html'], self.extractor)
 
-            # Be respectful - rate limit
-            time.sleep(1)
+    def scrape_page(self, url: str) -> tuple[str, List[str]]:
+        fetched, extracted = self._fetch_and_extract(url, extract=True)
+        if fetched is None:
+            return "", []
+        links = self.finish_page(fetched, extracted)
+        return (extracted or fetched['cached'])['content'], links
 
-        print(f"\nCrawled {len(self.visited_urls)} pages")
-        print(f"Extracted {len(self.scraped_content)} documents with content\n")
+    def crawl(self):
+        print(f"Starting crawl of {self.base_url}")
+        print(f"Max pages: {self.max_pages}, workers: {self.workers}, "
+              f"rate: {self.rate_limiter.rate:g}/s per host (burst {self.rate_limiter.burst:g}), "
+              f"extractor: {self.extractor} ({self.extract_processes or 'no'} extraction processes)\n")
+
+        start = time.perf_counter()
+        seeds = [self.base_url]
+        if self.use_sitemap:
+            sitemap_urls = self.fetch_sitemap()
+            print(f"Seeded {len(sitemap_urls)} URLs from sitemap.xml\n")
+            seeds.extend(sitemap_urls)
+        frontier = Frontier(seeds)
+        fetches = {}
+        extractions = {}
+        if self.stream_path:
+            self.stream_writer = JsonlWriter(self.stream_path)
+            print(f"Streaming documents to {self.stream_path}\n")
+        if self.html_dir:
+            Path(self.html_dir).mkdir(parents=True, exist_ok=True)
+            self.html_index = JsonlWriter(os.path.join(self.html_dir, HTML_INDEX_FILE))
+
+        # Fetch threads only do network I/O when extraction has its own
+        # processes; parsing then never competes with fetching for the GIL.
+        extract_pool = ProcessPoolExecutor(max_workers=self.extract_processes) if self.extract_processes > 0 else None
+        # Stop fetching ahead when this many pages are waiting to be parsed
+        max_pending_extractions = self.extract_processes * 2
+
+        # The scheduling loop owns the frontier; workers only fetch and
+        # parse, so no locking is needed around the queue or visited set.
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                while frontier or fetches or extractions:
+                    while (frontier and len(fetches) < self.workers and len(self.visited_urls) < self.max_pages
+                           and (extract_pool is None or len(extractions) < max_pending_extractions)):
+                        url = frontier.pop()
+                        self.visited_urls.add(url)
+                        fetches[executor.submit(self._fetch_and_extract, url, extract_pool is None)] = url
+
+                    if not fetches and not extractions:
+                        break
+
+                    done, _ = wait([*fetches, *extractions], return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        if future in fetches:
+                            url = fetches.pop(future)
+                            fetched, extracted = future.result()
+                            if fetched is None:
+                                continue
+                            if extract_pool is not None and fetched['html'] is not None:
+                                extractions[extract_pool.submit(extract_page, url, fetched['html'], self.extractor)] = fetched
+                                continue
+                        else:
+                            fetched = extractions.pop(future)
+                            try:
+                                extracted = future.result()
+                            except Exception as e:
+                                print(f"Error extracting {fetched['url']}: {e}")
+                                continue
+
+                        # Add new links to queue
+                        for link in self.finish_page(fetched, extracted):
+                            frontier.push(link)
+        finally:
+            if extract_pool is not None:
+                extract_pool.shutdown(cancel_futures=True)
+            if self.stream_writer is not None:
+                self.stream_writer.close()
+                self.stream_writer = None
+            if self.html_index is not None:
+                self.html_index.close()
+                self.html_index = None
+            if self.validator_cache is not None:
+                self.validator_cache.save()
+
+        # Workers finish out of order; report pages in discovery order
+        self.scraped_content.sort(key=lambda doc: frontier.order.get(doc['url'], len(frontier.order)))
+
+        elapsed = time.perf_counter() - start
+        print(f"\nCrawled {len(self.visited_urls)} pages in {elapsed:.1f}s")
+        print(f"Extracted {len(self.scraped_content)} documents with content")
+        print(f"Downloaded {self.stats['fetched']} pages ({self.stats['bytes'] / 1e6:.2f} MB), "
+              f"{self.stats['not_modified']} not modified (304), "
+              f"{self.stats['unchanged']} re-downloaded but unchanged\n")
 
     def save_to_file(self, filepath: str = "data/scraped_content.json"):
+        if filepath.endswith('.jsonl'):
+            self.append_to_jsonl(filepath)
+            return
+
         Path(filepath).parent.mkdir(parents=True, exist_ok=True)
 
         with open(filepath, 'w', encoding='utf-8') as f:
@@ -112,10 +432,22 @@ class SierraScraper:
 
         print(f"Saved scraped content to {filepath}")
 
+    def append_to_jsonl(self, filepath: str = "data/scraped_content.jsonl"):
+        """Append the scraped documents to a JSONL file, one per line
+
+        Appending never rewrites earlier lines; when a URL appears more than
+        once, load_documents() (and so every ingestion mode) keeps its last
+        occurrence.
+        """
+        with JsonlWriter(filepath) as writer:
+            for doc in self.scraped_content:
+                writer.write(doc)
+
+        print(f"Appended {writer.count} documents to {filepath}")
+
     def load_from_file(self, filepath: str = "data/scraped_content.json") -> List[Dict[str, str]]:
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                self.scraped_content = json.load(f)
+            self.scraped_content = load_documents(filepath)
             print(f"Loaded {len(self.scraped_content)} documents from {filepath}")
             return self.scraped_content
         except FileNotFoundError:
@@ -124,9 +456,44 @@ class SierraScraper:
 
 
 def main():
-    scraper = SierraScraper(max_pages=30)
+    parser = argparse.ArgumentParser(description="Crawl sierra.ai for RAG ingestion")
+    parser.add_argument('--output', default="data/scraped_content.json", help="output file (.json, or .jsonl to append)")
+    parser.add_argument('--stream', action='store_true', help="append to --output (.jsonl) as each page is scraped")
+    parser.add_argument('--max-pages', type=int, default=30)
+    parser.add_argument('--workers', type=int, default=SCRAPER_WORKERS, help="concurrent fetches (env SCRAPER_WORKERS)")
+    parser.add_argument('--requests-per-second', type=float, default=SCRAPER_REQUESTS_PER_SECOND,
+                        help="per-host request rate (env SCRAPER_REQUESTS_PER_SECOND)")
+    parser.add_argument('--burst', type=int, default=SCRAPER_BURST, help="per-host burst size (env SCRAPER_BURST)")
+    parser.add_argument('--base-url', default="https://sierra.ai")
+    parser.add_argument('--cache', default=HTTP_CACHE_FILE, help="ETag/Last-Modified cache file for conditional re-crawls")
+    parser.add_argument('--no-cache', action='store_true', help="re-download every page")
+    parser.add_argument('--no-sitemap', action='store_true', help="discover pages by link-following only")
+    parser.add_argument('--extractor', choices=EXTRACTORS, default="soup", help="HTML extraction path")
+    parser.add_argument('--extract-processes', type=int, default=0, help="parse pages in this many processes")
+    parser.add_argument('--save-html', metavar='DIR', help="also save raw pages here (extraction benchmark fixtures)")
+    args = parser.parse_args()
+
+    if args.stream and not args.output.endswith('.jsonl'):
+        parser.error("--stream needs a .jsonl --output")
+    if args.requests_per_second <= 0:
+        parser.error("--requests-per-second must be positive")
+
+    scraper = SierraScraper(
+        base_url=args.base_url,
+        max_pages=args.max_pages,
+        workers=args.workers,
+        requests_per_second=args.requests_per_second,
+        burst=args.burst,
+        stream_path=args.output if args.stream else None,
+        cache_path=None if args.no_cache else args.cache,
+        use_sitemap=not args.no_sitemap,
+        extractor=args.extractor,
+        extract_processes=args.extract_processes,
+        html_dir=args.save_html
+    )
     scraper.crawl()
-    scraper.save_to_file()
+    if not args.stream:
+        scraper.save_to_file(args.output)
 
     print(f"\n Summary:")
     print(f"Total pages visited: {len(scraper.visited_urls)}")
@@ -0,0 +1,299 @@
+"""
+Multi-turn chat sessions
+Bounded in-process store (optionally persisted to SQLite) with a token
+budget per session, extractive compaction of older turns, LRU eviction
+under a global memory cap and a running history vector for retrieval.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from rag.retrieval import estimate_tokens
+
+
+# Defaults (overridable from the environment in pipeline.create_pipeline)
+SESSION_TOKEN_BUDGET = 1200
+SUMMARY_MAX_TOKENS = 300
+MAX_SESSIONS = 10000
+MAX_BYTES = 64 * 1024 * 1024
+
+# Weight of earlier turns in the running history vector, and of that vector
+# when it is blended into a follow-up's retrieval embedding
+HISTORY_DECAY = 0.5
+HISTORY_WEIGHT = 0.3
+
+SUMMARY_SNIPPET_CHARS = 160
+SESSION_ID_MAX_LENGTH = 128
+# Rough per-session bookkeeping overhead (dicts, lists, OrderedDict node)
+SESSION_OVERHEAD_BYTES = 1024
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+
+
+def first_sentence(text: str, limit: int = SUMMARY_SNIPPET_CHARS) -> str:
+    sentence = SENTENCE_END.split(text.strip(), maxsplit=1)[0]
+    return sentence if len(sentence) <= limit else sentence[:limit].rstrip() + "…"
+
+
+class Session:
+    """One conversation: verbatim recent turns plus a summary of older ones"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.turns: List[Dict] = []
+        self.summary_lines: List[str] = []
+        self.history_vector: Optional[np.ndarray] = None
+        self.updated_at = time.time()
+
+    @property
+    def summary(self) -> str:
+        return "\n".join(self.summary_lines)
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(turn['tokens'] for turn in self.turns)
+
+    def nbytes(self) -> int:
+        size = SESSION_OVERHEAD_BYTES + len(self.summary)
+        size += sum(len(turn['user']) + len(turn['assistant']) for turn in self.turns)
+        if self.history_vector is not None:
+            size += self.history_vector.nbytes
+        return size
+
+    def has_history(self) -> bool:
+        return bool(self.turns or self.summary_lines)
+
+    def to_dict(self) -> Dict:
+        return {
+            'session_id': self.session_id,
+            'turns': self.turns,
+            'summary_lines': self.summary_lines,
+            'history_vector': self.history_vector.tolist() if self.history_vector is not None else None,
+            'updated_at': self.updated_at
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Session":
+        session = cls(data['session_id'])
+        session.turns = data['turns']
+        session.summary_lines = data['summary_lines']
+        if data['history_vector'] is not None:
+            session.history_vector = np.asarray(data['history_vector'], dtype=np.float32)
+        session.updated_at = data['updated_at']
+        return session
+
+
+class SessionStore:
+    """LRU store of sessions under a global memory cap
+
+    Each session keeps at most token_budget tokens of history: when a new
+    turn pushes it over, the oldest turns are folded into an extractive
+    summary (first sentence of question and answer), itself capped at
+    SUMMARY_MAX_TOKENS. With db_path set, sessions are written through to
+    SQLite, so evicted or pre-restart sessions are reloaded on demand.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = SESSION_TOKEN_BUDGET,
+        max_sessions: int = MAX_SESSIONS,
+        max_bytes: int = MAX_BYTES,
+        history_decay: float = HISTORY_DECAY,
+        history_weight: float = HISTORY_WEIGHT,
+        db_path: str = None
+    ):
+        self.token_budget = token_budget
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.history_decay = history_decay
+        self.history_weight = history_weight
+        self.db_path = db_path
+
+        self._lock = threading.Lock()
+        # session_id -> Session, least recently used first
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+
+        self.created = 0
+        self.compactions = 0
+        self.evictions = 0
+        self.loads = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    # Persistence
+
+    def _load(self, session_id: str) -> Optional[Session]:
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        self.loads += 1
+        return Session.from_dict(json.loads(row[0]))
+
+    def _save(self, session: Session):
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO sessions (id, data, updated_at) VALUES (?, ?, ?)",
+            (session.session_id, json.dumps(session.to_dict()), session.updated_at)
+        )
+        self._db.commit()
+
+    # In-memory LRU
+
+    def _account(self, session: Session):
+        size = session.nbytes()
+        self._bytes += size - self._sizes.get(session.session_id, 0)
+        self._sizes[session.session_id] = size
+
+    def _evict(self):
+        # Never evict the most recently used session (the one being served)
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            session_id, _ = self._sessions.popitem(last=False)
+            self._bytes -= self._sizes.pop(session_id, 0)
+            self.evictions += 1
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._load(session_id)
+                if session is None:
+                    return None
+                self._sessions[session_id] = session
+                self._account(session)
+                self._evict()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def get_or_create(self, session_id: str = None) -> Session:
+        """Return the named session, creating it (or a fresh id) if unknown"""
+        if session_id:
+            session_id = str(session_id)[:SESSION_ID_MAX_LENGTH]
+            session = self.get(session_id)
+            if session is not None:
+                return session
+        else:
+            session_id = uuid.uuid4().hex
+
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session(session_id)
+                self._sessions[session_id] = session
+                self._account(session)
+                self.created += 1
+                self._evict()
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            found = self._sessions.pop(session_id, None) is not None
+            self._bytes -= self._sizes.pop(session_id, 0)
+            if self._db is not None:
+                found = self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount > 0 or found
+                self._db.commit()
+            return found
+
+    # Turns and history
+
+    def _compact(self, session: Session):
+        """Fold the oldest turns into the summary until the budget fits"""
+        while len(session.turns) > 1 and session.tokens() > self.token_budget:
+            turn = session.turns.pop(0)
+            session.summary_lines.append(
+                f"Q: {first_sentence(turn['user'])} A: {first_sentence(turn['assistant'])}"
+            )
+            self.compactions += 1
+
+        while len(session.summary_lines) > 1 and estimate_tokens(session.summary) > SUMMARY_MAX_TOKENS:
+            session.summary_lines.pop(0)
+
+    def add_turn(self, session: Session, user_message: str, answer: str, query_embedding: List[float]):
+        """Record a finished turn and fold its query into the history vector"""
+        vector = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+
+        with self._lock:
+            session.turns.append({
+                'user': user_message,
+                'assistant': answer,
+                'tokens': estimate_tokens(user_message) + estimate_tokens(answer)
+            })
+            if session.history_vector is None:
+                session.history_vector = vector
+            else:
+                session.history_vector = self.history_decay * session.history_vector + (1 - self.history_decay) * vector
+            session.updated_at = time.time()
+
+            self._compact(session)
+            if session.session_id in self._sessions:
+                self._account(session)
+                self._evict()
+            self._save(session)
+
+    def retrieval_embedding(self, session: Session, query_embedding: List[float]) -> List[float]:
+        """Blend the running history vector into a follow-up's query embedding
+
+        Only the new question is ever embedded; earlier turns contribute via
+        the decayed average of their query vectors.
+        """
+        if session.history_vector is None:
+            return query_embedding
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        blended = (1 - self.history_weight) * query + self.history_weight * session.history_vector
+        norm = np.linalg.norm(blended)
+        return (blended / norm if norm > 0 else blended).tolist()
+
+    def history_messages(self, session: Session) -> List[Dict]:
+        """Chat messages for the LLM: the summary (as a system note) then recent turns"""
+        messages = []
+        if session.summary_lines:
+            messages.append({
+                'role': 'system',
+                'content': f"Summary of the earlier conversation:\n{session.summary}"
+            })
+        for turn in session.turns:
+            messages.append({'role': 'user', 'content': turn['user']})
+            messages.append({'role': 'assistant', 'content': turn['assistant']})
+        return messages
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'max_sessions': self.max_sessions,
+                'token_budget': self.token_budget,
+                'created': self.created,
+                'compactions': self.compactions,
+                'evictions': self.evictions,
+                'loaded_from_disk': self.loads,
+                'persistent': self._db is not None
+            }
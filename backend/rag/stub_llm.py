@@ -0,0 +1,314 @@
+"""
+Local stub LLM server
+Speaks enough of the OpenAI chat completions and Anthropic messages APIs
+(streaming and non-streaming) for OpenAIClient/ClaudeClient to run against
+it with a configurable latency, token rate and failure rate.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+
+STUB_ANSWER = (
+    "Sierra is building the conversational AI platform for businesses. "
+    "It was founded by Bret Taylor and Clay Bavor."
+)
+
+
+class StubLLMServer:
+    """Threaded HTTP server; use .base_url for the OpenAI client and
+    .anthropic_base_url for the Anthropic client."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.2,
+        tokens_per_second: float = 50.0,
+        error_rate: float = 0.0,
+        answer: str = STUB_ANSWER
+    ):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.answer = answer
+        self.requests = 0
+        self.seen_prefixes = set()
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class Handler(StubHandler):
+            server_config = stub
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.httpd.server_address[0]}:{self.port}/v1"
+
+    @property
+    def anthropic_base_url(self) -> str:
+        return f"http://{self.httpd.server_address[0]}:{self.port}"
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="stub-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server_config: StubLLMServer = None
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status: int, body: Dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def _write_event(self, data: Dict, event: str = None):
+        frame = f"event: {event}\n" if event else ""
+        frame += f"data: {json.dumps(data)}\n\n"
+        self.wfile.write(frame.encode("utf-8"))
+        self.wfile.flush()
+
+    def _tokens(self):
+        """The answer split into word-ish tokens, paced at tokens_per_second"""
+        config = self.server_config
+        words = config.answer.split(" ")
+        for i, word in enumerate(words):
+            if config.tokens_per_second > 0:
+                time.sleep(1.0 / config.tokens_per_second)
+            yield word if i == 0 else " " + word
+
+    def _prompt_tokens(self, body: Dict) -> int:
+        text = json.dumps(body.get("messages", [])) + json.dumps(body.get("system", ""))
+        return len(text) // 4
+
+    def _prefix_seen(self, prefix) -> Tuple[bool, int]:
+        """Emulate provider prefix caching: returns (seen before, prefix tokens)"""
+        text = json.dumps(prefix, sort_keys=True)
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        config = self.server_config
+        with config._lock:
+            seen = key in config.seen_prefixes
+            config.seen_prefixes.add(key)
+        return seen, len(text) // 4
+
+    def _openai_cached_tokens(self, body: Dict) -> int:
+        """Treat everything before the prompt's final paragraph as the prefix"""
+        text = "\n\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        seen, tokens = self._prefix_seen(text.rsplit("\n\n", 1)[0])
+        return tokens if seen else 0
+
+    def _anthropic_cache_usage(self, body: Dict) -> Dict:
+        """cache_creation/cache_read counts for blocks up to the last cache_control"""
+        blocks = body.get("system") if isinstance(body.get("system"), list) else []
+        for message in body.get("messages", []):
+            if isinstance(message.get("content"), list):
+                blocks = blocks + message["content"]
+        marked = [i for i, block in enumerate(blocks) if block.get("cache_control")]
+        if not marked:
+            return {"cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+
+        seen, tokens = self._prefix_seen(blocks[:marked[-1] + 1])
+        return {
+            "cache_creation_input_tokens": 0 if seen else tokens,
+            "cache_read_input_tokens": tokens if seen else 0
+        }
+
+    def _should_fail(self) -> bool:
+        config = self.server_config
+        with config._lock:
+            config.requests += 1
+        time.sleep(config.latency)
+        return random.random() < config.error_rate
+
+    def do_POST(self):
+        body = self._read_json()
+
+        try:
+            if self._should_fail():
+                self._send_json(500, {"error": {"type": "api_error", "message": "stub failure"}})
+            elif self.path.endswith("/chat/completions"):
+                self._openai(body)
+            elif self.path.endswith("/messages"):
+                self._anthropic(body)
+            else:
+                self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+        except (BrokenPipeError, ConnectionResetError):
+            # Client gave up (timeout, cancelled hedge); nothing left to send
+            self.close_connection = True
+
+    def _openai(self, body: Dict):
+        model = body.get("model", "stub")
+        prompt_tokens = self._prompt_tokens(body)
+        cached_tokens = self._openai_cached_tokens(body)
+
+        if not body.get("stream"):
+            text = "".join(self._tokens())
+            completion_tokens = len(text.split())
+            self._send_json(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop"
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                    "prompt_tokens_details": {"cached_tokens": cached_tokens}
+                }
+            })
+            return
+
+        self._start_stream()
+        completion_tokens = 0
+        for token in self._tokens():
+            completion_tokens += 1
+            self._write_event({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+            })
+
+        self._write_event({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens}
+            }
+        })
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _anthropic(self, body: Dict):
+        model = body.get("model", "stub")
+        input_tokens = self._prompt_tokens(body)
+        cache_usage = self._anthropic_cache_usage(body)
+
+        if not body.get("stream"):
+            text = "".join(self._tokens())
+            self._send_json(200, {
+                "id": "msg_stub",
+                "type": "message",
+                "role": "assistant",
+                "model": model,
+                "content": [{"type": "text", "text": text}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {"input_tokens": input_tokens, "output_tokens": len(text.split()), **cache_usage}
+            })
+            return
+
+        self._start_stream()
+        self._write_event({
+            "type": "message_start",
+            "message": {
+                "id": "msg_stub",
+                "type": "message",
+                "role": "assistant",
+                "model": model,
+                "content": [],
+                "stop_reason": None,
+                "stop_sequence": None,
+                "usage": {"input_tokens": input_tokens, "output_tokens": 1, **cache_usage}
+            }
+        }, event="message_start")
+        self._write_event({
+            "type": "content_block_start",
+            "index": 0,
+            "content_block": {"type": "text", "text": ""}
+        }, event="content_block_start")
+
+        output_tokens = 0
+        for token in self._tokens():
+            output_tokens += 1
+            self._write_event({
+                "type": "content_block_delta",
+                "index": 0,
+                "delta": {"type": "text_delta", "text": token}
+            }, event="content_block_delta")
+
+        self._write_event({"type": "content_block_stop", "index": 0}, event="content_block_stop")
+        self._write_event({
+            "type": "message_delta",
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": output_tokens}
+        }, event="message_delta")
+        self._write_event({"type": "message_stop"}, event="message_stop")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stub LLM server")
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0.2, help="seconds before the first byte")
+    parser.add_argument('--tps', type=float, default=50.0, help="output tokens per second")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubLLMServer(port=args.port, latency=args.latency, tokens_per_second=args.tps, error_rate=args.error_rate)
+    print(f"Stub LLM listening: OpenAI base_url={server.base_url}, Anthropic base_url={server.anthropic_base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Memory-mapped NumPy vector index
+A lightweight alternative to opening ChromaDB for small corpora
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rag.lexical import LEXICAL_INDEX_FILE
+
+
+EMBEDDINGS_FILE = "embeddings.npy"
+SIDECAR_FILE = "chunks.json"
+
+
+class VectorIndex:
+    """Exact cosine search over an L2-normalized float32 embedding matrix
+
+    The matrix is opened with np.load(mmap_mode='r'), so start-up only maps
+    the file; pages are faulted in by the first queries. Documents and
+    metadata live in a JSON sidecar with rows in the same order.
+    """
+
+    def __init__(self, index_path: str = "./vector_index"):
+        self.index_path = index_path
+        self.embeddings = None
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict] = []
+        self._rows: Dict[str, int] = {}
+
+    @property
+    def embeddings_path(self) -> str:
+        return os.path.join(self.index_path, EMBEDDINGS_FILE)
+
+    @property
+    def sidecar_path(self) -> str:
+        return os.path.join(self.index_path, SIDECAR_FILE)
+
+    def load(self):
+        """Map the embedding matrix and read the sidecar"""
+        self.embeddings = np.load(self.embeddings_path, mmap_mode='r')
+
+        with open(self.sidecar_path, 'r', encoding='utf-8') as f:
+            sidecar = json.load(f)
+
+        self.ids = sidecar['ids']
+        self.documents = sidecar['documents']
+        self.metadatas = sidecar['metadatas']
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+
+        if len(self.ids) != self.embeddings.shape[0]:
+            raise ValueError(
+                f"Index is inconsistent: {self.embeddings.shape[0]} vectors "
+                f"but {len(self.ids)} sidecar rows"
+            )
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def version(self) -> Tuple:
+        """Changes whenever the index is re-exported"""
+        return (self.index_path, self.count(), os.path.getmtime(self.embeddings_path))
+
+    def search(self, query_embedding: List[float], top_k: int = 5) -> List[Tuple[int, float]]:
+        """Return (row, cosine similarity) pairs, best first"""
+        return self.search_batch([query_embedding], top_k)[0]
+
+    def search_batch(self, query_embeddings: List[List[float]], top_k: int = 5) -> List[List[Tuple[int, float]]]:
+        """search() for many queries with a single matrix product"""
+        n = self.count()
+        if n == 0 or top_k <= 0:
+            return [[] for _ in query_embeddings]
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms > 0, norms, 1.0)
+
+        scores = queries @ self.embeddings.T
+        k = min(top_k, n)
+
+        # argpartition is O(n) per row; only the k winners get sorted
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row_scores, row_top in zip(scores, top):
+            row_top = row_top[np.argsort(-row_scores[row_top])]
+            results.append([(int(i), float(row_scores[i])) for i in row_top])
+
+        return results
+
+    def row_of(self, chunk_id: str) -> Optional[int]:
+        return self._rows.get(chunk_id)
+
+    def get(self, row: int) -> Dict:
+        return {
+            'id': self.ids[row],
+            'content': self.documents[row],
+            'metadata': self.metadatas[row]
+        }
+
+
+def export_index(
+    chroma_path: str = "./chroma_db",
+    index_path: str = "./vector_index",
+    collection_name: str = None
+) -> int:
+    """Export a Chroma collection (the active version by default) into embeddings.npy + chunks.json"""
+    import chromadb
+    from rag.versioning import active_collection, version_dir
+
+    collection_name = collection_name or active_collection(chroma_path)
+
+    start = time.perf_counter()
+    client = chromadb.PersistentClient(path=chroma_path)
+    collection = client.get_collection(collection_name)
+    data = collection.get(include=['embeddings', 'documents', 'metadatas'])
+
+    embeddings = np.asarray(data['embeddings'], dtype=np.float32)
+    if embeddings.size:
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        embeddings = embeddings / norms
+
+    Path(index_path).mkdir(parents=True, exist_ok=True)
+
+    # Write to temp files and swap in, so a reader never sees a mismatched pair
+    embeddings_tmp = os.path.join(index_path, "embeddings.tmp.npy")
+    sidecar_tmp = os.path.join(index_path, SIDECAR_FILE + ".tmp")
+
+    np.save(embeddings_tmp, embeddings)
+    with open(sidecar_tmp, 'w', encoding='utf-8') as f:
+        json.dump({
+            'collection': collection_name,
+            'ids': data['ids'],
+            'documents': data['documents'],
+            'metadatas': data['metadatas']
+        }, f, ensure_ascii=False)
+
+    os.replace(sidecar_tmp, os.path.join(index_path, SIDECAR_FILE))
+    os.replace(embeddings_tmp, os.path.join(index_path, EMBEDDINGS_FILE))
+
+    # Hybrid retrieval reads the BM25 index from next to the vectors
+    lexical_path = os.path.join(version_dir(chroma_path, collection_name), LEXICAL_INDEX_FILE)
+    if os.path.exists(lexical_path):
+        shutil.copyfile(lexical_path, os.path.join(index_path, LEXICAL_INDEX_FILE))
+
+    elapsed = time.perf_counter() - start
+    print(f"Exported {len(data['ids'])} chunks ({embeddings.nbytes / 1e6:.1f} MB) to {index_path} in {elapsed:.1f}s")
+    return len(data['ids'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a Chroma collection to a NumPy vector index")
+    parser.add_argument('--chroma-path', default="./chroma_db")
+    parser.add_argument('--out', default="./vector_index")
+    parser.add_argument('--collection', help="collection to export (default: the active version)")
+    args = parser.parse_args()
+
+    export_index(args.chroma_path, args.out, args.collection)
+
+
+if __name__ == "__main__":
+    main()
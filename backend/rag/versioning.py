@@ -0,0 +1,196 @@
+"""
+Blue/green collection versions
+Ingestion builds into a fresh versioned collection (sierra_knowledge_v<n>)
+and only then repoints a small alias file at it with an atomic rename, so
+a running Retriever never sees an empty or half-built index and can swap
+over between requests. Rollback repoints the alias at the previous version.
+
+    python -m rag.versioning status
+    python -m rag.versioning rollback
+    python -m rag.versioning activate sierra_knowledge_v3
+    python -m rag.versioning prune --keep 2
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import chromadb
+
+
+BASE_COLLECTION = "sierra_knowledge"
+ALIAS_FILE = "active_collection.json"
+# Per-version manifest and lexical index live under <chroma_path>/versions/<name>
+VERSIONS_DIR = "versions"
+# Previously active versions remembered for rollback
+MAX_HISTORY = 10
+
+VERSION_PATTERN = re.compile(rf"^{BASE_COLLECTION}_v(\d+)$")
+
+
+def version_dir(chroma_path: str, collection_name: str) -> str:
+    """Where a version keeps its manifest and lexical index
+
+    The unversioned sierra_knowledge collection keeps them in chroma_path
+    itself, as before blue/green ingestion existed.
+    """
+    if collection_name == BASE_COLLECTION:
+        return chroma_path
+    return os.path.join(chroma_path, VERSIONS_DIR, collection_name)
+
+
+def version_number(collection_name: str) -> Optional[int]:
+    match = VERSION_PATTERN.match(collection_name)
+    return int(match.group(1)) if match else None
+
+
+def list_versions(client) -> List[str]:
+    """Knowledge base collections, oldest first"""
+    # list_collections() returns names on newer Chroma, Collection objects on older
+    names = [getattr(collection, 'name', collection) for collection in client.list_collections()]
+    names = [name for name in names if name == BASE_COLLECTION or version_number(name) is not None]
+    return sorted(names, key=lambda name: version_number(name) or 0)
+
+
+def next_version(client) -> str:
+    numbers = [version_number(name) or 0 for name in list_versions(client)]
+    return f"{BASE_COLLECTION}_v{max(numbers, default=0) + 1}"
+
+
+class CollectionAlias:
+    """The active collection name, in a JSON file next to Chroma's data
+
+    Writes go to a temp file that is renamed over the alias, so readers
+    see either the old or the new version, never a partial file.
+    """
+
+    def __init__(self, chroma_path: str = "./chroma_db"):
+        self.chroma_path = chroma_path
+        self.path = os.path.join(chroma_path, ALIAS_FILE)
+
+    def read(self) -> Dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'active': BASE_COLLECTION, 'history': [], 'updated_at': None}
+
+    def active(self) -> str:
+        return self.read()['active']
+
+    def stamp(self) -> Optional[Tuple[int, int]]:
+        """Changes whenever the alias is rewritten; cheap enough for the request path"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def _write(self, state: Dict):
+        Path(self.chroma_path).mkdir(parents=True, exist_ok=True)
+        state['updated_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def activate(self, collection_name: str) -> Dict:
+        """Point the alias at a collection, remembering the one it replaces"""
+        state = self.read()
+        if state['active'] != collection_name:
+            history = [name for name in state['history'] if name != collection_name]
+            history.append(state['active'])
+            state = {'active': collection_name, 'history': history[-MAX_HISTORY:]}
+            self._write(state)
+        return state
+
+    def rollback(self) -> str:
+        """Repoint the alias at the previously active collection"""
+        state = self.read()
+        if not state['history']:
+            raise ValueError("No previous version to roll back to")
+
+        history = list(state['history'])
+        previous = history.pop()
+        self._write({'active': previous, 'history': history})
+        return previous
+
+
+def active_collection(chroma_path: str = "./chroma_db") -> str:
+    return CollectionAlias(chroma_path).active()
+
+
+def prune(chroma_path: str, keep: int = 2) -> List[str]:
+    """Delete all but the newest `keep` inactive versions; returns the deleted names
+
+    The active version and the one a rollback would return to are never deleted.
+    """
+    client = chromadb.PersistentClient(path=chroma_path)
+    state = CollectionAlias(chroma_path).read()
+    protected = {state['active']} | set(state['history'][-1:])
+
+    inactive = [name for name in list_versions(client) if name not in protected and name != BASE_COLLECTION]
+    doomed = inactive[:max(len(inactive) - keep, 0)]
+    for name in doomed:
+        client.delete_collection(name)
+        shutil.rmtree(version_dir(chroma_path, name), ignore_errors=True)
+    return doomed
+
+
+def print_status(chroma_path: str):
+    client = chromadb.PersistentClient(path=chroma_path)
+    state = CollectionAlias(chroma_path).read()
+
+    print(f"Active: {state['active']} (since {state.get('updated_at') or 'first ingestion'})")
+    if state['history']:
+        print(f"Rollback target: {state['history'][-1]}")
+    for name in list_versions(client):
+        marker = "*" if name == state['active'] else " "
+        print(f"  {marker} {name:<24} {client.get_collection(name).count():>7} chunks")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage blue/green knowledge base versions")
+    parser.add_argument('--chroma-path', default="./chroma_db")
+    subparsers = parser.add_subparsers(dest='command')
+
+    subparsers.add_parser('status', help="show the active version and all versions")
+    subparsers.add_parser('rollback', help="reactivate the previously active version")
+
+    activate_parser = subparsers.add_parser('activate', help="point the alias at a version")
+    activate_parser.add_argument('name')
+
+    prune_parser = subparsers.add_parser('prune', help="delete old inactive versions")
+    prune_parser.add_argument('--keep', type=int, default=2, help="inactive versions to keep")
+
+    args = parser.parse_args()
+    alias = CollectionAlias(args.chroma_path)
+
+    if args.command == 'rollback':
+        try:
+            name = alias.rollback()
+        except ValueError as e:
+            raise SystemExit(f"❌ {e}")
+        print(f"✅ Rolled back to {name}")
+    elif args.command == 'activate':
+        client = chromadb.PersistentClient(path=args.chroma_path)
+        if args.name not in list_versions(client):
+            raise SystemExit(f"❌ No such version: {args.name}")
+        alias.activate(args.name)
+        print(f"✅ Activated {args.name}")
+    elif args.command == 'prune':
+        deleted = prune(args.chroma_path, keep=args.keep)
+        print(f"✅ Deleted {len(deleted)} old versions" + (f": {', '.join(deleted)}" if deleted else ""))
+    else:
+        print_status(args.chroma_path)
+
+
+if __name__ == "__main__":
+    main()
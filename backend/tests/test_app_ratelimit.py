@@ -0,0 +1,39 @@
+"""
+Per-client rate limiting of the Flask API
+    python -m pytest tests
+"""
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("chromadb")
+
+import app as flask_app  # noqa: E402
+from rag.ratelimit import KeyedRateLimiter  # noqa: E402
+
+
+class StubPipeline:
+    answer_cache = None
+    session_store = None
+
+    def answer_batch(self, questions, top_k=5, max_parallel=8):
+        for question in questions:
+            yield {'question': question, 'answer': question}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(flask_app, "pipeline", StubPipeline())
+    monkeypatch.setattr(flask_app, "is_ready", True)
+    monkeypatch.setattr(flask_app, "rate_limiter", KeyedRateLimiter(1.0, 10))
+    return flask_app.app.test_client()
+
+
+def test_batch_pays_for_every_question(client):
+    response = client.post('/api/chat/batch', json={'questions': [f"q{i}" for i in range(50)]})
+    assert response.status_code == 200
+
+    # 50 questions against a burst of 10: the client owes ~40 more seconds
+    response = client.post('/api/chat/batch', json={'questions': ["q"]})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 40
@@ -0,0 +1,32 @@
+"""
+SemanticCache lookups around expired entries
+    python -m pytest tests
+"""
+
+import time
+
+from rag.cache import SemanticCache
+
+
+def test_expired_best_match_does_not_hide_a_live_one():
+    cache = SemanticCache(threshold=0.9, max_entries=4, ttl_seconds=60)
+    cache.store([1.0, 0.0, 0.0], 5, "stale", [], {})
+    # Slightly less similar to the query, but fresh
+    cache.store([0.98, 0.2, 0.0], 5, "fresh", [], {})
+    # store() sweeps expired entries, so age the first one afterwards
+    for entry in cache._entries.values():
+        if entry['answer'] == "stale":
+            entry['created_at'] -= 120
+
+    hit = cache.lookup([1.0, 0.0, 0.0], 5)
+    assert hit is not None and hit['answer'] == "fresh"
+    assert cache.stats()['expirations'] == 1
+
+
+def test_expired_only_match_is_a_miss():
+    cache = SemanticCache(threshold=0.9, max_entries=4, ttl_seconds=0.05)
+    cache.store([1.0, 0.0], 5, "stale", [], {})
+    time.sleep(0.1)
+
+    assert cache.lookup([1.0, 0.0], 5) is None
+    assert cache.stats()['entries'] == 0
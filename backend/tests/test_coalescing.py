@@ -0,0 +1,61 @@
+"""
+Stream coalescing: late arrivals never join a stream that is shutting down
+    python -m pytest tests
+"""
+
+import asyncio
+import threading
+import time
+
+from rag.coalescing import AsyncStreamFlight, StreamFlight
+
+
+def slow_closing_stream(closed: threading.Event):
+    """Five events; closing it early takes a while, like an upstream HTTP stream"""
+    try:
+        for i in range(5):
+            time.sleep(0.02)
+            yield i
+    finally:
+        if i < 4:
+            time.sleep(0.5)
+        closed.set()
+
+
+def test_late_arrival_starts_a_new_stream_while_the_old_one_closes():
+    flights = StreamFlight()
+    closed = threading.Event()
+
+    first = flights.stream("q", lambda: slow_closing_stream(closed))
+    assert next(first) == 0
+    first.close()
+
+    # Wait until the producer has given up but is still closing its upstream
+    deadline = time.monotonic() + 2
+    while flights.in_flight() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert flights.in_flight() == 0
+    assert not closed.is_set()
+
+    second = flights.stream("q", lambda: slow_closing_stream(threading.Event()))
+    assert list(second) == [0, 1, 2, 3, 4]
+
+
+def test_async_late_arrival_starts_a_new_stream():
+    async def produce():
+        for i in range(5):
+            await asyncio.sleep(0.02)
+            yield i
+
+    async def scenario():
+        flights = AsyncStreamFlight()
+        first = flights.stream("q", produce)
+        assert await first.__anext__() == 0
+        await first.aclose()
+
+        # Unlisted as soon as the last subscriber left, before the task winds down
+        assert "q" not in flights
+        second = flights.stream("q", produce)
+        return [event async for event in second]
+
+    assert asyncio.run(scenario()) == [0, 1, 2, 3, 4]
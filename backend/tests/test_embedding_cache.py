@@ -0,0 +1,45 @@
+"""
+EmbeddingCache LRU touches and size bound
+    python -m pytest tests
+"""
+
+import numpy as np
+
+from rag import embedding_cache
+from rag.embedding_cache import EmbeddingCache
+
+
+def vectors(n: int) -> np.ndarray:
+    return np.arange(n * 4, dtype=np.float32).reshape(n, 4)
+
+
+def test_fresh_hits_do_not_write(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), "model", name="query")
+    cache.put_many(["a", "b"], vectors(2))
+
+    before = cache._db.total_changes
+    for _ in range(5):
+        assert all(vector is not None for vector in cache.get_many(["a", "b"]))
+    assert cache._db.total_changes == before
+
+
+def test_stale_hits_are_touched(tmp_path, monkeypatch):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), "model")
+    cache.put_many(["a"], vectors(1))
+
+    monkeypatch.setattr(embedding_cache, "TOUCH_INTERVAL_SECONDS", -1)
+    before = cache._db.total_changes
+    cache.get_many(["a"])
+    assert cache._db.total_changes == before + 1
+
+
+def test_size_bound_holds_across_processes(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    server = EmbeddingCache(path, "model", max_entries=10, name="query")
+    ingestion = EmbeddingCache(path, "model", max_entries=10)
+    ingestion.put_many([f"chunk {i}" for i in range(9)], vectors(9))
+
+    # server's own writes alone never reach the bound; the table's do
+    server.put_many(["q1", "q2"], vectors(2))
+    assert server._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 9
+    assert server.stats()['entries'] == 9
@@ -0,0 +1,56 @@
+"""
+KeyedRateLimiter key bound and client keys
+    python -m pytest tests
+"""
+
+from rag.ratelimit import KeyedRateLimiter, TokenBucket, client_key
+
+
+def test_key_bound_holds_when_no_bucket_is_idle():
+    limiter = KeyedRateLimiter(rate=0.001, burst=1, max_keys=3)
+    for i in range(10):
+        # Drains each bucket, so none is ever idle
+        assert limiter.try_acquire(f"client {i}") == 0.0
+    assert len(limiter) == 3
+
+
+def test_recently_used_keys_survive_eviction():
+    limiter = KeyedRateLimiter(rate=0.001, burst=1, max_keys=2)
+    limiter.try_acquire("a")
+    limiter.try_acquire("b")
+    limiter.try_acquire("a")
+    limiter.try_acquire("c")
+
+    # "a" was used after "b", so "b" went and "a" is still throttled
+    assert limiter.try_acquire("a") > 0
+    assert limiter.try_acquire("b") == 0.0
+
+
+def test_forwarded_for_only_when_trusted():
+    assert client_key("10.0.0.1", "203.0.113.7", trust_forwarded=False) == "10.0.0.1"
+    assert client_key(None) == "unknown"
+
+
+def test_forwarded_for_uses_the_hop_our_proxy_appended():
+    # The client sent "1.2.3.4"; our proxy appended the address it saw
+    assert client_key("10.0.0.1", "1.2.3.4, 203.0.113.7", trust_forwarded=True) == "203.0.113.7"
+    assert client_key("10.0.0.1", "9.9.9.9, 203.0.113.7", trust_forwarded=True) == "203.0.113.7"
+    # Two proxies: the client is second from the right
+    assert client_key("10.0.0.1", "1.2.3.4, 203.0.113.7, 10.0.0.2", trust_forwarded=True, proxy_hops=2) == "203.0.113.7"
+    # Too few entries for the configured chain: fall back to the peer
+    assert client_key("10.0.0.1", "203.0.113.7", trust_forwarded=True, proxy_hops=2) == "10.0.0.1"
+
+
+def test_cost_above_burst_leaves_the_bucket_in_debt():
+    bucket = TokenBucket(rate=1.0, burst=10)
+    assert bucket.try_acquire(50) == 0.0
+
+    # The whole batch is owed before even a single request gets through
+    assert bucket.try_acquire(1) > 40
+
+
+def test_cost_above_burst_waits_for_a_full_bucket():
+    bucket = TokenBucket(rate=1.0, burst=10)
+    bucket.try_acquire(5)
+    wait = bucket.try_acquire(50)
+    assert 4 < wait <= 5
@@ -0,0 +1,103 @@
+"""
+ProviderRouter ranking and hedging against in-process stub providers
+    python -m pytest tests
+"""
+
+import threading
+import time
+
+import pytest
+
+from rag.router import ProviderRouter
+
+
+class StubProvider:
+    """generate_response/stream_response with a fixed delay, optionally always failing"""
+
+    def __init__(self, model: str, delay: float = 0.0, fail: bool = False):
+        self.model = model
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def generate_response(self, user_message, context, timeout=None, history=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.model} is down")
+        return {'answer': self.model, 'model': self.model, 'usage': {}}
+
+    def stream_response(self, user_message, context, timeout=None, history=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.model} is down")
+        for word in ("streamed", "by", self.model):
+            time.sleep(self.delay)
+            yield {'type': 'token', 'text': word}
+        yield {'type': 'usage', 'model': self.model, 'usage': {}}
+
+
+def test_failing_provider_without_samples_ranks_last():
+    broken = StubProvider("broken", fail=True)
+    healthy = StubProvider("healthy", delay=0.01)
+    router = ProviderRouter({'broken': broken, 'healthy': healthy}, deadline=5, max_attempts=1, hedge=False)
+
+    for _ in range(30):
+        assert router.generate_response("q", "ctx")['provider'] == "healthy"
+
+    assert router.ranked() == ["healthy", "broken"]
+    assert router.stats['broken'].score() > router.stats['healthy'].score()
+    # Failed over once, then never picked first again
+    assert broken.calls == 1
+
+
+def test_untried_provider_still_scores_zero():
+    router = ProviderRouter({'a': StubProvider("a"), 'b': StubProvider("b")}, deadline=5)
+    assert router.stats['b'].score() == 0.0
+    assert router.ranked() == ["a", "b"]
+
+
+def test_stream_hedge_loser_is_abandoned_not_sampled(monkeypatch):
+    monkeypatch.setattr("rag.router.HEDGE_DEFAULT_SECONDS", 0.05)
+    slow = StubProvider("slow", delay=0.3)
+    fast = StubProvider("fast", delay=0.0)
+    router = ProviderRouter({'slow': slow, 'fast': fast}, deadline=5, max_attempts=1)
+
+    events = list(router.stream_response("q", "ctx"))
+    assert events[-1]['provider'] == "fast"
+
+    # Let the losing pump see its cancel flag
+    time.sleep(1.0)
+    stats = router.stats['slow']
+    assert stats.abandoned == 1
+    assert list(stats.latencies) == []
+    assert stats.calls == 0
+
+
+def test_stream_may_outlast_the_deadline_once_started():
+    slow_writer = StubProvider("slow_writer", delay=0.2)
+    router = ProviderRouter({'slow_writer': slow_writer}, deadline=0.5, max_attempts=1, hedge=False)
+
+    # Four events 0.2s apart after a 0.2s start: longer than the deadline, never idle
+    events = list(router.stream_response("q", "ctx"))
+    assert [event['text'] for event in events if event['type'] == 'token'] == ["streamed", "by", "slow_writer"]
+
+
+def test_stalled_stream_times_out():
+    stalled = StubProvider("stalled", delay=0.3)
+    router = ProviderRouter({'stalled': stalled}, deadline=5, max_attempts=1, hedge=False, idle_timeout=0.1)
+
+    with pytest.raises(TimeoutError):
+        list(router.stream_response("q", "ctx"))
+
+
+def test_concurrent_hedge_counts_are_not_lost():
+    router = ProviderRouter({'a': StubProvider("a")}, deadline=5)
+    stats = router.stats['a']
+    threads = [threading.Thread(target=lambda: [stats.record_hedge() for _ in range(1000)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stats.snapshot()['hedges_launched'] == 8000